@@ -0,0 +1,518 @@
+# Datei: benchmarks/db_helpers.py
+#
+# Micro-Benchmarks der DB-Helfer auf einer synthetischen, großen events.db.
+#  - Erzeugt --events Events und --signups Anmeldungen (aktiv/Warteliste/
+#    abgemeldet, verteilt auf --users Discord-User) in einer Transaktion.
+#  - Misst jeden Helfer aus webapp/routes_utils.py sowie die DB-Zugriffe des
+#    Bots (RosterEngine, Roster-Projektion, Event-/Signup-Repository):
+#      kalt  = frischer Verbindungs-Pool (leerer SQLite-Page-Cache) und
+#              geleerte Prozess-Caches, ein Aufruf pro Lauf
+#      warm  = --repeat Aufrufe hintereinander mit wechselnden Schlüsseln
+#  - Speichert pro Helfer die ausgeführten Statements mit ihrem
+#    EXPLAIN QUERY PLAN; "SCAN" auf events/signups wird extra markiert.
+#
+# Ergebnisse als JSON in benchmarks/results/ (oder --out), mit --compare alt.json
+# werden die warmen/kalten p50-Werte gegenübergestellt. So lassen sich Schema-
+# und Index-Änderungen vorher/nachher vergleichen.
+#
+# Aufruf aus dem Repo-Root:
+#   python -m benchmarks.db_helpers --events 5000 --signups 500000
+#   python -m benchmarks.db_helpers --db /tmp/big.db --reuse --only count_signups
+#
+# Die schreibenden Helfer (reserve_slot, cancel_signup, ...) verändern die DB;
+# mit --reuse verschiebt sich die Verteilung daher von Lauf zu Lauf leicht.
+
+import argparse
+import asyncio
+import os
+import platform
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.report import compare, git_revision, load_result, percentiles, write_result
+
+SIDES = ("allies", "axis")
+ROLES = ("inf", "tank", "sniper", "commander")
+
+# Statements ohne Query-Plan
+_NO_PLAN = re.compile(r"^\s*(BEGIN|COMMIT|ROLLBACK|PRAGMA|SAVEPOINT|RELEASE)\b", re.IGNORECASE)
+# Tabellen, auf denen ein SCAN bei großen Datenmengen teuer wird
+_BIG_TABLE_SCAN = re.compile(r"\bSCAN (events|signups)\b(?! USING (COVERING )?INDEX)")
+# Literale aus dem expandierten SQL -> ein Plan pro Statement-Form
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+#########################################
+# Synthetische Datenbank
+#########################################
+
+def build_db(path, events, signups, users, seed):
+    """
+    Legt die DB per init_db an und füllt sie mit Zufallsdaten (eine Transaktion).
+    """
+    from webapp import db
+
+    rng = random.Random(seed)
+    db.init_db()
+    conn = db.get_connection()
+    c = conn.cursor()
+    c.execute("BEGIN")
+
+    now = datetime.now().replace(second=0, microsecond=0)
+    words = ("Offensive", "Warfare", "Skirmish", "Training", "Clan-War", "Liga", "Scrim", "Festung")
+    event_rows = []
+    for i in range(1, events + 1):
+        # 2/3 in der Vergangenheit, 1/3 in der Zukunft
+        start = now + timedelta(hours=rng.randint(-24 * 730, 24 * 365))
+        posted = start < now + timedelta(days=2)
+        event_rows.append((
+            i, f"{rng.choice(words)} #{i}", "Synthetisch",
+            (start - timedelta(minutes=30)).isoformat(timespec="minutes"),
+            start.isoformat(timespec="minutes"),
+            (start + timedelta(minutes=15)).isoformat(timespec="minutes"),
+            "Server 1", "pw",
+            rng.randint(2, 8), rng.randint(1, 3), rng.randint(1, 2),
+            rng.randint(2, 8), rng.randint(1, 3), rng.randint(1, 2),
+            1, 1,
+            now.isoformat(),
+            "weekly" if rng.random() < 0.1 else "none",
+            1 if posted else 0,
+            str(10**17 + 3 * i) if posted else None,
+            str(10**17 + 3 * i + 1) if posted else None,
+            str(10**17 + 3 * i + 2) if posted else None,
+            1 if start < now else 0,
+            str(rng.choice((1, 2, 3))),
+        ))
+    c.executemany("""
+        INSERT INTO events (
+            id, name, description, date_briefing, date_eventstart, date_gamestart,
+            server_info, password,
+            inf_squads_allies, tank_squads_allies, sniper_squads_allies,
+            inf_squads_axis, tank_squads_axis, sniper_squads_axis,
+            max_commanders_allies, max_commanders_axis,
+            created_at, recurrence_pattern, posted_in_discord,
+            info_message_id, allies_message_id, axis_message_id,
+            pw_sent, guild_id
+        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+    """, event_rows)
+
+    # Anmeldungen: pro Event verschiedene User (max. eine laufende Anmeldung),
+    # ca. 70 % aktiv, 10 % Warteliste, 20 % abgemeldet
+    per_event = max(1, signups // events)
+    remaining = signups
+    batch = []
+    for event_id in range(1, events + 1):
+        if remaining <= 0:
+            break
+        n = min(remaining, per_event if event_id < events else remaining, users)
+        remaining -= n
+        for user in rng.sample(range(users), n):
+            roll = rng.random()
+            status = "active" if roll < 0.7 else "waiting" if roll < 0.8 else "cancelled"
+            batch.append((
+                event_id, str(10**15 + user), f"Spieler{user}",
+                rng.choice(SIDES), rng.choice(ROLES), status, now.isoformat(),
+            ))
+        if len(batch) >= 50000:
+            _insert_signups(c, batch)
+            batch = []
+    _insert_signups(c, batch)
+
+    c.executemany("""
+        INSERT OR REPLACE INTO guild_settings (guild_id, guild_name, event_channel_id, updated_at)
+        VALUES (?, ?, ?, ?)
+    """, [(str(g), f"Guild {g}", str(10**16 + g), now.isoformat()) for g in (1, 2, 3)])
+    conn.commit()
+    conn.close()
+
+def _insert_signups(c, rows):
+    c.executemany("""
+        INSERT INTO signups (event_id, user_id, user_name, seite, rolle, status, created_at)
+        VALUES (?,?,?,?,?,?,?)
+    """, rows)
+
+def dataset_size(path):
+    conn = sqlite3.connect(path)
+    try:
+        events = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        signups = conn.execute("SELECT COUNT(*) FROM signups").fetchone()[0]
+    finally:
+        conn.close()
+    return events, signups
+
+
+#########################################
+# Messung
+#########################################
+
+class StatementTrace:
+    """
+    Sammelt die SQL-Statements aller Pool-Verbindungen (set_trace_callback).
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.enabled = False
+        self._lock = threading.Lock()
+
+    def _trace(self, statement):
+        if self.enabled:
+            with self._lock:
+                self.statements.append(statement)
+
+    def install(self, pool):
+        open_raw = pool._open
+        def _open():
+            raw = open_raw()
+            raw.set_trace_callback(self._trace)
+            return raw
+        pool._open = _open
+
+    def capture(self):
+        self.statements = []
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+        return list(self.statements)
+
+
+def query_plans(path, statements):
+    """
+    EXPLAIN QUERY PLAN je Statement-Form (Literale durch ? ersetzt) auf einer
+    eigenen Verbindung; erklärt wird das erste konkrete Statement dieser Form.
+    """
+    conn = sqlite3.connect(path)
+    plans = []
+    seen = {}
+    try:
+        for sql in statements:
+            if _NO_PLAN.match(sql):
+                continue
+            text = _LITERALS.sub("?", " ".join(sql.split()))
+            if text in seen:
+                seen[text]["calls"] += 1
+                continue
+            try:
+                rows = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+            except sqlite3.Error as e:
+                seen[text] = {"sql": text, "calls": 1, "error": str(e)}
+                plans.append(seen[text])
+                continue
+            # (id, parent, notused, detail) -> eingerückt wie in der sqlite3-Shell
+            depth = {0: -1}
+            lines = []
+            for node_id, parent, _, detail in rows:
+                depth[node_id] = depth.get(parent, -1) + 1
+                lines.append("  " * depth[node_id] + detail)
+            seen[text] = {
+                "sql": text,
+                "calls": 1,
+                "plan": lines,
+                "full_scan": any(_BIG_TABLE_SCAN.search(line) for line in lines),
+            }
+            plans.append(seen[text])
+    finally:
+        conn.close()
+    return plans
+
+
+class Case:
+    """
+    Ein Helfer: call(key) wird mit Schlüsseln aus keys() aufgerufen.
+    """
+
+    def __init__(self, name, call, keys):
+        self.name = name
+        self.call = call
+        self.keys = keys
+
+
+def build_cases(ctx):
+    from webapp import routes_utils as ru
+    from webapp.roster_projection import get_roster_projection
+
+    rng = ctx.rng
+    loop = ctx.loop
+    engine = ctx.engine
+    events_repo = ctx.events_repo
+    signups_repo = ctx.signups_repo
+
+    def event_ids():
+        return rng.randint(1, ctx.events)
+
+    def roles():
+        return (rng.randint(1, ctx.events), rng.choice(SIDES), rng.choice(ROLES))
+
+    def event_users():
+        # Mal angemeldeter, mal unbekannter User
+        event_id = rng.randint(1, ctx.events)
+        return (event_id, str(10**15 + rng.randrange(ctx.users)))
+
+    def new_signups():
+        return (rng.randint(1, ctx.events), f"bench{next(ctx.new_user)}", rng.choice(SIDES), rng.choice(ROLES))
+
+    def active_users():
+        return ctx.pop_active_user()
+
+    def pages():
+        return rng.choice(ru.EVENT_FILTERS)
+
+    def page_ids():
+        start = rng.randint(1, max(1, ctx.events - ru.EVENT_PAGE_SIZE))
+        return list(range(start, start + ru.EVENT_PAGE_SIZE))
+
+    def names():
+        return rng.choice(("Liga", "#12", "Scrim", "gibtsnicht"))
+
+    def deep_cursor():
+        # Seite mitten in der Übersicht (Keyset-Pagination)
+        return ctx.cursors[rng.randrange(len(ctx.cursors))] if ctx.cursors else None
+
+    def message_ids():
+        return str(10**17 + 3 * rng.randint(1, ctx.events) + 2)
+
+    def run(coro):
+        return loop.run_until_complete(coro)
+
+    def reserve_slot(key):
+        event_id, user, side, role = key
+        return ru.reserve_slot(event_id, user, user, side, role)
+
+    def create_signup(key):
+        event_id, user, side, role = key
+        return ru.create_signup(event_id, user, user, side, role, "waiting")
+
+    def engine_reserve(key):
+        event_id, user, side, role = key
+        return engine.reserve(event_id, user, user, side, role)
+
+    return [
+        # webapp/routes_utils.py
+        Case("routes_utils.get_event_dict", ru.get_event_dict, event_ids),
+        Case("routes_utils.get_active_event", lambda _: ru.get_active_event(), lambda: None),
+        Case("routes_utils.list_events", lambda f: ru.list_events(f), pages),
+        Case("routes_utils.list_events.search", lambda q: ru.list_events("all", q=q), names),
+        Case("routes_utils.list_events.deep_page", lambda cur: ru.list_events("all", cursor=cur), deep_cursor),
+        Case("routes_utils.signup_counts", ru.signup_counts, page_ids),
+        Case("routes_utils.list_guilds", lambda _: ru.list_guilds(), lambda: None),
+        Case("routes_utils.count_signups", lambda k: ru.count_signups(*k), roles),
+        Case("routes_utils.activate_waiting_signup", lambda k: ru.activate_waiting_signup(*k), roles),
+        Case("routes_utils.create_signup", create_signup, new_signups),
+        Case("routes_utils.reserve_slot", reserve_slot, new_signups),
+        Case("routes_utils.cancel_signup", ru.cancel_signup, active_users),
+        # Bot: RosterEngine (ehem. get_signups_active, user_already_signedup, ...)
+        Case("roster.event", engine.event, event_ids),
+        Case("roster.active_signups", engine.active_signups, event_ids),
+        Case("roster.user_already_signedup", lambda k: engine.user_already_signedup(*k), event_users),
+        Case("roster.reserve", engine_reserve, new_signups),
+        Case("roster.cancel_signup", engine.cancel_signup, active_users),
+        Case("roster_projection.get_roster_projection", get_roster_projection, event_ids),
+        # Bot: Repositories (im DBExecutor, inkl. Thread-Übergabe)
+        Case("events_repo.get", lambda e: run(events_repo.get(e)), event_ids),
+        Case("events_repo.message_state", lambda e: run(events_repo.message_state(e)), event_ids),
+        Case("events_repo.load_unposted",
+             lambda _: run(events_repo.load_unposted(datetime.now(), timedelta(days=7))), lambda: None),
+        Case("events_repo.event_for_signup_message",
+             lambda m: run(events_repo.event_for_signup_message(m)), message_ids),
+        Case("signups_repo.active_user_ids", lambda e: run(signups_repo.active_user_ids(e)), event_ids),
+    ]
+
+
+class Context:
+    def __init__(self, args, events, users):
+        from bot.async_db import DBExecutor, EventRepository, SignupRepository
+        from webapp.roster_engine import RosterEngine
+
+        self.rng = random.Random(args.seed)
+        self.events = events
+        self.users = users
+        self.loop = asyncio.new_event_loop()
+        self.executor = DBExecutor()
+        self.engine = RosterEngine()
+        self.events_repo = EventRepository(self.executor)
+        self.signups_repo = SignupRepository(self.executor, self.engine)
+        self.new_user = iter(range(10**9))
+        self.active = []
+        self.cursors = []
+
+    def load_keys(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            self.active = [r[0] for r in conn.execute(
+                "SELECT DISTINCT user_id FROM signups WHERE status='active'"
+            )]
+        finally:
+            conn.close()
+        self.rng.shuffle(self.active)
+
+        # Cursor für tiefe Seiten der Übersicht einsammeln
+        from webapp.routes_utils import list_events
+        cursor = None
+        for _ in range(40):
+            _, cursor = list_events("all", cursor=cursor)
+            if cursor is None:
+                break
+            self.cursors.append(cursor)
+
+    def pop_active_user(self):
+        if not self.active:
+            raise RuntimeError("keine aktiven User mehr (--repeat kleiner wählen)")
+        return self.active.pop()
+
+    def reset_caches(self):
+        """
+        Kalter Start: neue Verbindungen (leerer Page-Cache) und leere Prozess-Caches.
+        """
+        from webapp.db import close_pool
+        from webapp.roster_projection import invalidate_projection
+        close_pool()
+        self.engine.invalidate()
+        invalidate_projection()
+
+    def close(self):
+        self.executor.shutdown()
+        self.loop.close()
+
+
+def measure(case, ctx, trace, path, args):
+    from webapp.db import get_pool
+
+    # Kalt: pro Lauf frischer Pool (+ Trace-Callback) und leere Caches
+    cold = []
+    statements = []
+    for i in range(args.cold_runs):
+        ctx.reset_caches()
+        trace.install(get_pool())
+        key = case.keys()
+        if i == 0:
+            trace.capture()
+        started = time.perf_counter()
+        case.call(key)
+        cold.append(time.perf_counter() - started)
+        if i == 0:
+            statements = trace.stop()
+
+    # Warm: ein Aufruf zum Aufwärmen, dann --repeat Aufrufe
+    case.call(case.keys())
+    keys = [case.keys() for _ in range(args.repeat)]
+    warm = []
+    trace.capture()
+    for key in keys:
+        started = time.perf_counter()
+        case.call(key)
+        warm.append(time.perf_counter() - started)
+    warm_statements = trace.stop()
+
+    plans = query_plans(path, statements + warm_statements)
+    return {
+        "cold_ms": percentiles(cold),
+        "warm_ms": percentiles(warm),
+        "warm_mean_ms": round(sum(warm) / len(warm) * 1000, 3) if warm else 0.0,
+        "queries_cold": sum(1 for s in statements if not _NO_PLAN.match(s)),
+        "queries_per_call_warm": round(
+            sum(1 for s in warm_statements if not _NO_PLAN.match(s)) / len(keys), 2
+        ) if keys else 0.0,
+        "full_scan": any(p.get("full_scan") for p in plans),
+        "plans": plans,
+    }
+
+
+def run(args):
+    # DB_PATH muss gesetzt sein, bevor webapp.db den Pool anlegt
+    os.environ["DB_PATH"] = args.db
+    from webapp import db
+    db.DB_PATH = args.db
+
+    if args.reuse and os.path.exists(args.db):
+        db.init_db()
+        events, signups = dataset_size(args.db)
+        print(f"[db_helpers] Vorhandene DB: {events} Events, {signups} Anmeldungen.")
+    else:
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        started = time.perf_counter()
+        build_db(args.db, args.events, args.signups, args.users, args.seed)
+        events, signups = dataset_size(args.db)
+        print(f"[db_helpers] DB erzeugt: {events} Events, {signups} Anmeldungen "
+              f"in {time.perf_counter() - started:.1f}s.")
+    if args.analyze:
+        conn = sqlite3.connect(args.db)
+        conn.execute("ANALYZE")
+        conn.close()
+
+    ctx = Context(args, events, args.users)
+    ctx.load_keys(args.db)
+    trace = StatementTrace()
+    cases = build_cases(ctx)
+    if args.only:
+        cases = [case for case in cases if any(part in case.name for part in args.only)]
+
+    results = {}
+    try:
+        for case in cases:
+            res = measure(case, ctx, trace, args.db, args)
+            results[case.name] = res
+            flag = "  [SCAN]" if res["full_scan"] else ""
+            print(f"[db_helpers] {case.name:45} kalt p50={res['cold_ms']['p50']:>8}ms  "
+                  f"warm p50={res['warm_ms']['p50']:>8}ms p99={res['warm_ms']['p99']:>8}ms  "
+                  f"Queries={res['queries_per_call_warm']}{flag}")
+    finally:
+        ctx.close()
+
+    meta = {
+        "git": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "events": events,
+        "signups": signups,
+        "users": args.users,
+        "repeat": args.repeat,
+        "cold_runs": args.cold_runs,
+        "analyze": args.analyze,
+        "seed": args.seed,
+    }
+    result = {"meta": meta, "helpers": results}
+    out = write_result("db_helpers", result, args.out)
+    print(f"[db_helpers] Ergebnis: {out}")
+
+    if args.compare:
+        old = load_result(args.compare)
+        paths = [(name, kind, "p50") for name in results for kind in ("cold_ms", "warm_ms")]
+        compare("db_helpers", old, result, paths, "helpers")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-Benchmarks der DB-Helfer (synthetische große DB)")
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--signups", type=int, default=500000)
+    parser.add_argument("--users", type=int, default=20000, help="verschiedene Discord-User")
+    parser.add_argument("--repeat", type=int, default=200, help="warme Aufrufe pro Helfer")
+    parser.add_argument("--cold-runs", type=int, default=5, help="kalte Aufrufe pro Helfer")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", default=None, help="DB-Datei (Standard: temporär)")
+    parser.add_argument("--reuse", action="store_true", help="vorhandene --db nicht neu erzeugen")
+    parser.add_argument("--analyze", action="store_true", help="vor der Messung ANALYZE ausführen")
+    parser.add_argument("--only", nargs="*", help="nur Helfer, deren Name einen der Teilstrings enthält")
+    parser.add_argument("--out", default=None, help="JSON-Datei (Standard: benchmarks/results/)")
+    parser.add_argument("--compare", default=None, help="früheres Ergebnis zum Vergleich")
+    args = parser.parse_args()
+
+    if args.db is None:
+        tmp = tempfile.mkdtemp(prefix="db_helpers_")
+        args.db = os.path.join(tmp, "events.db")
+
+    run(args)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+# Datei: benchmarks/fake_discord.py
+#
+# Lokaler Ersatz für Discords REST- und Gateway-Schicht, damit die echten
+# Handler aus bot/bot.py ohne Netz und ohne Token laufen:
+#  - FakeRest zählt jeden REST-Aufruf pro Route und simuliert dessen Latenz.
+#  - FakeChannel/FakeMessage/FakeUser bilden die Objekte nach, die der Bot
+#    benutzt (send, get_partial_message, edit, create_dm, ...).
+#  - FakeInteraction hat response/followup/edit_original_response wie
+#    discord.Interaction und merkt sich die Zeitpunkte der Antworten.
+#  - FakeGateway stellt Komponenten-Klicks zu: custom_id -> DynamicItem bzw.
+#    Callback einer View, wie discord.py es beim INTERACTION_CREATE tut.
+
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+
+_ids = itertools.count(10**17)
+
+def snowflake():
+    return next(_ids)
+
+
+class FakeRest:
+    """
+    Zählt REST-Aufrufe (Route -> Anzahl) und wartet latency_ms +- jitter.
+    """
+
+    def __init__(self, latency_ms=40.0, jitter_ms=20.0, seed=None):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.calls = Counter()
+        self._rng = random.Random(seed)
+
+    async def call(self, route):
+        self.calls[route] += 1
+        delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+    def reset(self):
+        self.calls.clear()
+
+
+class FakeMessage:
+    def __init__(self, rest, channel, message_id, **kwargs):
+        self.rest = rest
+        self.channel = channel
+        self.id = message_id
+        self.kwargs = kwargs
+        # (start, ende) jedes edit()-Aufrufs
+        self.edits = []
+
+    async def edit(self, **kwargs):
+        started = time.perf_counter()
+        await self.rest.call("PATCH /channels/{channel_id}/messages/{message_id}")
+        self.kwargs.update(kwargs)
+        self.edits.append((started, time.perf_counter()))
+
+
+class FakeChannel:
+    def __init__(self, rest, channel_id=None, guild=None):
+        self.rest = rest
+        self.id = channel_id or snowflake()
+        self.guild = guild
+        self.messages = {}
+
+    async def send(self, content=None, nonce=None, **kwargs):
+        await self.rest.call("POST /channels/{channel_id}/messages")
+        msg = FakeMessage(self.rest, self, snowflake(), content=content, **kwargs)
+        self.messages[msg.id] = msg
+        return msg
+
+    def get_partial_message(self, message_id):
+        msg = self.messages.get(int(message_id))
+        if msg is None:
+            msg = self.messages[int(message_id)] = FakeMessage(self.rest, self, int(message_id))
+        return msg
+
+
+class FakeUser:
+    def __init__(self, rest, user_id, name):
+        self.rest = rest
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.dm_channel = None
+        self.dms = 0
+
+    async def create_dm(self):
+        await self.rest.call("POST /users/@me/channels")
+        self.dm_channel = _FakeDMChannel(self)
+        return self.dm_channel
+
+    async def send(self, content=None, **kwargs):
+        if self.dm_channel is None:
+            await self.create_dm()
+        return await self.dm_channel.send(content, **kwargs)
+
+
+class _FakeDMChannel:
+    def __init__(self, user):
+        self.user = user
+        self.id = snowflake()
+
+    async def send(self, content=None, **kwargs):
+        await self.user.rest.call("POST /channels/{dm_channel_id}/messages")
+        self.user.dms += 1
+        return FakeMessage(self.user.rest, self, snowflake(), content=content, **kwargs)
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _callback(self):
+        if self._done:
+            raise RuntimeError("Interaktion wurde bereits beantwortet")
+        self._done = True
+        await self.interaction.rest.call("POST /interactions/{id}/{token}/callback")
+        self.interaction.first_response_at = time.perf_counter()
+
+    async def defer(self, ephemeral=False, thinking=False):
+        await self._callback()
+
+    async def send_message(self, content=None, **kwargs):
+        await self._callback()
+        self.interaction.sent.append((content, kwargs))
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self.interaction.marks.append(("followup", time.perf_counter()))
+        await self.interaction.rest.call("POST /webhooks/{application_id}/{token}")
+        self.interaction.sent.append((content, kwargs))
+
+
+class FakeInteraction:
+    def __init__(self, rest, user, message=None, guild=None):
+        self.rest = rest
+        self.id = snowflake()
+        self.user = user
+        self.message = message
+        self.guild = guild
+        self.created_at = time.perf_counter()
+        self.first_response_at = None
+        self.finished_at = None
+        self.sent = []           # (content, kwargs) aus send_message/followup
+        self.edited = []         # kwargs aus edit_original_response
+        self.marks = []          # (Art, Startzeitpunkt) von Followups/Edits
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def edit_original_response(self, **kwargs):
+        self.marks.append(("edit", time.perf_counter()))
+        await self.rest.call("PATCH /webhooks/{application_id}/{token}/messages/@original")
+        self.edited.append(kwargs)
+        self.finished_at = time.perf_counter()
+
+    def sent_view(self):
+        for _, kwargs in reversed(self.sent):
+            if kwargs.get("view") is not None:
+                return kwargs["view"]
+        return None
+
+    def latency(self):
+        """
+        Zeit bis zur ersten Antwort (Discords 3-Sekunden-Fenster).
+        """
+        if self.first_response_at is None:
+            return None
+        return self.first_response_at - self.created_at
+
+
+class FakeGateway:
+    """
+    Stellt Klicks zu wie discord.py: DynamicItems über ihr custom_id-Template,
+    sonst das Item einer (persistenten) View mit passender custom_id.
+    """
+
+    def __init__(self, rest, dynamic_items=(), views=()):
+        self.rest = rest
+        self.dynamic_items = list(dynamic_items)
+        self.views = list(views)
+
+    async def click(self, interaction, custom_id):
+        for cls in self.dynamic_items:
+            match = cls.__discord_ui_compiled_template__.fullmatch(custom_id)
+            if match:
+                item = await cls.from_custom_id(interaction, None, match)
+                await item.callback(interaction)
+                return
+        for view in self.views:
+            for child in view.children:
+                if getattr(child, "custom_id", None) == custom_id:
+                    await child.callback(interaction)
+                    return
+        raise LookupError(f"Kein Handler für custom_id {custom_id}")
+
+    async def select(self, interaction, view, value):
+        """
+        Auswahl in einem Select-Menü einer (ephemeren) View.
+        """
+        view.select._values = [value]
+        await view.select.callback(interaction)
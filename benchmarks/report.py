@@ -0,0 +1,77 @@
+# Datei: benchmarks/report.py
+#
+# Gemeinsame Helfer der Benchmarks: Perzentile, Git-Revision, Ergebnis-JSON
+# in benchmarks/results/ und der Vergleich mit einem früheren Lauf (--compare).
+
+import json
+import os
+import subprocess
+from datetime import datetime
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Verschlechterung ab der --compare eine Kennzahl markiert
+REGRESSION_THRESHOLD = 0.10
+
+
+def percentiles(values):
+    """
+    p50/p99/max in Millisekunden für Messwerte in Sekunden.
+    """
+    if not values:
+        return {"count": 0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+    values = sorted(values)
+    def pct(p):
+        return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 3)
+    return {"count": len(values), "p50": pct(0.50), "p99": pct(0.99), "max": round(values[-1] * 1000, 3)}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_result(name, result, out=None):
+    """
+    Schreibt das Ergebnis als JSON (Standard: benchmarks/results/<name>-<rev>-<zeit>.json).
+    Gibt den Pfad zurück.
+    """
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"{name}-{result['meta'].get('git') or 'nogit'}-{stamp}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    return out
+
+
+def load_result(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def lookup(data, path):
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def compare(tag, old, new, paths, section):
+    """
+    Stellt die Kennzahlen (Pfade in result[section], kleiner = besser) gegenüber.
+    """
+    print(f"[{tag}] Vergleich {old['meta'].get('git')} -> {new['meta'].get('git')}")
+    for path in paths:
+        a = lookup(old.get(section), path)
+        b = lookup(new.get(section), path)
+        if a is None or b is None:
+            continue
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        flag = "  <-- schlechter" if a and b > a * (1 + REGRESSION_THRESHOLD) else ""
+        print(f"  {'.'.join(path):45} {a:>10} -> {b:>10}  ({change}){flag}")
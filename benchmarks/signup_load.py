@@ -0,0 +1,356 @@
+# Datei: benchmarks/signup_load.py
+#
+# End-to-End-Lasttest der Bot-Handler gegen benchmarks/fake_discord.py.
+# Szenarien (nacheinander auf einer temporären DB):
+#   signup_storm     --users User klicken innerhalb von --window Sekunden auf
+#                    "beitreten" (SignUpButton) und wählen danach eine Rolle
+#   mass_cancel      alle angemeldeten User klicken "Abmelden" in ihrer DM
+#                    (PersistentCancelView), ebenfalls innerhalb von --window s
+#   password_fanout  PW-DMs an alle aktiven User (send_event_passwords, Briefing)
+#
+# Gemessen pro Szenario:
+#   - Zeit bis zur ersten Antwort (p50/p99/max) und Gesamtdauer der Interaktionen
+#   - REST-Aufrufe pro Route (FakeRest)
+#   - SQL-Statements gesamt und pro Interaktion (sqlite3 set_trace_callback)
+#     sowie die Query-Statistik des DBExecutors
+#   - Embed-Update-Lag: Commit einer Anmeldung -> erstes Embed-Edit danach
+#
+# Ergebnisse landen als JSON in benchmarks/results/ (oder --out); mit
+# --compare alt.json werden die wichtigsten Kennzahlen gegenübergestellt.
+#
+# Aufruf aus dem Repo-Root:
+#   python -m benchmarks.signup_load --users 200 --window 10
+#   python -m benchmarks.signup_load --compare benchmarks/results/signup_load-<alt>.json
+
+import argparse
+import asyncio
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.fake_discord import (
+    FakeChannel, FakeGateway, FakeInteraction, FakeRest, FakeUser,
+)
+from benchmarks.report import compare, git_revision, load_result, percentiles, write_result
+
+# Kennzahlen für --compare (Pfad im Ergebnis, kleiner = besser)
+COMPARE_KEYS = (
+    ("signup_storm", "first_response_ms", "p99"),
+    ("signup_storm", "handler_ms", "p99"),
+    ("signup_storm", "rest_calls_total"),
+    ("signup_storm", "db_queries_per_interaction"),
+    ("signup_storm", "embed_lag_ms", "p99"),
+    ("mass_cancel", "first_response_ms", "p99"),
+    ("mass_cancel", "rest_calls_total"),
+    ("mass_cancel", "db_queries_per_interaction"),
+    ("mass_cancel", "embed_lag_ms", "p99"),
+    ("password_fanout", "duration_ms"),
+    ("password_fanout", "rest_calls_total"),
+)
+
+
+class QueryCounter:
+    """
+    Zählt alle SQL-Statements der Pool-Verbindungen (set_trace_callback).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _trace(self, statement):
+        with self._lock:
+            self.count += 1
+
+    def install(self, pool):
+        open_raw = pool._open
+        def _open():
+            raw = open_raw()
+            raw.set_trace_callback(self._trace)
+            return raw
+        pool._open = _open
+
+
+def setup_db(path, users):
+    # DB_PATH muss gesetzt sein, bevor webapp.db den Pool anlegt
+    os.environ["DB_PATH"] = path
+    from webapp import db
+    db.DB_PATH = path
+    db.init_db()
+
+    # Genug Slots, dass etwa die Hälfte aktiv wird, der Rest auf die Warteliste
+    squads = max(1, users // 24)
+    conn = db.get_connection()
+    c = conn.cursor()
+    c.execute("""
+        INSERT INTO events (
+            name, description, date_briefing, date_eventstart,
+            inf_squads_allies, tank_squads_allies, sniper_squads_allies,
+            inf_squads_axis, tank_squads_axis, sniper_squads_axis,
+            max_commanders_allies, max_commanders_axis,
+            password, server_info, posted_in_discord
+        ) VALUES ('Lasttest', 'Benchmark', ?, ?, ?, ?, ?, ?, ?, ?, 1, 1, 'geheim', 'Server 1', 0)
+    """, (
+        (datetime.now() + timedelta(days=1)).isoformat(timespec="minutes"),
+        (datetime.now() + timedelta(days=1, hours=1)).isoformat(timespec="minutes"),
+        squads, max(1, squads // 3), max(1, squads // 3),
+        squads, max(1, squads // 3), max(1, squads // 3),
+    ))
+    event_id = c.lastrowid
+    conn.commit()
+    conn.close()
+    return event_id
+
+
+class Harness:
+    """
+    Verdrahtet bot.bot mit den Fake-Objekten und sammelt die Messwerte.
+    """
+
+    def __init__(self, b, rest, event_id, seed):
+        self.b = b
+        self.rest = rest
+        self.event_id = event_id
+        self.rng = random.Random(seed)
+        guild = type("FakeGuild", (), {"id": 1, "name": "Benchmark"})()
+        self.channel = FakeChannel(rest, guild=guild)
+        self.users = {}
+        self.commits = []          # perf_counter()-Zeitpunkte bestätigter Änderungen
+        self.side_ids = []         # Allies-/Axis-Nachricht des Events
+        self.gateway = FakeGateway(rest, dynamic_items=(b.SignUpButton, b.LegacySignUpButton))
+
+        # Discord-Client-Zugriffe des Bots auf die Fakes umbiegen
+        b.bot.get_channel = lambda cid: self.channel if cid == self.channel.id else None
+        b.bot.get_user = lambda uid: self.users.get(uid)
+        async def fetch_user(uid):
+            await rest.call("GET /users/{user_id}")
+            return self.users[uid]
+        b.bot.fetch_user = fetch_user
+        b.guild_channels.clear()
+        b.guild_channels["1"] = self.channel.id
+
+    def user(self, n):
+        uid = 10**15 + n
+        if uid not in self.users:
+            self.users[uid] = FakeUser(self.rest, uid, f"Spieler{n}")
+        return self.users[uid]
+
+    def side_messages(self):
+        return [self.channel.get_partial_message(i) for i in self.side_ids]
+
+    def embed_lags(self, since):
+        """
+        Pro Commit: Zeit bis zum Ende des ersten Allies/Axis-Edits, das danach begann.
+        """
+        edits = sorted(e for msg in self.side_messages() for e in msg.edits if e[0] >= since)
+        lags = []
+        for committed in self.commits:
+            for started, finished in edits:
+                if started >= committed:
+                    lags.append(finished - committed)
+                    break
+        return lags, len(self.commits) - len(lags)
+
+    async def wait_for_updates(self, timeout=30.0):
+        sched = self.b.update_scheduler
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if sched.queue_depth() == 0 and not sched._in_flight:
+                return True
+            await asyncio.sleep(0.05)
+        return False
+
+    #########################################
+    # Szenarien
+    #########################################
+
+    async def signup(self, n, delay):
+        await asyncio.sleep(delay)
+        user = self.user(n)
+        side = self.rng.choice(("allies", "axis"))
+        click = FakeInteraction(self.rest, user, message=None, guild=self.channel.guild)
+        await self.gateway.click(click, f"signup:{side}:{self.event_id}")
+        view = click.sent_view()
+        if view is None:
+            return [click]
+        # Kurze "Denkpause" vor der Rollenwahl
+        await asyncio.sleep(self.rng.uniform(0.1, 0.5))
+        options = [o.value for o in view.select.options if o.value != "none_none"]
+        if not options:
+            return [click]
+        select = FakeInteraction(self.rest, user, guild=self.channel.guild)
+        await self.gateway.select(select, view, self.rng.choice(options))
+        # Ergebnis-Edit beginnt direkt nach dem Commit von reserve_slot
+        for kwargs, (_, started) in zip(select.edited, (m for m in select.marks if m[0] == "edit")):
+            content = kwargs.get("content") or ""
+            if "aktiv" in content or "Warteliste" in content:
+                self.commits.append(started)
+        return [click, select]
+
+    async def cancel(self, user, delay, view):
+        await asyncio.sleep(delay)
+        inter = FakeInteraction(self.rest, user)
+        await self.gateway.click(inter, "cancel_dm_button")
+        # "Abmeldung OK" geht direkt nach dem Commit von cancel_signup raus
+        followups = [t for kind, t in inter.marks if kind == "followup"]
+        for (content, _), started in zip(inter.sent, followups):
+            if (content or "").startswith("Abmeldung OK"):
+                self.commits.append(started)
+        return [inter]
+
+
+def interaction_summary(interactions, queries, rest, harness, since):
+    first = [i.latency() for i in interactions if i.latency() is not None]
+    handler = [(i.finished_at or i.first_response_at) - i.created_at
+               for i in interactions if (i.finished_at or i.first_response_at)]
+    lags, missing = harness.embed_lags(since)
+    return {
+        "interactions": len(interactions),
+        "first_response_ms": percentiles(first),
+        "over_3s": sum(1 for t in first if t >= 3.0),
+        "handler_ms": percentiles(handler),
+        "rest_calls_total": rest.total(),
+        "rest_calls": dict(sorted(rest.calls.items())),
+        "db_queries_total": queries,
+        "db_queries_per_interaction": round(queries / len(interactions), 2) if interactions else 0.0,
+        "embed_lag_ms": percentiles(lags),
+        "commits_without_embed_update": missing,
+    }
+
+
+async def run_scenarios(args, b, event_id):
+    from webapp.db import close_pool, get_pool
+
+    rest = FakeRest(args.rest_latency_ms, args.rest_jitter_ms, seed=args.seed)
+    counter = QueryCounter()
+    # Frischer Pool -> jede Verbindung bekommt den Trace-Callback
+    close_pool()
+    counter.install(get_pool())
+    harness = Harness(b, rest, event_id, args.seed)
+    results = {}
+
+    b.update_scheduler.start()
+    b.bot.add_view = lambda view: None
+
+    # Event posten (wie post_all_unposted_events), danach Zähler zurücksetzen
+    evt = await b.events_repo.get(event_id)
+    await b.post_event(harness.channel, evt)
+    state = await b.events_repo.message_state(event_id)
+    harness.side_ids = [int(state[1]), int(state[2])]
+    b.roster.invalidate(event_id)
+    await b.signups_repo.roster_event(event_id)
+
+    # 1) Anmelde-Sturm
+    rest.reset()
+    harness.commits.clear()
+    q0 = counter.count
+    since = time.perf_counter()
+    delays = sorted(harness.rng.uniform(0, args.window) for _ in range(args.users))
+    batches = await asyncio.gather(*(harness.signup(n, d) for n, d in enumerate(delays)))
+    interactions = [i for batch in batches for i in batch]
+    await harness.wait_for_updates()
+    results["signup_storm"] = interaction_summary(interactions, counter.count - q0, rest, harness, since)
+    results["signup_storm"]["users"] = args.users
+    results["signup_storm"]["interaction_metrics"] = b.interaction_metrics.stats()
+
+    # 2) Passwort-Fan-out zum Briefing (vor dem Abmelden: alle aktiven User)
+    rest.reset()
+    q0 = counter.count
+    started = time.perf_counter()
+    await b.send_event_passwords(event_id)
+    duration = time.perf_counter() - started
+    recipients = len(await b.signups_repo.active_user_ids(event_id))
+    results["password_fanout"] = {
+        "recipients": recipients,
+        "duration_ms": round(duration * 1000, 1),
+        "dms_per_sec": round(recipients / duration, 2) if duration else 0.0,
+        "rest_calls_total": rest.total(),
+        "rest_calls": dict(sorted(rest.calls.items())),
+        "db_queries_total": counter.count - q0,
+    }
+
+    # 3) Massen-Abmeldung über den DM-Button
+    rest.reset()
+    harness.commits.clear()
+    q0 = counter.count
+    since = time.perf_counter()
+    cancel_view = b.PersistentCancelView()
+    harness.gateway.views = [cancel_view]
+    active = [harness.users[int(u)] for u in await b.signups_repo.active_user_ids(event_id)
+              if int(u) in harness.users]
+    batches = await asyncio.gather(*(
+        harness.cancel(user, harness.rng.uniform(0, args.window), cancel_view) for user in active
+    ))
+    interactions = [i for batch in batches for i in batch]
+    await harness.wait_for_updates()
+    results["mass_cancel"] = interaction_summary(interactions, counter.count - q0, rest, harness, since)
+
+    b.update_scheduler.stop()
+    results["db_executor"] = b.db.stats()
+    return results
+
+
+def run(args):
+    event_id = setup_db(args.db, args.users)
+    # Erst nach setup_db importieren (bot.bot legt beim Import Pool-Nutzer an)
+    import bot.bot as b
+
+    started = time.perf_counter()
+    scenarios = asyncio.run(run_scenarios(args, b, event_id))
+    meta = {
+        "git": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "users": args.users,
+        "window_s": args.window,
+        "rest_latency_ms": args.rest_latency_ms,
+        "rest_jitter_ms": args.rest_jitter_ms,
+        "seed": args.seed,
+        "runtime_s": round(time.perf_counter() - started, 1),
+    }
+    result = {"meta": meta, "scenarios": scenarios}
+
+    out = write_result("signup_load", result, args.out)
+
+    for name in ("signup_storm", "mass_cancel"):
+        s = scenarios[name]
+        print(f"[signup_load] {name}: {s['interactions']} Interaktionen, "
+              f"erste Antwort p50={s['first_response_ms']['p50']}ms p99={s['first_response_ms']['p99']}ms, "
+              f"REST={s['rest_calls_total']}, Queries/Interaktion={s['db_queries_per_interaction']}, "
+              f"Embed-Lag p99={s['embed_lag_ms']['p99']}ms")
+    pw = scenarios["password_fanout"]
+    print(f"[signup_load] password_fanout: {pw['recipients']} DMs in {pw['duration_ms']}ms, REST={pw['rest_calls_total']}")
+    print(f"[signup_load] Ergebnis: {out}")
+
+    if args.compare:
+        compare("signup_load", load_result(args.compare), result, COMPARE_KEYS, "scenarios")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-End-Lasttest der Bot-Handler (Fake-Discord)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--window", type=float, default=10.0, help="Sekunden, über die sich die Klicks verteilen")
+    parser.add_argument("--rest-latency-ms", type=float, default=40.0)
+    parser.add_argument("--rest-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", default=None, help="DB-Datei (Standard: temporär)")
+    parser.add_argument("--out", default=None, help="JSON-Datei (Standard: benchmarks/results/)")
+    parser.add_argument("--compare", default=None, help="früheres Ergebnis zum Vergleich")
+    args = parser.parse_args()
+
+    if args.db is None:
+        tmp = tempfile.mkdtemp(prefix="signup_load_")
+        args.db = os.path.join(tmp, "events.db")
+
+    run(args)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# Datei: benchmarks/stress_reserve_slot.py
+#
+# Stresstest für routes_utils.reserve_slot / cancel_signup:
+# viele Threads + Koroutinen melden sich gleichzeitig für dieselben Rollen an,
+# ein Teil der User (--cancel-ratio) meldet sich dazwischen wieder ab
+# (inkl. Nachrücken von der Warteliste).
+# Danach wird geprüft, dass
+#   - keine Rolle mehr 'active'-Anmeldungen hat als get_slots_for_role erlaubt,
+#   - niemand auf der Warteliste steht, während seine Rolle freie Slots hat,
+#   - jeder User höchstens eine laufende Anmeldung hat,
+#   - jeder User ohne Abmeldung (trotz Doppelklicks) genau einmal angemeldet wurde.
+#
+# Aufruf aus dem Repo-Root:
+#   python -m benchmarks.stress_reserve_slot --users 300 --threads 32 --cancel-ratio 0.3
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def setup_db(path):
+    # DB_PATH muss gesetzt sein, bevor webapp.db den Pool anlegt
+    os.environ["DB_PATH"] = path
+    from webapp import db
+    db.DB_PATH = path
+    db.init_db()
+
+    conn = db.get_connection()
+    c = conn.cursor()
+    c.execute("""
+        INSERT INTO events (
+            name, date_briefing,
+            inf_squads_allies, tank_squads_allies, sniper_squads_allies,
+            inf_squads_axis, tank_squads_axis, sniper_squads_axis,
+            max_commanders_allies, max_commanders_axis
+        ) VALUES ('Stresstest', '2099-01-01T20:00', 2, 1, 1, 2, 1, 1, 1, 1)
+    """)
+    event_id = c.lastrowid
+    conn.commit()
+    conn.close()
+    return event_id
+
+
+def run(args):
+    from webapp.routes_utils import cancel_signup, reserve_slot, get_event_dict, get_slots_for_role
+    from webapp.db import get_connection
+
+    event_id = setup_db(args.db)
+    roles = ["inf", "tank", "sniper", "commander"]
+    sides = ["allies", "axis"]
+
+    # Jeder User klickt 1-3 mal (Doppelklicks), teils auf verschiedene Rollen
+    clicks = []
+    for n in range(args.users):
+        for _ in range(random.randint(1, 3)):
+            clicks.append((f"user{n}", random.choice(sides), random.choice(roles)))
+    # Abmeldungen mitten im Ansturm (je nach Reihenfolge vor oder nach der Anmeldung)
+    cancellers = {f"user{n}" for n in range(args.users) if random.random() < args.cancel_ratio}
+    clicks.extend((user_id, None, None) for user_id in cancellers)
+    random.shuffle(clicks)
+    half = len(clicks) // 2
+
+    latencies = []
+    results = Counter()
+
+    def click(item):
+        user_id, side, role = item
+        started = time.perf_counter()
+        if side is None:
+            res = cancel_signup(user_id)
+            status = "cancelled" if res else "cancel_not_active"
+            if res and res[4]:
+                results["promoted"] += 1
+        else:
+            signup_id, status = reserve_slot(event_id, user_id, user_id, side, role)
+        latencies.append(time.perf_counter() - started)
+        results[status] += 1
+
+    async def coroutines(items):
+        # Koroutinen wie im Bot: blockierende DB-Arbeit in Threads auslagern
+        await asyncio.gather(*(asyncio.to_thread(click, item) for item in items))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        futures = [pool.submit(click, item) for item in clicks[:half]]
+        asyncio.run(coroutines(clicks[half:]))
+        for f in futures:
+            f.result()
+    elapsed = time.perf_counter() - started
+
+    # Invarianten prüfen
+    evt = get_event_dict(event_id)
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("""
+        SELECT seite, rolle, COUNT(*)
+        FROM signups
+        WHERE event_id=? AND status='active'
+        GROUP BY seite, rolle
+    """, (event_id,))
+    overbooked = [
+        (seite, rolle, cnt, get_slots_for_role(evt, seite, rolle))
+        for seite, rolle, cnt in c.fetchall()
+        if cnt > get_slots_for_role(evt, seite, rolle)
+    ]
+    c.execute("""
+        SELECT seite, rolle,
+               SUM(status='active'), SUM(status='waiting')
+        FROM signups
+        WHERE event_id=?
+        GROUP BY seite, rolle
+    """, (event_id,))
+    stuck = [
+        (seite, rolle, active, waiting, get_slots_for_role(evt, seite, rolle))
+        for seite, rolle, active, waiting in c.fetchall()
+        if waiting and active < get_slots_for_role(evt, seite, rolle)
+    ]
+    c.execute("""
+        SELECT user_id, COUNT(*)
+        FROM signups
+        WHERE event_id=? AND status IN ('active','waiting')
+        GROUP BY user_id
+    """, (event_id,))
+    per_user = dict(c.fetchall())
+    conn.close()
+
+    duplicates = {u: n for u, n in per_user.items() if n > 1}
+    missing = [f"user{n}" for n in range(args.users)
+               if f"user{n}" not in per_user and f"user{n}" not in cancellers]
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"[stress_reserve_slot] {len(clicks)} Klicks von {args.users} Usern "
+          f"({len(cancellers)} mit Abmeldung) in {elapsed:.2f}s")
+    print(f"[stress_reserve_slot] Ergebnisse: {dict(results)}")
+    print(f"[stress_reserve_slot] Latenz p50={p50:.1f}ms p99={p99:.1f}ms")
+
+    ok = True
+    if overbooked:
+        ok = False
+        print(f"[stress_reserve_slot] FEHLER überbucht: {overbooked}")
+    if stuck:
+        ok = False
+        print(f"[stress_reserve_slot] FEHLER Warteliste trotz freier Slots: {stuck}")
+    if duplicates:
+        ok = False
+        print(f"[stress_reserve_slot] FEHLER doppelte Anmeldungen: {duplicates}")
+    if missing:
+        ok = False
+        print(f"[stress_reserve_slot] FEHLER nicht angemeldet: {missing[:10]} ...")
+    print("[stress_reserve_slot] OK" if ok else "[stress_reserve_slot] FEHLGESCHLAGEN")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stresstest für reserve_slot/cancel_signup")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--cancel-ratio", type=float, default=0.3, help="Anteil der User, die sich wieder abmelden")
+    parser.add_argument("--db", default=None, help="DB-Datei (Standard: temporär)")
+    args = parser.parse_args()
+
+    if args.db is None:
+        tmp = tempfile.mkdtemp(prefix="stress_reserve_")
+        args.db = os.path.join(tmp, "events.db")
+
+    sys.exit(0 if run(args) else 1)
+
+
+if __name__ == "__main__":
+    main()
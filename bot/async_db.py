@@ -0,0 +1,398 @@
+# Datei: bot/async_db.py
+#
+# Nicht-blockierender DB-Zugriff für den asyncio-Loop des Bots.
+#  - DBExecutor: eigene Worker-Threads (BOT_DB_THREADS) für alle sqlite-Aufrufe;
+#    der Loop wartet per await, statt im Aufruf zu hängen. Pro Query-Name werden
+#    Anzahl, Gesamt- und Maximaldauer gezählt; langsame Queries werden geloggt.
+#  - EventRepository / SignupRepository / BotStateRepository /
+#    GuildSettingsRepository: die Queries des Bots als async-Methoden
+#    (dieselben Verbindungen aus webapp.db).
+#  - LoopWatchdog: Wächter-Thread, der meldet, wenn der Loop länger als
+#    LOOP_BLOCK_WARN_MS blockiert ist - inkl. Stacktrace der blockierenden Stelle.
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from webapp.db import get_connection
+from webapp.metrics import registry
+from webapp.roster_projection import get_roster_projection
+from webapp.routes_utils import bump_event_version
+
+BOT_DB_THREADS = int(os.getenv("BOT_DB_THREADS", 2))
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", 200))
+LOOP_BLOCK_WARN_MS = float(os.getenv("LOOP_BLOCK_WARN_MS", 100))
+
+QUERY_SECONDS = registry.histogram(
+    "bot_db_query_seconds", "Dauer der DB-Aufrufe des Bots pro Query-Name (im Worker-Thread)", ("query",),
+)
+QUERY_ERRORS = registry.counter(
+    "bot_db_query_errors_total", "Fehlgeschlagene DB-Aufrufe des Bots pro Query-Name", ("query",),
+)
+
+
+class QueryStats:
+    __slots__ = ("count", "errors", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+class DBExecutor:
+    """
+    Führt synchrone DB-Funktionen in eigenen Threads aus:
+        row = await db.run("events.get", _fetch_event, event_id)
+    """
+
+    def __init__(self, threads=BOT_DB_THREADS, slow_ms=DB_SLOW_QUERY_MS):
+        self.slow = slow_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="bot-db")
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _timed(self, name, fn, args, kwargs):
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            QUERY_SECONDS.observe(elapsed, name)
+            if not ok:
+                QUERY_ERRORS.inc(name)
+            with self._lock:
+                st = self._stats.get(name)
+                if st is None:
+                    st = self._stats[name] = QueryStats()
+                st.count += 1
+                st.total += elapsed
+                st.max = max(st.max, elapsed)
+                if not ok:
+                    st.errors += 1
+            if elapsed >= self.slow:
+                print(f"[DBExecutor] Langsame Query '{name}': {elapsed * 1000:.0f} ms")
+
+    async def run(self, name, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._timed, name, fn, args, kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: st.as_dict() for name, st in sorted(self._stats.items())}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+#########################################
+# Synchrone Queries (laufen im DBExecutor)
+#########################################
+
+def _fetch_dicts(sql, params=()):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(sql, params)
+    cols = [desc[0] for desc in c.description]
+    rows = [dict(zip(cols, r)) for r in c.fetchall()]
+    conn.close()
+    return rows
+
+def _fetch_all(sql, params=()):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(sql, params)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def _execute(sql, params=()):
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+def _save_guild_channel(guild_id, guild_name, channel_id):
+    """
+    Speichert den Event-Kanal der Guild. Ist es der erste guild_settings-Eintrag
+    überhaupt, übernimmt die Guild in derselben Transaktion die Events ohne
+    Guild (Altbestand aus dem Ein-Guild-Betrieb). Gibt die Anzahl übernommener
+    Events zurück.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        # Schreib-Lock sofort holen -> "erste Guild?" und Übernahme sind eine Einheit
+        c.execute("BEGIN IMMEDIATE")
+        c.execute("SELECT 1 FROM guild_settings LIMIT 1")
+        first = c.fetchone() is None
+        c.execute("""
+            INSERT INTO guild_settings (guild_id, guild_name, event_channel_id, updated_at)
+            VALUES (?,?,?,datetime('now'))
+            ON CONFLICT(guild_id) DO UPDATE SET
+                guild_name=excluded.guild_name,
+                event_channel_id=excluded.event_channel_id,
+                updated_at=excluded.updated_at
+        """, (str(guild_id), guild_name, str(channel_id)))
+        claimed = []
+        if first:
+            c.execute("SELECT id FROM events WHERE guild_id IS NULL")
+            claimed = [row[0] for row in c.fetchall()]
+            c.execute("UPDATE events SET guild_id=? WHERE guild_id IS NULL", (str(guild_id),))
+            for event_id in claimed:
+                bump_event_version(c, event_id, kind="event")
+        conn.commit()
+        return len(claimed)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+class EventRepository:
+    def __init__(self, db: DBExecutor):
+        self.db = db
+
+    async def get(self, event_id) -> dict:
+        rows = await self.db.run("events.get", _fetch_dicts,
+                                 "SELECT * FROM events WHERE id=?", (event_id,))
+        return rows[0] if rows else {}
+
+    async def message_state(self, event_id):
+        """
+        (info_id, allies_id, axis_id, info_hash, allies_hash, axis_hash) oder None.
+        """
+        rows = await self.db.run("events.message_state", _fetch_all, """
+            SELECT info_message_id, allies_message_id, axis_message_id,
+                   info_embed_hash, allies_embed_hash, axis_embed_hash
+            FROM events
+            WHERE id=?
+        """, (event_id,))
+        return rows[0] if rows else None
+
+    async def save_embed_hashes(self, event_id, hashes: dict):
+        await self.db.run("events.save_embed_hashes", _execute, """
+            UPDATE events
+            SET info_embed_hash=?, allies_embed_hash=?, axis_embed_hash=?
+            WHERE id=?
+        """, (hashes["info"], hashes["allies"], hashes["axis"], event_id))
+
+    async def load_unposted(self, now, lead) -> list:
+        """
+        Alle Events mit posted_in_discord=0 im Posting-Fenster (1 Query).
+        """
+        return await self.db.run("events.load_unposted", _fetch_dicts, """
+            SELECT *
+            FROM events
+            WHERE posted_in_discord=0
+              AND date_eventstart IS NOT NULL
+              AND datetime(date_eventstart) > datetime(?)
+              AND datetime(date_eventstart) <= datetime(?)
+            ORDER BY datetime(date_eventstart) ASC, id ASC
+        """, (now.isoformat(), (now + lead).isoformat()))
+
+    async def save_post_checkpoint(self, event_id, part, msg_id):
+        await self.db.run("events.save_post_checkpoint", _execute,
+                          f"UPDATE events SET {part}_message_id=? WHERE id=?",
+                          (str(msg_id), event_id))
+
+    async def finish_post(self, event_id, msg_ids: dict, hashes: dict, channel_id):
+        """
+        Eine Transaktion: alle drei Nachrichten-IDs + Embed-Hashes + Kanal + posted_in_discord=1.
+        """
+        await self.db.run("events.finish_post", _execute, """
+            UPDATE events
+            SET info_message_id=?, allies_message_id=?, axis_message_id=?,
+                info_embed_hash=?, allies_embed_hash=?, axis_embed_hash=?,
+                channel_id=?, posted_in_discord=1
+            WHERE id=?
+        """, (
+            str(msg_ids["info"]), str(msg_ids["allies"]), str(msg_ids["axis"]),
+            hashes["info"], hashes["allies"], hashes["axis"],
+            str(channel_id), event_id
+        ))
+
+    async def mark_pw_sent(self, event_id):
+        await self.db.run("events.mark_pw_sent", _execute,
+                          "UPDATE events SET pw_sent=1 WHERE id=?", (event_id,))
+
+    async def event_for_signup_message(self, message_id):
+        """
+        Event-ID zur Nachricht mit den Anmelde-Buttons (axis_message_id) oder None.
+        """
+        rows = await self.db.run("events.by_signup_message", _fetch_all,
+                                 "SELECT id FROM events WHERE axis_message_id=?",
+                                 (str(message_id),))
+        return rows[0][0] if rows else None
+
+
+class SignupRepository:
+    """
+    Anmeldungen über die RosterEngine (Speicherstand + DB), aber im DBExecutor.
+    Nach await roster_event()/reserve()/cancel() sind die synchronen
+    Lesezugriffe der Engine (role_options, event) für das Event reine Speicherzugriffe.
+    """
+
+    def __init__(self, db: DBExecutor, roster):
+        self.db = db
+        self.roster = roster
+
+    async def roster_event(self, event_id) -> dict:
+        return await self.db.run("roster.event", self.roster.event, event_id)
+
+    async def event_roster(self, event_id):
+        """
+        EventRoster (ggf. frisch geladen) oder None, falls das Event nicht existiert.
+        """
+        return await self.db.run("roster.get", self.roster.get, event_id)
+
+    async def projection(self, event_id):
+        return await self.db.run("roster.projection", get_roster_projection, event_id)
+
+    async def reserve(self, event_id, user_id, user_name, seite, rolle):
+        return await self.db.run("signups.reserve", self.roster.reserve,
+                                 event_id, user_id, user_name, seite, rolle)
+
+    async def cancel(self, user_id):
+        return await self.db.run("signups.cancel", self.roster.cancel_signup, user_id)
+
+    async def active_user_ids(self, event_id) -> list:
+        rows = await self.db.run("signups.active_user_ids", _fetch_all,
+                                 "SELECT user_id FROM signups WHERE event_id=? AND status='active'",
+                                 (event_id,))
+        return [row[0] for row in rows]
+
+
+class BotStateRepository:
+    def __init__(self, db: DBExecutor):
+        self.db = db
+
+    async def event_channel_id(self):
+        """
+        Kanal aus dem Ein-Guild-Betrieb (nur noch zur Übernahme nach guild_settings).
+        """
+        rows = await self.db.run("bot_state.get", _fetch_all,
+                                 "SELECT event_channel_id FROM bot_state WHERE id=1")
+        if rows and rows[0][0]:
+            return int(rows[0][0])
+        return None
+
+    async def changes_cursor(self):
+        """
+        Zuletzt verarbeitete changes.id oder None (Feed noch nie gelesen).
+        """
+        rows = await self.db.run("bot_state.changes_cursor", _fetch_all,
+                                 "SELECT changes_cursor FROM bot_state WHERE id=1")
+        return rows[0][0] if rows else None
+
+    async def save_changes_cursor(self, change_id):
+        await self.db.run("bot_state.save_changes_cursor", _execute,
+                          "UPDATE bot_state SET changes_cursor=? WHERE id=1",
+                          (change_id,))
+
+
+class GuildSettingsRepository:
+    """
+    Event-Kanal pro Guild (Tabelle guild_settings).
+    """
+
+    def __init__(self, db: DBExecutor):
+        self.db = db
+
+    async def channels(self) -> dict:
+        """
+        {guild_id (str): event_channel_id (int)} aller eingerichteten Guilds.
+        """
+        rows = await self.db.run("guild_settings.all", _fetch_all,
+                                 "SELECT guild_id, event_channel_id FROM guild_settings")
+        return {str(gid): int(cid) for gid, cid in rows if cid}
+
+    async def save_channel(self, guild_id, guild_name, channel_id) -> int:
+        """
+        Kanal speichern; die erste Guild übernimmt die Events ohne Guild
+        (eine Transaktion, siehe _save_guild_channel). Gibt die Anzahl
+        übernommener Events zurück.
+        """
+        return await self.db.run("guild_settings.save", _save_guild_channel,
+                                 guild_id, guild_name, channel_id)
+
+
+#########################################
+# Loop-Watchdog
+#########################################
+
+class LoopWatchdog:
+    """
+    Der Loop setzt alle interval Sekunden einen Herzschlag; ein Wächter-Thread
+    prüft ihn. Bleibt der Herzschlag länger als threshold_ms aus, hängt gerade
+    ein Callback synchron im Loop: der Stack des Loop-Threads wird einmal
+    geloggt, nach dem Ende der Blockade die Gesamtdauer.
+    """
+
+    def __init__(self, threshold_ms=LOOP_BLOCK_WARN_MS, interval=0.05):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.stats = {"blocks": 0, "max_block_ms": 0.0, "last_block_ms": 0.0}
+        self._beat = time.monotonic()
+        self._loop = None
+        self._loop_thread_id = None
+        self._handle = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _heartbeat(self):
+        self._beat = time.monotonic()
+        self._handle = self._loop.call_later(self.interval, self._heartbeat)
+
+    def start(self, loop=None):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._heartbeat()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _watch(self):
+        blocked_since = None
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            lag = now - self._beat - self.interval
+            if lag > self.threshold:
+                if blocked_since is None:
+                    blocked_since = self._beat + self.interval
+                    frame = sys._current_frames().get(self._loop_thread_id)
+                    stack = "".join(traceback.format_stack(frame, limit=8)) if frame else "?"
+                    print(f"[LoopWatchdog] Event-Loop blockiert seit {lag * 1000:.0f} ms:\n{stack}")
+            elif blocked_since is not None:
+                duration = (self._beat - blocked_since) * 1000
+                self.stats["blocks"] += 1
+                self.stats["last_block_ms"] = round(duration, 1)
+                self.stats["max_block_ms"] = round(max(self.stats["max_block_ms"], duration), 1)
+                print(f"[LoopWatchdog] Event-Loop wieder frei nach {duration:.0f} ms.")
+                blocked_since = None
@@ -1,151 +1,144 @@
 import os
-import sqlite3
+import json
+import hashlib
 import discord
 from discord.ext import commands, tasks
 from discord import app_commands
 import asyncio
+import time
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
 # Deine DB-Funktionen, Routen-Utils etc.
-from webapp.db import get_connection
-from webapp.routes_utils import (
-    create_signup,
-    cancel_signup,
-    get_slots_for_role,
-    count_signups
+from webapp.roster_engine import RosterEngine
+from bot.async_db import (
+    DBExecutor, EventRepository, SignupRepository, BotStateRepository,
+    GuildSettingsRepository, LoopWatchdog,
 )
+from bot.update_scheduler import RateLimitTracker, EmbedUpdateScheduler
+from bot.dm_dispatcher import DMDispatcher, DM_RESULTS
+from bot.interaction_metrics import InteractionMetrics
+from bot.deadline_scheduler import DeadlineScheduler, EVENT_POST_LEAD
+from bot.change_feed import ChangeFeed
+from webapp.recurrence import materialise_for_event, materialise_series
+from webapp import metrics, notify
 
 load_dotenv()
 DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
+# Eigener /metrics-Server des Bots (für "python main.py bot"; 0 = aus)
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", 0))
+BOT_METRICS_HOST = os.getenv("BOT_METRICS_HOST", "127.0.0.1")
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+# Liest die X-RateLimit-Header aller REST-Antworten mit
+rate_limits = RateLimitTracker()
 
-EVENT_CHANNEL_ID = None
+# Viele Guilds: AutoShardedBot verteilt die Gateway-Last auf mehrere Shards
+# (Anzahl empfiehlt Discord, optional fest über BOT_SHARD_COUNT)
+BOT_SHARDED = os.getenv("BOT_SHARDED", "0") == "1"
+BOT_SHARD_COUNT = int(os.getenv("BOT_SHARD_COUNT", 0)) or None
 
-# NEU: Hier sammeln wir Events, die aktualisiert werden müssen
-update_queue = set()
+if BOT_SHARDED:
+    bot = commands.AutoShardedBot(command_prefix="!", intents=intents, shard_count=BOT_SHARD_COUNT,
+                                  http_trace=rate_limits.trace_config)
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents, http_trace=rate_limits.trace_config)
 
-#########################################
-# 1) Spalten anlegen, falls sie fehlen
-#########################################
+# Event-Kanal pro Guild: {guild_id (str): channel_id (int)}, aus guild_settings
+guild_channels = {}
 
-def ensure_event_columns_exist():
-    """
-    Prüft, ob bestimmte Spalten existieren, 
-    und legt sie ggf. an:
-      - info_message_id, allies_message_id, axis_message_id, posted_in_discord
-      - pw_sent
-    """
-    conn = get_connection()
-    c = conn.cursor()
+# Alle sqlite-Zugriffe des Bots laufen in eigenen Threads (nie direkt im Event-Loop)
+db = DBExecutor()
+loop_watchdog = LoopWatchdog()
 
-    # Block A: info_message_id & Co
-    try:
-        c.execute("SELECT info_message_id FROM events LIMIT 1")
-    except sqlite3.OperationalError:
-        print("[ensure_event_columns_exist] info_message_id fehlt -> lege Spalten an ...")
-        try:
-            c.execute("ALTER TABLE events ADD COLUMN info_message_id TEXT")
-            c.execute("ALTER TABLE events ADD COLUMN allies_message_id TEXT")
-            c.execute("ALTER TABLE events ADD COLUMN axis_message_id TEXT")
-            c.execute("ALTER TABLE events ADD COLUMN posted_in_discord INTEGER DEFAULT 0")
-            conn.commit()
-            print("[ensure_event_columns_exist] info/allies/axis_message_id + posted_in_discord angelegt.")
-        except Exception as e:
-            print(f"[ensure_event_columns_exist] Fehler: {e}")
-
-    # Block B: pw_sent
-    try:
-        c.execute("SELECT pw_sent FROM events LIMIT 1")
-    except sqlite3.OperationalError:
-        print("[ensure_event_columns_exist] pw_sent fehlt -> anlegen ...")
-        try:
-            c.execute("ALTER TABLE events ADD COLUMN pw_sent INTEGER DEFAULT 0")
-            conn.commit()
-            print("[ensure_event_columns_exist] Spalte pw_sent=0 angelegt.")
-        except Exception as e:
-            print(f"[ensure_event_columns_exist] Fehler bei ALTER TABLE pw_sent: {e}")
+# Slots/Wartelisten pro Event im Speicher (Schreiben geht direkt an die DB durch)
+roster = RosterEngine()
+
+events_repo = EventRepository(db)
+signups_repo = SignupRepository(db, roster)
+bot_state_repo = BotStateRepository(db)
+guild_settings_repo = GuildSettingsRepository(db)
+
+# Paralleler, gedrosselter DM-Versand mit Zustellstatus in dm_deliveries
+dm_dispatcher = DMDispatcher(bot, db=db)
 
-    conn.close()
+# Zeit bis zur ersten Antwort pro Interaktions-Typ (Discord-Limit: 3 Sekunden)
+interaction_metrics = InteractionMetrics()
+
+# Referenzen auf Hintergrund-Tasks (sonst kann der GC sie einsammeln)
+background_tasks = set()
+
+def spawn(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
 
 #########################################
-# 2) Kanal-ID aus bot_state laden/speichern
+# 1) Event-Kanäle pro Guild laden/speichern
 #########################################
 
-def load_event_channel_id():
-    global EVENT_CHANNEL_ID
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("SELECT event_channel_id FROM bot_state WHERE id=1")
-    row = c.fetchone()
-    conn.close()
-    if row and row[0]:
-        EVENT_CHANNEL_ID = int(row[0])
-        print(f"[load_event_channel_id] EVENT_CHANNEL_ID={EVENT_CHANNEL_ID}")
+async def load_guild_channels():
+    channels= await guild_settings_repo.channels()
+    if not channels:
+        # Altbestand: ein Kanal in bot_state (id=1) => als Guild-Eintrag übernehmen
+        legacy_id= await bot_state_repo.event_channel_id()
+        channel= bot.get_channel(legacy_id) if legacy_id else None
+        if channel and getattr(channel, "guild", None):
+            await guild_settings_repo.save_channel(channel.guild.id, channel.guild.name, channel.id)
+            channels= {str(channel.guild.id): channel.id}
+            print(f"[load_guild_channels] bot_state-Kanal {legacy_id} => Guild {channel.guild.id} übernommen.")
+    guild_channels.clear()
+    guild_channels.update(channels)
+    if guild_channels:
+        print(f"[load_guild_channels] Event-Kanäle: {guild_channels}")
     else:
-        print("[load_event_channel_id] Kein event_channel_id in bot_state (id=1) gefunden.")
-
-def save_event_channel_id(channel_id: int):
-    global EVENT_CHANNEL_ID
-    EVENT_CHANNEL_ID = channel_id
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("UPDATE bot_state SET event_channel_id=? WHERE id=1", (str(channel_id),))
-    conn.commit()
-    conn.close()
-    print(f"[save_event_channel_id] EVENT_CHANNEL_ID={EVENT_CHANNEL_ID} in DB gespeichert.")
+        print("[load_guild_channels] Noch kein Event-Kanal gesetzt (/set_event_channel).")
+
+async def save_event_channel(guild: discord.Guild, channel_id: int):
+    # Erste Guild übernimmt die Events ohne Guild (Ein-Guild-Betrieb) - ob sie
+    # die erste ist, entscheidet die DB-Transaktion, nicht guild_channels
+    claimed= await guild_settings_repo.save_channel(guild.id, guild.name, channel_id)
+    if claimed:
+        roster.invalidate()
+        print(f"[save_event_channel] Guild {guild.id}: {claimed} Events ohne Guild übernommen.")
+    guild_channels[str(guild.id)]= channel_id
+    print(f"[save_event_channel] Guild {guild.id}: Event-Kanal {channel_id} gespeichert.")
+
+def event_guild_id(evt: dict):
+    """
+    Guild eines Events; ohne guild_id die einzige eingerichtete Guild (sonst None).
+    """
+    gid= evt.get("guild_id") if evt else None
+    if gid:
+        return str(gid)
+    if len(guild_channels)==1:
+        return next(iter(guild_channels))
+    return None
+
+def event_channel(evt: dict, posted: bool = False):
+    """
+    Kanal für ein Event. Bereits gepostete Events bleiben in ihrem Kanal
+    (events.channel_id), auch wenn der Guild-Kanal inzwischen geändert wurde.
+    """
+    if posted and evt.get("channel_id"):
+        return bot.get_channel(int(evt["channel_id"]))
+    channel_id= guild_channels.get(event_guild_id(evt))
+    return bot.get_channel(channel_id) if channel_id else None
+
+def update_partition(event_id: int):
+    """
+    Partition für den Update-Scheduler (Guild), aus dem Roster-Speicher.
+    """
+    return event_guild_id(roster.cached_event(event_id))
 
 #########################################
-# DB-/ Hilfsfunktionen
+# Hilfsfunktionen
 #########################################
 
-def get_event_dict(event_id: int) -> dict:
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("SELECT * FROM events WHERE id=?", (event_id,))
-    row = c.fetchone()
-    if not row:
-        conn.close()
-        return {}
-    cols = [desc[0] for desc in c.description]
-    data= dict(zip(cols,row))
-    conn.close()
-    return data
-
-def get_signups_active(event_id: int):
-    conn= get_connection()
-    c= conn.cursor()
-    c.execute("""
-        SELECT user_name, seite, rolle
-        FROM signups
-        WHERE event_id=?
-          AND status='active'
-        ORDER BY id ASC
-    """,(event_id,))
-    rows= c.fetchall()
-    conn.close()
-    return rows
-
-def user_already_signedup(event_id: int, user_id: str) -> bool:
-    conn= get_connection()
-    c= conn.cursor()
-    c.execute("""
-        SELECT COUNT(*)
-        FROM signups
-        WHERE event_id=? AND user_id=? AND status IN ('active','waiting')
-    """,(event_id,user_id))
-    count= c.fetchone()[0]
-    conn.close()
-    return (count>0)
-
-def chunk(lst, size):
-    return [lst[i:i+size] for i in range(0,len(lst),size)]
-
 def german_datetime_format(dt_str):
     if not dt_str:
         return ""
@@ -200,27 +193,24 @@ def build_info_embed(evt: dict) -> discord.Embed:
 
     return embed
 
-def build_allies_embed(evt: dict) -> discord.Embed:
+def build_side_embed(evt: dict, projection: dict, side: str, title: str, color: discord.Color, thumb: str, footer_label: str) -> discord.Embed:
+    """
+    Lineup-Embed einer Seite aus der gemeinsamen Roster-Projektion
+    (eine gecachte Gruppierung für Allies, Axis und die Web-Detailseite,
+    vorher per await signups_repo.projection() geladen).
+    """
     evt_id= evt["id"]
-    embed= discord.Embed(title=f"Alliierte (Event {evt_id})",color=discord.Color.blue())
-    embed.set_thumbnail(url="https://via.placeholder.com/80x80.png?text=Allies")
+    embed= discord.Embed(title=f"{title} (Event {evt_id})", color=color)
+    embed.set_thumbnail(url=f"https://via.placeholder.com/80x80.png?text={thumb}")
 
-    signups= get_signups_active(evt_id)
-    roles_map= {"inf":[],"tank":[],"sniper":[],"commander":[]}
-    for (uname, seite, rolle) in signups:
-        if seite=="allies" and rolle in roles_map:
-            roles_map[rolle].append(uname)
+    squads_by_role= projection[side] if projection else {}
 
     role_emoji= {"inf":"🪖","tank":"🛡️","sniper":"🎯","commander":"⭐"}
     roles_order= ["inf","tank","sniper","commander"]
     label_map= {"inf":"Infanterie","tank":"Panzer","sniper":"Sniper","commander":"Commander"}
-    sq_size= {"inf":6,"tank":3,"sniper":2,"commander":1}
 
-    total_allies= 0
     for r in roles_order:
-        players= roles_map[r]
-        total_allies+= len(players)
-        squads= chunk(players, sq_size[r])
+        squads= squads_by_role.get(r, [])
         if squads:
             for idx, sq in enumerate(squads,start=1):
                 sq_name= f"{role_emoji[r]} {label_map[r]}-Squad #{idx}"
@@ -229,44 +219,28 @@ def build_allies_embed(evt: dict) -> discord.Embed:
         else:
             embed.add_field(name=f"{role_emoji[r]} {label_map[r]}", value="Keine Spieler", inline=True)
 
-    if total_allies>0:
-        total_allies-=1
-    embed.set_footer(text=f"Allies - Gesamt: {total_allies} (1 Admin abgezogen)")
+    total= projection["totals"][side] if projection else 0
+    if total>0:
+        total-=1
+    embed.set_footer(text=f"{footer_label} - Gesamt: {total} (1 Admin abgezogen)")
     return embed
 
-def build_axis_embed(evt: dict) -> discord.Embed:
-    evt_id= evt["id"]
-    embed= discord.Embed(title=f"Achsenmächte (Event {evt_id})", color=discord.Color.red())
-    embed.set_thumbnail(url="https://via.placeholder.com/80x80.png?text=Axis")
-
-    signups= get_signups_active(evt_id)
-    roles_map= {"inf":[],"tank":[],"sniper":[],"commander":[]}
-    for (uname,seite,rolle) in signups:
-        if seite=="axis" and rolle in roles_map:
-            roles_map[rolle].append(uname)
-
-    role_emoji= {"inf":"🪖","tank":"🛡️","sniper":"🎯","commander":"⭐"}
-    roles_order= ["inf","tank","sniper","commander"]
-    label_map= {"inf":"Infanterie","tank":"Panzer","sniper":"Sniper","commander":"Commander"}
-    sq_size= {"inf":6,"tank":3,"sniper":2,"commander":1}
+def build_allies_embed(evt: dict, projection: dict) -> discord.Embed:
+    return build_side_embed(evt, projection, "allies", "Alliierte", discord.Color.blue(), "Allies", "Allies")
 
-    total_axis= 0
-    for r in roles_order:
-        players= roles_map[r]
-        total_axis+= len(players)
-        squads= chunk(players, sq_size[r])
-        if squads:
-            for idx, sq in enumerate(squads, start=1):
-                sq_name= f"{role_emoji[r]} {label_map[r]}-Squad #{idx}"
-                sq_text= "\n".join(f"- {u}" for u in sq) if sq else "(leer)"
-                embed.add_field(name=sq_name, value=sq_text, inline=True)
-        else:
-            embed.add_field(name=f"{role_emoji[r]} {label_map[r]}", value="Keine Spieler", inline=True)
+def build_axis_embed(evt: dict, projection: dict) -> discord.Embed:
+    return build_side_embed(evt, projection, "axis", "Achsenmächte", discord.Color.red(), "Axis", "Axis")
 
-    if total_axis>0:
-        total_axis-=1
-    embed.set_footer(text=f"Axis - Gesamt: {total_axis} (1 Admin abgezogen)")
-    return embed
+def embed_payload_hash(embed: discord.Embed, view: discord.ui.View = None) -> str:
+    """
+    Inhalts-Hash einer Nachricht (Embed.to_dict() + Komponenten der View).
+    Gleicher Hash => Nachricht muss nicht neu editiert werden.
+    """
+    payload= {"embed": embed.to_dict()}
+    if view is not None:
+        payload["components"]= view.to_components()
+    raw= json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 def build_password_embed(evt: dict) -> discord.Embed:
     event_name= evt.get("name","(NoName)")
@@ -298,234 +272,251 @@ def signups_still_open(evt: dict) -> bool:
     except:
         return True
 
-# Wir machen Debounce => update_queue
+def update_priority(event_id: int) -> float:
+    """
+    Sekunden bis zum Briefing (kleiner = dringender), aus dem Roster-Speicher.
+    Events mit vergangenem Briefing (Buttons schließen) kommen zuerst.
+    Nur bereits geladene Roster (läuft synchron im Loop => keine Query).
+    """
+    evt= roster.cached_event(event_id)
+    dtb= evt.get("date_briefing") if evt else None
+    if not dtb:
+        return float("inf")
+    try:
+        return max(0.0, (datetime.fromisoformat(dtb) - datetime.now()).total_seconds())
+    except ValueError:
+        return float("inf")
+
+# Zuletzt gesendete Embed-Hashes pro Event: {event_id: {"info": h, "allies": h, "axis": h}}
+# (zusätzlich in events.*_embed_hash gespeichert, damit ein Neustart nicht alles neu editiert)
+embed_hashes= {}
+
+# Editierbare Handles der Event-Nachrichten (info/allies/axis_message_id -> PartialMessage).
+# PartialMessage braucht keinen fetch_message-GET; verworfen wird nur bei discord.NotFound.
+message_handles= {}
+
+def get_message_handle(channel, msg_id) -> discord.PartialMessage:
+    msg_id= int(msg_id)
+    handle= message_handles.get(msg_id)
+    if handle is None or handle.channel.id != channel.id:
+        handle= channel.get_partial_message(msg_id)
+        message_handles[msg_id]= handle
+    return handle
+
+# Debounce/Coalescing übernimmt der Scheduler
 def add_event_to_update_queue(event_id: int):
-    update_queue.add(event_id)
+    update_scheduler.schedule(event_id)
 
 async def really_update_event_embeds(event_id: int):
     """
     Führt tatsächlich das Patchen der Discord-Messages durch.
+    Die drei Nachrichten werden parallel bearbeitet; gebremst wird nur,
+    wenn das Rate-Limit-Budget der Route laut Discord-Headern erschöpft ist.
+    Nachrichten, deren gerenderter Inhalt sich nicht geändert hat, werden übersprungen.
     """
     print(f"[really_update_event_embeds] Starte Update für Event {event_id}")
 
-    conn= get_connection()
-    c= conn.cursor()
-    c.execute("""
-        SELECT info_message_id, allies_message_id, axis_message_id
-        FROM events
-        WHERE id=?
-    """,(event_id,))
-    row= c.fetchone()
-    conn.close()
+    row= await events_repo.message_state(event_id)
     if not row:
         print(f"[really_update_event_embeds] Event {event_id} nicht gefunden.")
         return
-    info_id, allies_id, axis_id= row
+    info_id, allies_id, axis_id= row[:3]
     if not info_id or not allies_id or not axis_id:
         print(f"[really_update_event_embeds] Keine Msg-IDs für Event {event_id}.")
         return
 
-    evt= get_event_dict(event_id)
+    evt= await signups_repo.roster_event(event_id)
     if not evt:
         return
-    if not EVENT_CHANNEL_ID:
-        print("[really_update_event_embeds] Kein EVENT_CHANNEL_ID.")
-        return
-    channel= bot.get_channel(EVENT_CHANNEL_ID)
+    channel= event_channel(evt, posted=True)
     if not channel:
-        print("[really_update_event_embeds] Channel nicht gefunden.")
+        print(f"[really_update_event_embeds] Kein Kanal für Event {event_id} (Guild {evt.get('guild_id')}).")
         return
 
+    projection= await signups_repo.projection(event_id)
     emb_info   = build_info_embed(evt)
-    emb_allies = build_allies_embed(evt)
-    emb_axis   = build_axis_embed(evt)
-    sign_up_view= SignUpButtonViewMulti(event_id)
-
-    try:
-        msg_info   = await channel.fetch_message(int(info_id))
-        msg_allies = await channel.fetch_message(int(allies_id))
-        msg_axis   = await channel.fetch_message(int(axis_id))
-
-        # Um Rate-Limit-Spikes zu vermeiden, machen wir kleine Pausen
-        await msg_info.edit(embed=emb_info)
-        await asyncio.sleep(1)
-        await msg_allies.edit(embed=emb_allies)
-        await asyncio.sleep(1)
-        await msg_axis.edit(embed=emb_axis, view=sign_up_view)
-
-        print(f"[really_update_event_embeds] -> Embeds für Event {event_id} aktualisiert.")
-    except discord.NotFound:
-        print("[really_update_event_embeds] Mind. eine Nachricht nicht gefunden.")
-    except discord.HTTPException as e:
-        print(f"[really_update_event_embeds] HTTP-Fehler: {e}")
-
-@tasks.loop(seconds=5)
-async def process_update_queue():
-    """
-    Alle 5 Sek. holen wir uns die Warteschlange (update_queue),
-    und aktualisieren die Events nacheinander, um 429-Fehler zu minimieren.
-    """
-    global update_queue
-    if not update_queue:
+    emb_allies = build_allies_embed(evt, projection)
+    emb_axis   = build_axis_embed(evt, projection)
+    sign_up_view= SignUpButtonViewMulti(event_id, evt)
+
+    # Nur Nachrichten patchen, deren Inhalt sich wirklich geändert hat
+    last= embed_hashes.get(event_id)
+    if last is None:
+        last= {"info": row[3], "allies": row[4], "axis": row[5]}
+    wanted= {
+        "info":   (info_id,   {"embed": emb_info}, embed_payload_hash(emb_info)),
+        "allies": (allies_id, {"embed": emb_allies}, embed_payload_hash(emb_allies)),
+        "axis":   (axis_id,   {"embed": emb_axis, "view": sign_up_view},
+                   embed_payload_hash(emb_axis, sign_up_view)),
+    }
+    changed= {k: v for k, v in wanted.items() if last.get(k) != v[2]}
+    if not changed:
+        embed_hashes[event_id]= last
+        print(f"[really_update_event_embeds] Event {event_id}: keine Änderung.")
         return
 
-    to_update = list(update_queue)
-    update_queue.clear()
-
-    # Optionale Pause, wenn man "debouncen" möchte
-    # await asyncio.sleep(3)
-
-    for evt_id in to_update:
-        # Warte 2 Sek zwischen den Events
-        await asyncio.sleep(2)
-        await really_update_event_embeds(evt_id)
+    async def edit_message(msg_id, **kwargs):
+        await rate_limits.acquire(f"PATCH /channels/{channel.id}/messages/{{id}}")
+        try:
+            await get_message_handle(channel, msg_id).edit(**kwargs)
+        except discord.NotFound:
+            message_handles.pop(int(msg_id), None)
+            raise
+
+    keys= list(changed)
+    results= await asyncio.gather(
+        *(edit_message(changed[k][0], **changed[k][1]) for k in keys),
+        return_exceptions=True
+    )
+    new_hashes= dict(last)
+    failed= False
+    for k, res in zip(keys, results):
+        if isinstance(res, discord.NotFound):
+            failed= True
+            print("[really_update_event_embeds] Mind. eine Nachricht nicht gefunden.")
+        elif isinstance(res, discord.HTTPException):
+            failed= True
+            print(f"[really_update_event_embeds] HTTP-Fehler: {res}")
+        elif isinstance(res, Exception):
+            raise res
+        else:
+            new_hashes[k]= changed[k][2]
+
+    embed_hashes[event_id]= new_hashes
+    await events_repo.save_embed_hashes(event_id, new_hashes)
+    if not failed:
+        print(f"[really_update_event_embeds] -> {', '.join(keys)} für Event {event_id} aktualisiert.")
+
+# Ersetzt den alten 5-Sekunden-Loop process_update_queue
+# Warteschlange pro Guild, Guilds reihum (eine volle Guild bremst die anderen nicht)
+update_scheduler= EmbedUpdateScheduler(
+    really_update_event_embeds,
+    priority_fn=update_priority,
+    partition_fn=update_partition,
+)
 
 #########################################
 # EIGENTLICHE VIEWS
 #########################################
 
-class SignUpButtonViewMulti(discord.ui.View):
-    def __init__(self, event_id: int):
-        super().__init__(timeout=None)
-        self.event_id= event_id
-
-        # Falls signups geschlossen
-        evt= get_event_dict(self.event_id)
-        if not signups_still_open(evt):
-            for child in self.children:
-                child.disabled= True
-
-    @discord.ui.button(
-        label="Alliierte beitreten",
-        style=discord.ButtonStyle.success,
-        custom_id="signup_button_allies"
-    )
-    async def allies_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        evt= get_event_dict(self.event_id)
-        if not signups_still_open(evt):
-            await interaction.response.send_message(
-                "Anmeldeschluss erreicht (Briefing hat begonnen).",
-                ephemeral=True
-            )
-            return
+async def open_role_select(interaction: discord.Interaction, event_id: int, side: str):
+    """
+    Antwortet sofort, wenn ein frisches Roster im Speicher liegt; sonst erst
+    defer(), dann (im DBExecutor) laden und das Rollen-Menü als Followup schicken.
+    """
+    started= time.perf_counter()
+    view_cls= AlliesSelectViewMulti if side=="allies" else AxisSelectViewMulti
+    # Nur ein nicht abgelaufenes Roster: ein veraltetes würde get() im Loop nachladen
+    event_roster= roster.cached_roster(event_id)
+    deferred= False
+    if event_roster is None:
+        await interaction_metrics.ack(interaction, "signup_button", started, ephemeral=True, thinking=True)
+        deferred= True
+        event_roster= await signups_repo.event_roster(event_id)
+    evt= event_roster.event if event_roster else {}
 
-        view= AlliesSelectViewMulti(interaction.user.id, self.event_id)
-        await interaction.response.send_message(
-            f"Rollen (Allies) für Event {self.event_id}:",
-            ephemeral=True,
-            view=view
-        )
+    if not evt:
+        msg= "Event nicht gefunden."
+        view= None
+    elif not signups_still_open(evt):
+        msg= "Anmeldeschluss erreicht (Briefing hat begonnen)."
+        view= None
+    else:
+        view= view_cls(interaction.user.id, event_id, event_roster)
+        msg= f"Rollen ({view.side_label}) für Event {event_id}:"
+
+    kwargs= {"ephemeral": True}
+    if view is not None:
+        kwargs["view"]= view
+    if deferred:
+        await interaction.followup.send(msg, **kwargs)
+    else:
+        await interaction_metrics.respond(interaction, "signup_button", started, msg, **kwargs)
 
-    @discord.ui.button(
-        label="Achsenmächte beitreten",
-        style=discord.ButtonStyle.danger,
-        custom_id="signup_button_axis"
-    )
-    async def axis_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        evt= get_event_dict(self.event_id)
-        if not signups_still_open(evt):
-            await interaction.response.send_message(
-                "Anmeldeschluss erreicht (Briefing hat begonnen).",
-                ephemeral=True
-            )
-            return
+SIGNUP_BUTTONS= {
+    "allies": ("Alliierte beitreten", discord.ButtonStyle.success),
+    "axis":   ("Achsenmächte beitreten", discord.ButtonStyle.danger),
+}
 
-        view= AxisSelectViewMulti(interaction.user.id, self.event_id)
-        await interaction.response.send_message(
-            f"Rollen (Axis) für Event {self.event_id}:",
-            ephemeral=True,
-            view=view
-        )
+class SignUpButton(discord.ui.DynamicItem[discord.ui.Button], template=r"signup:(?P<side>allies|axis):(?P<event_id>\d+)"):
+    """
+    Anmelde-Button mit Event-ID in der custom_id ("signup:allies:42").
+    Ein einziger, per bot.add_dynamic_items registrierter Handler bedient die
+    Buttons aller Events - beim Start wird keine View pro Event angelegt.
+    """
 
-class AlliesSelectViewMulti(discord.ui.View):
-    def __init__(self, user_id: int, event_id: int):
-        super().__init__(timeout=180)
-        self.user_id= user_id
+    def __init__(self, side: str, event_id: int, disabled: bool = False):
+        label, style= SIGNUP_BUTTONS[side]
+        super().__init__(discord.ui.Button(
+            label=label,
+            style=style,
+            custom_id=f"signup:{side}:{event_id}",
+            disabled=disabled
+        ))
+        self.side= side
         self.event_id= event_id
 
-        self.select= discord.ui.Select(
-            placeholder=f"Allies-Rolle (Event {event_id})",
-            min_values=1, max_values=1
-        )
-        self.select.callback= self.select_callback
-        self.add_item(self.select)
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["side"], int(match["event_id"]))
 
-        self.build_options()
-
-    def build_options(self):
-        evt= get_event_dict(self.event_id)
-        if not evt:
-            self.select.options.append(discord.SelectOption(label="Event nicht gefunden", value="none_none"))
-            return
-        if not signups_still_open(evt):
-            self.select.options.append(discord.SelectOption(label="Briefing => Kein Signup mehr!", value="none_none"))
-            return
+    async def callback(self, interaction: discord.Interaction):
+        await open_role_select(interaction, self.event_id, self.side)
 
-        side= "allies"
-        roles= ["inf","tank","sniper","commander"]
-        label_map= {"inf":"Infanterie","tank":"Panzer","sniper":"Sniper","commander":"Commander"}
+class LegacySignUpButton(discord.ui.DynamicItem[discord.ui.Button], template=r"signup_button_(?P<side>allies|axis)"):
+    """
+    Buttons älterer Posts mit den früheren festen custom_ids. Das Event ergibt
+    sich aus der Nachricht (events.axis_message_id); danach wird die Nachricht
+    per Embed-Update auf die neuen custom_ids umgestellt.
+    """
 
-        for r in roles:
-            max_s= get_slots_for_role(evt, side, r)
-            if max_s<=0:
-                continue
-            curr= count_signups(self.event_id, side, r)
-            if curr>= max_s:
-                disp= f"{label_map[r]} [voll]"
-                val= f"{side}_{r}_waiting"
-            else:
-                disp= label_map[r]
-                val= f"{side}_{r}_active"
-            self.select.options.append(discord.SelectOption(label=disp, value=val))
+    def __init__(self, side: str):
+        label, style= SIGNUP_BUTTONS[side]
+        super().__init__(discord.ui.Button(label=label, style=style, custom_id=f"signup_button_{side}"))
+        self.side= side
 
-        if not self.select.options:
-            self.select.options.append(discord.SelectOption(label="Allies - keine Slots", value="none_none"))
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["side"])
 
-    async def select_callback(self, interaction: discord.Interaction):
-        evt= get_event_dict(self.event_id)
-        if not signups_still_open(evt):
-            await interaction.response.send_message("Briefing => Anmeldeschluss.", ephemeral=True)
-            return
-
-        if interaction.user.id != self.user_id:
-            await interaction.response.send_message("Nicht dein Menü!", ephemeral=True)
+    async def callback(self, interaction: discord.Interaction):
+        event_id= await events_repo.event_for_signup_message(interaction.message.id)
+        if event_id is None:
+            await interaction.response.send_message("Event nicht gefunden.", ephemeral=True)
             return
+        await open_role_select(interaction, event_id, self.side)
+        add_event_to_update_queue(event_id)
 
-        val= self.select.values[0]
-        if val=="none_none":
-            await interaction.response.send_message("Keine Allies-Slots verfügbar.", ephemeral=True)
-            return
+class SignUpButtonViewMulti(discord.ui.View):
+    """
+    Allies-/Axis-Button unter der Axis-Nachricht (nur zum Senden/Editieren;
+    Klicks landen bei SignUpButton).
+    """
 
-        if user_already_signedup(self.event_id, str(interaction.user.id)):
-            await interaction.response.send_message("Bereits angemeldet!", ephemeral=True)
-            return
+    def __init__(self, event_id: int, evt: dict = None):
+        super().__init__(timeout=None)
+        self.event_id= event_id
 
-        side= "allies"
-        if val.endswith("_waiting"):
-            rolle= val.split("_")[1]
-            create_signup(self.event_id, str(interaction.user.id),
-                          interaction.user.display_name, side, rolle, "waiting")
-            await interaction.response.send_message(f"[Warteliste] Allies/{rolle}", ephemeral=True)
-            await send_signup_dm(interaction.user, self.event_id, side, rolle, "waiting")
-            add_event_to_update_queue(self.event_id)
-            return
+        # Falls signups geschlossen (evt kommt vom Aufrufer => keine DB-Query im Konstruktor)
+        closed= evt is not None and not signups_still_open(evt)
+        for side in ("allies", "axis"):
+            self.add_item(SignUpButton(side, event_id, disabled=closed))
 
-        # active
-        _, rolle, marker= val.split("_",2)
-        create_signup(self.event_id, str(interaction.user.id), interaction.user.display_name,
-                      side, rolle, "active")
-        await interaction.response.send_message(f"Allies/{rolle} = aktiv!", ephemeral=True)
-        await send_signup_dm(interaction.user, self.event_id, side, rolle, "active")
-        add_event_to_update_queue(self.event_id)
+class RoleSelectViewMulti(discord.ui.View):
+    """
+    Rollen-Menü einer Seite (ephemeral). Basis für Allies/Axis.
+    """
+    side= None
+    side_label= None
 
-class AxisSelectViewMulti(discord.ui.View):
-    def __init__(self, user_id: int, event_id: int):
+    def __init__(self, user_id: int, event_id: int, event_roster):
         super().__init__(timeout=180)
         self.user_id= user_id
         self.event_id= event_id
+        self.event_roster= event_roster
 
         self.select= discord.ui.Select(
-            placeholder=f"Axis-Rolle (Event {event_id})",
+            placeholder=f"{self.side_label}-Rolle (Event {event_id})",
             min_values=1, max_values=1
         )
         self.select.callback= self.select_callback
@@ -534,7 +525,8 @@ class AxisSelectViewMulti(discord.ui.View):
         self.build_options()
 
     def build_options(self):
-        evt= get_event_dict(self.event_id)
+        # Nur aus dem EventRoster, das open_role_select übergibt => keine SQL-Queries
+        evt= self.event_roster.event if self.event_roster else {}
         if not evt:
             self.select.options.append(discord.SelectOption(label="Event nicht gefunden", value="none_none"))
             return
@@ -542,15 +534,10 @@ class AxisSelectViewMulti(discord.ui.View):
             self.select.options.append(discord.SelectOption(label="Briefing => Kein Signup mehr!", value="none_none"))
             return
 
-        side= "axis"
-        roles= ["inf","tank","sniper","commander"]
+        side= self.side
         label_map= {"inf":"Infanterie","tank":"Panzer","sniper":"Sniper","commander":"Commander"}
 
-        for r in roles:
-            max_s= get_slots_for_role(evt, side, r)
-            if max_s<=0:
-                continue
-            curr= count_signups(self.event_id, side, r)
+        for r, curr, max_s in self.event_roster.role_options(side):
             if curr>= max_s:
                 disp= f"{label_map[r]} [voll]"
                 val= f"{side}_{r}_waiting"
@@ -560,44 +547,61 @@ class AxisSelectViewMulti(discord.ui.View):
             self.select.options.append(discord.SelectOption(label=disp, value=val))
 
         if not self.select.options:
-            self.select.options.append(discord.SelectOption(label="Axis - keine Slots", value="none_none"))
+            self.select.options.append(discord.SelectOption(label=f"{self.side_label} - keine Slots", value="none_none"))
 
     async def select_callback(self, interaction: discord.Interaction):
-        evt= get_event_dict(self.event_id)
-        if not signups_still_open(evt):
-            await interaction.response.send_message("Briefing => Anmeldeschluss.", ephemeral=True)
-            return
-
+        started= time.perf_counter()
         if interaction.user.id != self.user_id:
-            await interaction.response.send_message("Nicht dein Menü!", ephemeral=True)
+            await interaction_metrics.respond(interaction, "role_select", started, "Nicht dein Menü!", ephemeral=True)
             return
 
         val= self.select.values[0]
         if val=="none_none":
-            await interaction.response.send_message("Keine Axis-Slots verfügbar.", ephemeral=True)
+            await interaction_metrics.respond(interaction, "role_select", started,
+                                              f"Keine {self.side_label}-Slots verfügbar.", ephemeral=True)
             return
 
-        if user_already_signedup(self.event_id, str(interaction.user.id)):
-            await interaction.response.send_message("Bereits angemeldet!", ephemeral=True)
+        # Sofort bestätigen (Menü-Nachricht wird danach mit dem Ergebnis überschrieben),
+        # alles Weitere läuft außerhalb des 3-Sekunden-Fensters
+        await interaction_metrics.ack(interaction, "role_select", started)
+
+        async def finish(content):
+            await interaction.edit_original_response(content=content, view=None)
+
+        evt= await signups_repo.roster_event(self.event_id)
+        if not signups_still_open(evt):
+            await finish("Briefing => Anmeldeschluss.")
             return
 
-        side= "axis"
-        if val.endswith("_waiting"):
-            rolle= val.split("_")[1]
-            create_signup(self.event_id, str(interaction.user.id),
-                          interaction.user.display_name, side, rolle, "waiting")
-            await interaction.response.send_message(f"[Warteliste] Axis/{rolle}", ephemeral=True)
-            await send_signup_dm(interaction.user, self.event_id, side, rolle, "waiting")
-            add_event_to_update_queue(self.event_id)
+        # active/waiting entscheidet reserve_slot atomar in der DB
+        # (der [voll]-Hinweis im Menü kann beim Klick schon veraltet sein)
+        side= self.side
+        rolle= val.split("_")[1]
+        signup_id, status= await signups_repo.reserve(self.event_id, str(interaction.user.id),
+                                                      interaction.user.display_name, side, rolle)
+        if signup_id is None:
+            if status=="duplicate":
+                await finish("Bereits angemeldet!")
+            else:
+                await finish(f"Keine {self.side_label}-Slots verfügbar.")
             return
 
-        _, rolle, marker= val.split("_",2)
-        create_signup(self.event_id, str(interaction.user.id),
-                      interaction.user.display_name, side, rolle, "active")
-        await interaction.response.send_message(f"Axis/{rolle} = aktiv!", ephemeral=True)
-        await send_signup_dm(interaction.user, self.event_id, side, rolle, "active")
+        if status=="waiting":
+            await finish(f"[Warteliste] {self.side_label}/{rolle}")
+        else:
+            await finish(f"{self.side_label}/{rolle} = aktiv!")
+        # DM und Embed-Refresh im Hintergrund
+        spawn(send_signup_dm(interaction.user, evt, side, rolle, status))
         add_event_to_update_queue(self.event_id)
 
+class AlliesSelectViewMulti(RoleSelectViewMulti):
+    side= "allies"
+    side_label= "Allies"
+
+class AxisSelectViewMulti(RoleSelectViewMulti):
+    side= "axis"
+    side_label= "Axis"
+
 #########################################
 # CANCEL-VIEW (DM) => persistenter Button
 #########################################
@@ -612,29 +616,33 @@ class PersistentCancelView(discord.ui.View):
         custom_id="cancel_dm_button"
     )
     async def cancel_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
-        res = cancel_signup(str(interaction.user.id))
+        started= time.perf_counter()
+        # Sofort bestätigen; edit_original_response bearbeitet danach die DM mit dem Button
+        await interaction_metrics.ack(interaction, "cancel_button", started)
+
+        res = await signups_repo.cancel(str(interaction.user.id))
         if not res:
-            await interaction.response.send_message("Nicht aktiv angemeldet!", ephemeral=True)
+            await interaction.followup.send("Nicht aktiv angemeldet!", ephemeral=True)
             return
 
         signup_id, event_id, seite, rolle, wait_row= res
-        await interaction.response.send_message(
+        await interaction.followup.send(
             f"Abmeldung OK: {seite}/{rolle}, Event={event_id}",
             ephemeral=True
         )
 
         for child in self.children:
             child.disabled= True
-        await interaction.message.edit(view=self)
+        await interaction.edit_original_response(view=self)
 
         add_event_to_update_queue(event_id)
 
+
 #########################################
 # SIGNUP-DM => Embed
 #########################################
 
-def build_dm_embed(event_id: int, side: str, rolle: str, status: str) -> discord.Embed:
-    evt= get_event_dict(event_id)
+def build_dm_embed(evt: dict, side: str, rolle: str, status: str) -> discord.Embed:
     if not evt:
         return discord.Embed(
             title="Anmeldung",
@@ -657,120 +665,269 @@ def build_dm_embed(event_id: int, side: str, rolle: str, status: str) -> discord
     emb.set_footer(text=f"Status: {st_text}")
     return emb
 
-async def send_signup_dm(user: discord.User, event_id: int, side: str, rolle: str, status: str):
+async def send_signup_dm(user: discord.User, evt: dict, side: str, rolle: str, status: str):
     try:
         if user.dm_channel is None:
             await user.create_dm()
 
-        dm_embed= build_dm_embed(event_id, side, rolle, status)
+        dm_embed= build_dm_embed(evt, side, rolle, status)
         await user.dm_channel.send(embed=dm_embed, view=PersistentCancelView())
+        DM_RESULTS.inc("signup", "sent")
     except Exception as e:
+        DM_RESULTS.inc("signup", "forbidden" if isinstance(e, discord.Forbidden) else "failed")
         print(f"[send_signup_dm] Konnte DM an {user.id} nicht senden: {e}")
 
 #########################################
-# TASKS
+# POSTING-PIPELINE
 #########################################
 
-@tasks.loop(seconds=120)
-async def check_for_new_events():
+POST_PARTS= ("info", "allies", "axis")
+
+async def post_event(channel, evt: dict) -> bool:
     """
-    Prüft ungepostete Events => postet sie
+    Postet Info-, Allies- und Axis-Nachricht eines Events.
+    Wiederaufnahme nach Absturz:
+      - bereits gespeicherte *_message_id werden nicht erneut gesendet
+      - jede Nachricht hat eine feste Nonce pro (Event, Teil); Discord liefert bei
+        einem erneuten Senden kurz nach einem Absturz die vorhandene Nachricht zurück
     """
-    await post_all_unposted_events()
+    event_id= evt["id"]
+    projection= await signups_repo.projection(event_id)
+    sign_up_view= SignUpButtonViewMulti(event_id, evt)
+    rendered= {
+        "info":   ({"embed": build_info_embed(evt)}, None),
+        "allies": ({"embed": build_allies_embed(evt, projection)}, None),
+        "axis":   ({"embed": build_axis_embed(evt, projection), "view": sign_up_view}, sign_up_view),
+    }
+    msg_ids= {}
+    hashes= {}
+    for part in POST_PARTS:
+        kwargs, view= rendered[part]
+        hashes[part]= embed_payload_hash(kwargs["embed"], view)
+        existing= evt.get(f"{part}_message_id")
+        if existing:
+            msg_ids[part]= int(existing)
+            continue
+        await rate_limits.acquire(f"POST /channels/{channel.id}/messages")
+        msg= await channel.send(nonce=f"evt{event_id}-{part}", **kwargs)
+        msg_ids[part]= msg.id
+        # Checkpoint: ein Neustart postet diese Nachricht nicht doppelt
+        await events_repo.save_post_checkpoint(event_id, part, msg.id)
 
-@check_for_new_events.before_loop
-async def before_check_for_new_events():
-    await bot.wait_until_ready()
+    await events_repo.finish_post(event_id, msg_ids, hashes, channel.id)
+    embed_hashes[event_id]= hashes
+    return True
+
+# Läufe von post_all_unposted_events nacheinander (Deadline, /set_event_channel,
+# on_ready): sonst lesen zwei Läufe dieselben ungeposteten Events => doppelte Posts
+post_lock= asyncio.Lock()
+
+async def post_all_unposted_events():
+    """
+    Postet alle fälligen, noch ungeposteten Events (Posting-Fenster siehe EVENT_POST_LEAD_DAYS).
+    Pro Guild eine eigene Warteschlange; die Guilds posten parallel
+    (eigene Kanäle => eigene Rate-Limit-Buckets).
+    Ein zweiter Aufruf wartet auf den laufenden und lädt danach neu
+    (bereits gepostete Events haben dann posted_in_discord=1).
+    """
+    async with post_lock:
+        await _post_all_unposted_events()
 
-@tasks.loop(minutes=5)
-async def check_for_signup_closure():
-    """
-    Prüft, ob now >= date_briefing, 
-    => pw_sent=0 => PW verschicken etc.
-    => Buttons disablen => via update_queue
-    """
-    now= datetime.now()
-    conn= get_connection()
-    c= conn.cursor()
-    c.execute("""
-      SELECT id, date_briefing, pw_sent
-      FROM events
-      WHERE posted_in_discord=1
-        AND date_briefing IS NOT NULL
-    """)
-    rows= c.fetchall()
-    if not rows:
-        conn.close()
+async def _post_all_unposted_events():
+    if not guild_channels:
+        print("[post_all_unposted_events] Kein Event-Kanal gesetzt.")
         return
 
-    for (evt_id, dt_brief, pw_sent_val) in rows:
-        if not dt_brief:
+    events= await events_repo.load_unposted(datetime.now(), EVENT_POST_LEAD)
+    by_guild= {}
+    for evt in events:
+        gid= event_guild_id(evt)
+        if gid is None or gid not in guild_channels:
+            print(f"[post_all_unposted_events] Event {evt['id']}: keine Guild mit Event-Kanal ({evt.get('guild_id')}).")
             continue
+        by_guild.setdefault(gid, []).append(evt)
+
+    await asyncio.gather(*(post_guild_events(gid, evts) for gid, evts in by_guild.items()))
+
+async def post_guild_events(guild_id: str, events: list):
+    channel= bot.get_channel(guild_channels[guild_id])
+    if not channel:
+        print(f"[post_guild_events] Guild {guild_id}: Channel nicht gefunden.")
+        return
+    for evt in events:
         try:
-            dt_b= datetime.fromisoformat(dt_brief)
-        except:
+            await post_event(channel, evt)
+            print(f"[post_guild_events] Event {evt['id']} in Guild {guild_id} gepostet.")
+        except discord.HTTPException as e:
+            print(f"[post_guild_events] HTTP-Fehler bei Event {evt['id']}: {e}")
             continue
+        roster.invalidate(evt["id"])
+        # Ab jetzt zählen Anmeldeschluss/PW-Deadlines
+        await deadlines.arm(evt["id"])
 
-        # Falls now >= dt_b => closen / PW senden
-        if now >= dt_b:
-            if pw_sent_val==0:
-                # Sende PW-Embed an aktive user
-                evt= get_event_dict(evt_id)
-                c2= conn.cursor()
-                c2.execute("SELECT user_id FROM signups WHERE event_id=? AND status='active'", (evt_id,))
-                users_list= c2.fetchall()
-                for (u_id,) in users_list:
-                    user= bot.get_user(int(u_id))
-                    if user:
-                        emb_pw= build_password_embed(evt)
-                        try:
-                            if user.dm_channel is None:
-                                await user.create_dm()
-                            await user.dm_channel.send(embed=emb_pw)
-                        except Exception as ex:
-                            print(f"[check_for_signup_closure] DM-Fehler an {u_id}: {ex}")
-
-                # Mark pw_sent=1
-                c2.execute("UPDATE events SET pw_sent=1 WHERE id=?", (evt_id,))
-                conn.commit()
-
-            # Buttons disablen => add to queue
-            add_event_to_update_queue(evt_id)
-
-    conn.close()
-
-@check_for_signup_closure.before_loop
-async def before_check_for_signup_closure():
-    await bot.wait_until_ready()
+#########################################
+# TASKS
+#########################################
 
-@tasks.loop(minutes=30)
-async def check_for_recurring_events():
-    """
-    Falls du Recurrence-Logik brauchst: 
-    date_eventstart< now => recurrence_pattern != 'none' => new events ...
-    """
-    now= datetime.now()
-    conn= get_connection()
-    c= conn.cursor()
-    c.execute("""
-        SELECT id
-        FROM events
-        WHERE date_eventstart < ?
-          AND recurrence_pattern != 'none'
-          AND spawned_next_event=0
-    """,(now,))
-    rows= c.fetchall()
-    if not rows:
-        conn.close()
-        print("[check_for_recurring_events] Keine abgelaufenen Recurring-Events.")
+# Die festen Polling-Loops (check_for_new_events 120s, check_for_signup_closure 5min,
+# check_for_recurring_events 30min) sind durch den DeadlineScheduler ersetzt:
+# jede Deadline feuert zu ihrem Zeitpunkt, danach wird das Event neu eingeplant.
+
+async def handle_post_deadline(evt_id: int):
+    """
+    Posting-Fenster (EVENT_POST_LEAD_DAYS vor Eventstart) erreicht => posten.
+    """
+    await post_all_unposted_events()
+
+async def handle_close_deadline(evt_id: int):
+    """
+    Briefing erreicht => Anmeldeschluss, Buttons disablen via update_scheduler.
+    """
+    roster.invalidate(evt_id)
+    add_event_to_update_queue(evt_id)
+
+async def handle_password_deadline(evt_id: int):
+    await send_event_passwords(evt_id)
+
+async def send_event_passwords(evt_id: int):
+    """
+    Schickt das PW-Embed (einmal gebaut) an alle aktiven User des Events.
+    pw_sent=1 erst, wenn jeder Empfänger einen Endzustand in dm_deliveries hat;
+    sonst setzt der nächste Lauf bei den offenen Empfängern fort.
+    """
+    evt= await events_repo.get(evt_id)
+    if not evt:
         return
-    print(f"[check_for_recurring_events] {len(rows)} abgelaufene => Erzeuge Folgetermine ...")
-    # ...
-    conn.close()
+    user_ids= await signups_repo.active_user_ids(evt_id)
 
-@check_for_recurring_events.before_loop
-async def before_recur():
-    await bot.wait_until_ready()
+    emb_pw= build_password_embed(evt)
+    await dm_dispatcher.dispatch(evt_id, "password", user_ids, emb_pw)
+
+    if await dm_dispatcher.all_processed(evt_id, "password"):
+        await events_repo.mark_pw_sent(evt_id)
+        print(f"[send_event_passwords] Event {evt_id}: pw_sent=1")
+
+async def handle_recur_deadline(evt_id: int):
+    """
+    Eventstart eines Serientermins erreicht => Serie bis RECURRENCE_HORIZON
+    fortschreiben (inkl. nach Downtime verpasster Termine, eine Transaktion).
+    """
+    created= await db.run("recurrence.materialise", materialise_for_event, evt_id)
+    await arm_occurrences(created)
+
+async def arm_occurrences(event_ids):
+    """
+    Neue Serientermine einplanen (Posten 7 Tage vorher usw.). Sie stehen mit
+    source='bot' im Feed und kommen daher nicht über handle_feed_changes.
+    """
+    for new_id in event_ids:
+        await deadlines.arm(new_id)
+
+deadlines= DeadlineScheduler({
+    "post": handle_post_deadline,
+    "close": handle_close_deadline,
+    "password": handle_password_deadline,
+    "recur": handle_recur_deadline,
+}, db=db)
+
+async def handle_feed_changes(event_id: int, kinds: set):
+    """
+    Änderungen aus dem Feed (Webinterface, andere Prozesse):
+    Roster neu laden, Deadlines neu planen, gepostete Embeds aktualisieren.
+    """
+    roster.invalidate(event_id)
+    if "deleted" in kinds:
+        deadlines.disarm(event_id)
+        print(f"[handle_feed_changes] Event {event_id} gelöscht.")
+        return
+    await deadlines.arm(event_id)
+    evt= await signups_repo.roster_event(event_id)
+    if evt and evt.get("posted_in_discord"):
+        add_event_to_update_queue(event_id)
+    if evt and evt.get("series_id"):
+        # Neue/geänderte Serie => Horizont sofort auffüllen (idempotent)
+        created= await db.run("recurrence.materialise", materialise_series, evt["series_id"])
+        await arm_occurrences(created)
+
+# Tail-Follower auf der changes-Tabelle; eigene Änderungen (source='bot') sind schon verarbeitet
+change_feed= ChangeFeed(handle_feed_changes, db, bot_state_repo)
+
+def on_event_changed(event_id, kind):
+    """
+    Listener für webapp.notify (läuft im Flask-Thread) => Feed sofort lesen.
+    """
+    bot.loop.call_soon_threadsafe(change_feed.wake)
+
+# UDP-Kanal für Weck-Signale aus separaten Web-Prozessen (BOT_NOTIFY_ADDR)
+notify_transport= None
+
+async def start_notify_channel():
+    global notify_transport
+    if notify_transport is not None:
+        return
+    try:
+        notify_transport= await notify.start_notify_listener(change_feed.wake)
+    except OSError as e:
+        print(f"[start_notify_channel] Konnte nicht lauschen: {e}")
+
+#########################################
+# METRIKEN (webapp/metrics.py)
+#########################################
+
+def collect_bot_metrics():
+    """
+    Zustände, die als stats() vorliegen, beim Abruf von /metrics übernehmen.
+    """
+    metrics.registry.gauge(
+        "bot_update_queue_depth", "Wartende Embed-Updates pro Guild", ("guild",)
+    ).replace({("" if k is None else str(k),): n for k, n in update_scheduler.queue_depths().items()})
+    metrics.set_gauge("bot_update_queue_oldest_seconds", "Alter des ältesten wartenden Embed-Updates",
+                      round(update_scheduler.oldest_age(), 3))
+    metrics.set_gauge("bot_update_in_flight", "Laufende Embed-Updates", update_scheduler.in_flight())
+    metrics.set_counter("bot_loop_blocks_total", "Blockaden des Event-Loops über LOOP_BLOCK_WARN_MS",
+                        loop_watchdog.stats["blocks"])
+    metrics.set_gauge("bot_loop_block_max_seconds", "Längste Blockade des Event-Loops",
+                      loop_watchdog.stats["max_block_ms"] / 1000)
+    metrics.set_counter("bot_change_feed_changes_total", "Gelesene Einträge des Änderungs-Feeds",
+                        change_feed.stats["changes"])
+    metrics.set_gauge("bot_guilds", "Guilds mit Event-Kanal", len(guild_channels))
+    if bot.is_ready():
+        metrics.set_gauge("bot_gateway_latency_seconds", "Heartbeat-Latenz zum Discord-Gateway",
+                          round(bot.latency, 4))
+
+metrics.registry.add_collector(collect_bot_metrics)
+
+metrics_runner= None
+
+async def start_metrics_server():
+    """
+    GET /metrics auf BOT_METRICS_HOST:BOT_METRICS_PORT, wenn Bot und Webinterface
+    getrennt laufen (im Modus "all" liefert das Flask-/metrics schon alles).
+    """
+    global metrics_runner
+    if not BOT_METRICS_PORT or metrics_runner is not None:
+        return
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        if not metrics.authorized(request.headers, request.remote):
+            return web.Response(status=401, text="unauthorized\n")
+        # render() liest nur Speicherstände -> direkt im Loop
+        return web.Response(body=metrics.registry.render().encode("utf-8"),
+                            headers={"Content-Type": metrics.CONTENT_TYPE})
+
+    app= web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner= web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, BOT_METRICS_HOST, BOT_METRICS_PORT).start()
+    except OSError as e:
+        print(f"[start_metrics_server] Port {BOT_METRICS_PORT} nicht verfügbar: {e}")
+        await runner.cleanup()
+        return
+    metrics_runner= runner
+    print(f"[start_metrics_server] Metriken unter http://{BOT_METRICS_HOST}:{BOT_METRICS_PORT}/metrics")
 
 @tasks.loop(minutes=30)
 async def check_events_for_password():
@@ -791,18 +948,29 @@ async def before_pw():
 @bot.event
 async def on_ready():
     print(f"[on_ready] Bot {bot.user} ist online.")
-    ensure_event_columns_exist()
-    load_event_channel_id()
+    # Meldet Callbacks, die den Loop länger als LOOP_BLOCK_WARN_MS blockieren
+    loop_watchdog.start()
+    await load_guild_channels()
 
-    # Registriere DM-Abmelde-View global
+    # Registriere DM-Abmelde-View global und die Anmelde-Buttons aller Events
+    # (Event-ID steckt in der custom_id => ein Handler, keine View pro Event)
     bot.add_view(PersistentCancelView())
-
-    # Starte update_queue-Task
-    if not process_update_queue.is_running():
-        process_update_queue.start()
-
-    # Optionale Wiederherstellung persistenter Views 
-    await restore_sign_up_views()
+    bot.add_dynamic_items(SignUpButton, LegacySignUpButton)
+
+    # Starte Embed-Update-Scheduler
+    if not update_scheduler.is_running():
+        update_scheduler.start()
+
+    # Deadlines (Posten, Anmeldeschluss, PW-Versand, Folgetermine) einplanen
+    if not deadlines.is_running():
+        await deadlines.arm_all()
+        deadlines.start()
+    # Änderungen aus dem Webinterface (changes-Tabelle), per notify sofort geweckt
+    if not change_feed.is_running():
+        change_feed.start()
+    notify.add_listener(on_event_changed)
+    await start_notify_channel()
+    await start_metrics_server()
 
     # ggf. ungepostete Events posten
     await post_all_unposted_events()
@@ -815,48 +983,24 @@ async def on_ready():
         print(f"[on_ready] Sync Fehler: {e}")
 
     # Tasks
-    if not check_for_new_events.is_running():
-        check_for_new_events.start()
-    if not check_for_signup_closure.is_running():
-        check_for_signup_closure.start()
-    if not check_for_recurring_events.is_running():
-        check_for_recurring_events.start()
     if not check_events_for_password.is_running():
         check_events_for_password.start()
 
-#########################################
-# PERSISTENTE SIGNUP-VIEWS WIEDERHERSTELLEN
-#########################################
-
-async def restore_sign_up_views():
-    conn= get_connection()
-    c= conn.cursor()
-    c.execute("""
-        SELECT id, axis_message_id
-        FROM events
-        WHERE posted_in_discord=1
-          AND axis_message_id IS NOT NULL
-    """)
-    rows= c.fetchall()
-    conn.close()
-
-    for (evt_id, axis_id) in rows:
-        try:
-            view= SignUpButtonViewMulti(evt_id)
-            bot.add_view(view, message_id=int(axis_id))
-            print(f"[restore_sign_up_views] Persistente View re-registered, event={evt_id}")
-        except Exception as e:
-            print(f"[restore_sign_up_views] Fehler: {e}")
-
 #########################################
 # /set_event_channel
 #########################################
 
-@bot.tree.command(name="set_event_channel", description="Setzt den Kanal für Events.")
+@bot.tree.command(name="set_event_channel", description="Setzt den Kanal für Events dieser Guild.")
 @app_commands.describe(channel="Discord-Kanal")
+@app_commands.guild_only()
+@app_commands.default_permissions(manage_guild=True)
 async def set_event_channel(interaction: discord.Interaction, channel: discord.TextChannel):
-    save_event_channel_id(channel.id)
-    await interaction.response.send_message(f"Event-Kanal => {channel.mention}", ephemeral=True)
+    started= time.perf_counter()
+    await interaction_metrics.ack(interaction, "set_event_channel", started, ephemeral=True, thinking=True)
+    await save_event_channel(interaction.guild, channel.id)
+    await interaction.followup.send(f"Event-Kanal => {channel.mention}", ephemeral=True)
+    # Events dieser Guild, die schon im Posting-Fenster liegen
+    spawn(post_all_unposted_events())
 
 #########################################
 # START
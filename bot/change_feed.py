@@ -0,0 +1,126 @@
+# Datei: bot/change_feed.py
+#
+# Liest den Änderungs-Feed (webapp/changes.py) im Bot nach.
+# Der Task fragt höchstens alle CHANGE_FEED_INTERVAL Sekunden nach neuen
+# Zeilen (WHERE id > cursor, im Leerlauf ein leerer Index-Lookup) und wird
+# durch webapp.notify (gleicher Prozess bzw. UDP aus den Web-Prozessen)
+# sofort geweckt. Änderungen werden pro Event zusammengefasst an den Handler
+# gegeben; danach wird der Cursor in bot_state.changes_cursor gespeichert, so
+# dass nach einem Neustart auch Änderungen aus der Offline-Zeit ankommen.
+
+import asyncio
+import os
+import time
+
+from webapp.changes import (
+    CHANGES_BATCH, changes_since, collapse_changes, latest_change_id, prune_changes,
+)
+from webapp.metrics import bot_task_errors, bot_task_seconds
+
+CHANGE_FEED_INTERVAL = float(os.getenv("CHANGE_FEED_INTERVAL", 1.0))
+PRUNE_INTERVAL = 3600
+
+
+class ChangeFeed:
+    def __init__(self, handler, db, state, skip_source="bot", interval=CHANGE_FEED_INTERVAL):
+        """
+        handler: async def handler(event_id, kinds) mit kinds = set('created', 'updated', ...)
+        db: DBExecutor (bot.async_db), state: BotStateRepository
+        skip_source: eigene Änderungen (hat der Bot schon selbst verarbeitet)
+        """
+        self.handler = handler
+        self.db = db
+        self.state = state
+        self.skip_source = skip_source
+        self.interval = interval
+        self.cursor = None
+        self.stats = {"batches": 0, "changes": 0, "handled": 0, "last_batch_ms": 0.0}
+        self._wake = None
+        self._task = None
+        self._last_prune = 0.0
+
+    async def _load_cursor(self):
+        cursor = await self.state.changes_cursor()
+        if cursor is None:
+            # Erster Start: kein Replay, arm_all()/post_all_unposted_events decken den Bestand ab
+            cursor = await self.db.run("changes.latest", latest_change_id)
+            await self.state.save_changes_cursor(cursor)
+        self.cursor = cursor
+
+    def wake(self, event_id=None, kind=None):
+        """
+        Listener für webapp.notify; muss im Loop-Thread laufen
+        (aus anderen Threads über loop.call_soon_threadsafe).
+        """
+        if self._wake is not None:
+            self._wake.set()
+
+    async def poll(self) -> int:
+        """
+        Verarbeitet alle neuen Einträge. Gibt die Anzahl gelesener Zeilen zurück.
+        """
+        if self.cursor is None:
+            await self._load_cursor()
+        total = 0
+        while True:
+            rows = await self.db.run("changes.since", changes_since, self.cursor)
+            if not rows:
+                break
+            total += len(rows)
+            started = time.perf_counter()
+            relevant = [r for r in rows if r[3] != self.skip_source]
+            for event_id, kinds in collapse_changes(relevant).items():
+                try:
+                    await self.handler(event_id, kinds)
+                    self.stats["handled"] += 1
+                except Exception as e:
+                    print(f"[ChangeFeed] Handler für Event {event_id} fehlgeschlagen: {e}")
+            self.cursor = rows[-1][0]
+            await self.state.save_changes_cursor(self.cursor)
+            self.stats["batches"] += 1
+            self.stats["changes"] += len(rows)
+            self.stats["last_batch_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            if len(rows) < CHANGES_BATCH:
+                break
+        return total
+
+    async def _prune(self):
+        if time.monotonic() - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = time.monotonic()
+        deleted = await self.db.run("changes.prune", prune_changes)
+        if deleted:
+            print(f"[ChangeFeed] {deleted} alte Feed-Einträge gelöscht.")
+
+    #########################################
+    # Ablauf
+    #########################################
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.is_running():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            try:
+                if await self.poll():
+                    bot_task_seconds.observe(time.perf_counter() - started, "change_feed")
+                await self._prune()
+            except Exception as e:
+                bot_task_errors.inc("change_feed")
+                print(f"[ChangeFeed] Fehler beim Lesen des Feeds: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
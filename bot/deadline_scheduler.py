@@ -0,0 +1,244 @@
+# Datei: bot/deadline_scheduler.py
+#
+# Deadline-getriebener Scheduler ("Timer-Wheel") statt fester Polling-Loops.
+# Für jedes Event werden die nächsten Fälligkeiten berechnet
+#   post      -> date_eventstart - EVENT_POST_LEAD_DAYS (posted_in_discord=0)
+#   close     -> date_briefing (Anmeldeschluss, Buttons deaktivieren)
+#   password  -> date_briefing (PW-DMs, solange pw_sent=0)
+#   recur     -> date_eventstart (Folgetermin erzeugen)
+# und in einem Min-Heap gehalten. Der Task schläft bis zur frühesten Deadline
+# bzw. bis arm()/disarm() ihn weckt; im Leerlauf gibt es keine DB-Queries.
+# Fällige Deadlines laufen pro Event in einem eigenen Task (innerhalb des
+# Events in KIND_ORDER), damit lange Handler andere Events nicht aufhalten.
+# Die Queries von arm()/arm_all() laufen über den DBExecutor des Bots (falls übergeben).
+
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from datetime import datetime, timedelta
+
+from webapp.db import get_connection
+from webapp.metrics import bot_task_errors, bot_task_seconds
+
+EVENT_POST_LEAD = timedelta(days=int(os.getenv("EVENT_POST_LEAD_DAYS", 7)))
+
+# Reihenfolge, falls mehrere Deadlines eines Events gleichzeitig fällig sind
+KIND_ORDER = ("post", "close", "password", "recur")
+
+# Falls ein Handler die Ursache nicht beseitigt hat (z.B. Kanal fehlt, DMs offen),
+# wird die Deadline nach dieser Pause erneut ausgelöst.
+RETRY_DELAY = {
+    "post": timedelta(minutes=2),
+    "close": timedelta(minutes=5),
+    "password": timedelta(minutes=5),
+    "recur": timedelta(minutes=30),
+}
+
+# Längster Schlaf am Stück (fängt Uhr-Sprünge ab, ohne die DB zu fragen)
+MAX_SLEEP = 3600
+
+# Die Regel einer Serie steht nur an der Vorlage (webapp/recurrence.py) ->
+# Folgetermine bekommen ihre recur-Deadline über series_pattern
+SERIES_PATTERN = """
+    COALESCE((SELECT t.recurrence_pattern FROM events t WHERE t.id = events.series_id),
+             recurrence_pattern)
+"""
+
+EVENT_COLUMNS = f"""
+    id, date_briefing, date_eventstart, posted_in_discord, pw_sent,
+    {SERIES_PATTERN} AS series_pattern, spawned_next_event
+"""
+
+def _parse(dt_str):
+    if not dt_str:
+        return None
+    try:
+        return datetime.fromisoformat(str(dt_str))
+    except ValueError:
+        return None
+
+def compute_deadlines(row: dict, now: datetime):
+    """
+    [(zeitpunkt, kind), ...] für ein Event (row mit EVENT_COLUMNS).
+    """
+    deadlines = []
+    briefing = _parse(row.get("date_briefing"))
+    start = _parse(row.get("date_eventstart"))
+
+    if not row.get("posted_in_discord"):
+        if start and start > now:
+            deadlines.append((start - EVENT_POST_LEAD, "post"))
+    elif briefing and not row.get("pw_sent"):
+        deadlines.append((briefing, "close"))
+        deadlines.append((briefing, "password"))
+
+    pattern = row.get("series_pattern") or "none"
+    if pattern != "none" and not row.get("spawned_next_event") and start:
+        deadlines.append((start, "recur"))
+    return deadlines
+
+
+class DeadlineScheduler:
+    def __init__(self, handlers, db=None):
+        """
+        handlers: {kind: async def handler(event_id)}
+        db: optionaler DBExecutor (bot.async_db)
+        """
+        self.handlers = handlers
+        self.db = db
+        self._heap = []            # (zeitpunkt, reihenfolge, seq, event_id, kind, generation)
+        self._generation = {}      # event_id -> aktuelle Generation (ältere Heap-Einträge verfallen)
+        self._seq = itertools.count()
+        self._wake = None
+        self._task = None
+        self._firing = {}          # event_id -> laufender _fire-Task
+
+    #########################################
+    # Deadlines setzen
+    #########################################
+
+    async def _rows(self, event_id=None):
+        if self.db is None:
+            return self._load_rows(event_id)
+        return await self.db.run("events.deadlines", self._load_rows, event_id)
+
+    def _load_rows(self, event_id=None):
+        conn = get_connection()
+        c = conn.cursor()
+        if event_id is None:
+            c.execute(f"""
+                SELECT {EVENT_COLUMNS}
+                FROM events
+                WHERE posted_in_discord=0
+                   OR pw_sent=0
+                   OR (spawned_next_event=0 AND {SERIES_PATTERN} != 'none')
+            """)
+        else:
+            c.execute(f"SELECT {EVENT_COLUMNS} FROM events WHERE id=?", (event_id,))
+        cols = [desc[0] for desc in c.description]
+        rows = [dict(zip(cols, r)) for r in c.fetchall()]
+        conn.close()
+        return rows
+
+    def _push(self, event_id, deadlines, fired=()):
+        generation = self._generation.get(event_id, 0) + 1
+        self._generation[event_id] = generation
+        now = datetime.now()
+        for when, kind in deadlines:
+            if kind in fired and when <= now:
+                # Gerade ausgelöst, aber weiterhin fällig -> später nochmal
+                when = now + RETRY_DELAY[kind]
+            heapq.heappush(self._heap, (
+                when, KIND_ORDER.index(kind), next(self._seq), event_id, kind, generation
+            ))
+        if self._wake is not None:
+            self._wake.set()
+
+    async def arm(self, event_id, fired=()):
+        """
+        (Neu-)Berechnet die Deadlines eines Events aus der DB (1 Query).
+        """
+        rows = await self._rows(event_id)
+        if not rows:
+            self.disarm(event_id)
+            return
+        self._push(event_id, compute_deadlines(rows[0], datetime.now()), fired)
+
+    async def arm_all(self):
+        """
+        Lädt alle Events mit offenen Deadlines (1 Query, z.B. beim Start).
+        """
+        rows = await self._rows()
+        now = datetime.now()
+        for row in rows:
+            self._push(row["id"], compute_deadlines(row, now))
+        print(f"[DeadlineScheduler] {len(self._heap)} Deadlines für {len(rows)} Events geplant.")
+
+    def disarm(self, event_id):
+        self._generation[event_id] = self._generation.get(event_id, 0) + 1
+        if self._wake is not None:
+            self._wake.set()
+
+    def next_deadline(self):
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def _drop_stale(self):
+        while self._heap and self._heap[0][5] != self._generation.get(self._heap[0][3]):
+            heapq.heappop(self._heap)
+
+    #########################################
+    # Ablauf
+    #########################################
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.is_running():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._firing.values()):
+            task.cancel()
+        self._firing.clear()
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            nxt = self.next_deadline()
+            timeout = MAX_SLEEP
+            if nxt is not None:
+                timeout = min(MAX_SLEEP, max(0.0, (nxt - datetime.now()).total_seconds()))
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            # Alle fälligen Deadlines einsammeln, gruppiert pro Event
+            now = datetime.now()
+            due = {}
+            while True:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                _, _, _, event_id, kind, _ = heapq.heappop(self._heap)
+                due.setdefault(event_id, []).append(kind)
+
+            # Jedes Event in einem eigenen Task: lange Handler (Passwort-DMs an
+            # alle Angemeldeten) halten weder andere Events noch den Scheduler auf
+            for event_id, kinds in due.items():
+                if event_id in self._firing:
+                    # Läuft noch; dessen arm() am Ende plant noch Fälliges neu ein
+                    continue
+                task = asyncio.create_task(self._fire(event_id, kinds))
+                self._firing[event_id] = task
+                task.add_done_callback(lambda _, event_id=event_id: self._firing.pop(event_id, None))
+
+    async def _fire(self, event_id, kinds):
+        # Noch nicht ausgelöste Deadlines des Events verfallen hier; arm() berechnet sie neu
+        self._generation[event_id] = self._generation.get(event_id, 0) + 1
+        for kind in sorted(set(kinds), key=KIND_ORDER.index):
+            handler = self.handlers.get(kind)
+            if handler is None:
+                continue
+            started = time.perf_counter()
+            try:
+                await handler(event_id)
+            except Exception as e:
+                bot_task_errors.inc(f"deadline.{kind}")
+                print(f"[DeadlineScheduler] Handler '{kind}' für Event {event_id} fehlgeschlagen: {e}")
+            finally:
+                bot_task_seconds.observe(time.perf_counter() - started, f"deadline.{kind}")
+        try:
+            await self.arm(event_id, fired=kinds)
+        except Exception as e:
+            print(f"[DeadlineScheduler] Re-Arm für Event {event_id} fehlgeschlagen: {e}")
@@ -0,0 +1,207 @@
+# Datei: bot/dm_dispatcher.py
+#
+# Paralleler, gedrosselter DM-Versand (z.B. Passwort-DMs zum Briefing).
+#  - max. DM_CONCURRENCY DMs gleichzeitig, global max. DM_RATE_PER_SEC DMs/Sekunde
+#  - ein vorgebautes Embed für alle Empfänger
+#  - User nicht im Cache => fetch_user statt stillem Überspringen
+#  - Zustellstatus pro (event_id, user_id, kind) in dm_deliveries, d.h. nach
+#    einem Absturz wird nur an die noch offenen Empfänger weitergesendet.
+#    Offene Einträge von Usern, die nicht mehr Empfänger sind (z.B. inzwischen
+#    abgemeldet), werden dabei auf 'skipped' gesetzt.
+#  - DB-Zugriffe laufen über den DBExecutor des Bots (falls übergeben),
+#    nicht direkt im Event-Loop.
+
+import asyncio
+import os
+import time
+from datetime import datetime
+
+import discord
+
+from webapp.db import get_connection
+from webapp.metrics import registry
+
+DM_CONCURRENCY = int(os.getenv("DM_CONCURRENCY", 5))
+DM_RATE_PER_SEC = float(os.getenv("DM_RATE_PER_SEC", 4))
+DM_MAX_ATTEMPTS = int(os.getenv("DM_MAX_ATTEMPTS", 3))
+
+# Endzustände: an diese Empfänger wird nicht erneut gesendet
+# ('skipped' = beim erneuten Lauf kein Empfänger mehr; kommt er zurück, wird er wieder offen)
+FINAL_STATUSES = ("sent", "forbidden", "not_found", "failed", "skipped")
+
+DM_RESULTS = registry.counter(
+    "bot_dm_total", "DM-Zustellversuche pro Art und Ergebnis (retry = transienter Fehler)", ("kind", "status"),
+)
+DM_SEND_SECONDS = registry.histogram(
+    "bot_dm_send_seconds", "Dauer eines DM-Versands (User auflösen + senden)", ("kind",),
+)
+
+
+class TokenBucket:
+    """
+    Einfacher Token-Bucket: rate Tokens pro Sekunde, höchstens capacity auf Vorrat.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class DMDispatcher:
+    def __init__(self, client, db=None, concurrency=DM_CONCURRENCY, rate=DM_RATE_PER_SEC,
+                 max_attempts=DM_MAX_ATTEMPTS):
+        self.client = client
+        self.db = db
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.bucket = TokenBucket(rate)
+        self.max_attempts = max_attempts
+
+    #########################################
+    # dm_deliveries
+    #########################################
+
+    async def _call(self, name, fn, *args):
+        if self.db is None:
+            return fn(*args)
+        return await self.db.run(name, fn, *args)
+
+    def _prepare(self, event_id, kind, user_ids):
+        """
+        Legt fehlende Zustell-Einträge an und gibt die noch offenen user_ids zurück.
+        Offene Einträge anderer User (nicht mehr in user_ids) werden 'skipped',
+        damit all_processed() nicht ewig auf sie wartet.
+        """
+        now = datetime.now()
+        current = {str(u) for u in user_ids}
+        conn = get_connection()
+        c = conn.cursor()
+        c.executemany("""
+            INSERT OR IGNORE INTO dm_deliveries (event_id, user_id, kind, status, attempts, updated_at)
+            VALUES (?,?,?,'pending',0,?)
+        """, [(event_id, u, kind, now) for u in current])
+        # Wieder dabei (z.B. neu angemeldet) -> wieder offen
+        c.executemany("""
+            UPDATE dm_deliveries
+            SET status='pending', updated_at=?
+            WHERE event_id=? AND user_id=? AND kind=? AND status='skipped'
+        """, [(now, event_id, u, kind) for u in current])
+        c.execute(f"""
+            SELECT user_id
+            FROM dm_deliveries
+            WHERE event_id=? AND kind=?
+              AND status NOT IN ({",".join("?" * len(FINAL_STATUSES))})
+        """, (event_id, kind, *FINAL_STATUSES))
+        open_ids = {row[0] for row in c.fetchall()}
+        c.executemany("""
+            UPDATE dm_deliveries
+            SET status='skipped', updated_at=?
+            WHERE event_id=? AND user_id=? AND kind=?
+        """, [(now, event_id, u, kind) for u in open_ids - current])
+        conn.commit()
+        conn.close()
+        return [str(u) for u in user_ids if str(u) in open_ids]
+
+    def _record(self, event_id, kind, user_id, status, attempts, error=None):
+        conn = get_connection()
+        c = conn.cursor()
+        c.execute("""
+            UPDATE dm_deliveries
+            SET status=?, attempts=?, last_error=?, updated_at=?
+            WHERE event_id=? AND user_id=? AND kind=?
+        """, (status, attempts, error, datetime.now(), event_id, user_id, kind))
+        conn.commit()
+        conn.close()
+
+    #########################################
+    # Versand
+    #########################################
+
+    async def _resolve_user(self, user_id):
+        user = self.client.get_user(int(user_id))
+        if user is None:
+            user = await self.client.fetch_user(int(user_id))
+        return user
+
+    async def _deliver(self, event_id, kind, user_id, embed):
+        attempts = 0
+        while True:
+            attempts += 1
+            async with self.semaphore:
+                await self.bucket.acquire()
+                started = time.perf_counter()
+                try:
+                    user = await self._resolve_user(user_id)
+                    await user.send(embed=embed)
+                    status, error = "sent", None
+                except discord.NotFound as e:
+                    status, error = "not_found", str(e)
+                except discord.Forbidden as e:
+                    # DMs deaktiviert / Bot blockiert -> nicht erneut versuchen
+                    status, error = "forbidden", str(e)
+                except (discord.HTTPException, asyncio.TimeoutError, OSError) as e:
+                    status, error = "failed", str(e)
+                DM_SEND_SECONDS.observe(time.perf_counter() - started, kind)
+
+            final = status != "failed" or attempts >= self.max_attempts
+            DM_RESULTS.inc(kind, status if final else "retry")
+
+            if final:
+                await self._call("dm_deliveries.record", self._record,
+                                 event_id, kind, user_id, status, attempts, error)
+                if error:
+                    print(f"[DMDispatcher] DM ({kind}) an {user_id} => {status}: {error}")
+                return status
+            # Transienter Fehler -> Versuch merken, kurz warten, nochmal
+            await self._call("dm_deliveries.record", self._record,
+                             event_id, kind, user_id, "retry", attempts, error)
+            await asyncio.sleep(2 ** attempts)
+
+    async def dispatch(self, event_id, kind, user_ids, embed):
+        """
+        Sendet embed an alle user_ids, die für (event_id, kind) noch offen sind.
+        Gibt {status: anzahl} für diesen Lauf zurück.
+        """
+        todo = await self._call("dm_deliveries.prepare", self._prepare, event_id, kind, user_ids)
+        if not todo:
+            return {}
+        results = await asyncio.gather(
+            *(self._deliver(event_id, kind, u, embed) for u in todo)
+        )
+        summary = {}
+        for status in results:
+            summary[status] = summary.get(status, 0) + 1
+        print(f"[DMDispatcher] Event {event_id} ({kind}): {summary}")
+        return summary
+
+    def _count_open(self, event_id, kind) -> int:
+        conn = get_connection()
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT COUNT(*)
+            FROM dm_deliveries
+            WHERE event_id=? AND kind=?
+              AND status NOT IN ({",".join("?" * len(FINAL_STATUSES))})
+        """, (event_id, kind, *FINAL_STATUSES))
+        remaining = c.fetchone()[0]
+        conn.close()
+        return remaining
+
+    async def all_processed(self, event_id, kind) -> bool:
+        """
+        True, wenn jeder Empfänger von (event_id, kind) einen Endzustand hat.
+        """
+        return await self._call("dm_deliveries.open", self._count_open, event_id, kind) == 0
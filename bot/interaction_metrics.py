@@ -0,0 +1,87 @@
+# Datei: bot/interaction_metrics.py
+#
+# Zeit bis zur ersten Antwort (send_message/defer) pro Interaktions-Typ.
+# Discord verwirft Interaktionen, die nicht innerhalb von 3 Sekunden
+# beantwortet werden ("Diese Interaktion ist fehlgeschlagen").
+
+import time
+from collections import deque
+
+from webapp.metrics import registry
+
+# Antworten ab dieser Dauer zählen als "knapp" (Puffer für Netz-Latenz)
+SLOW_RESPONSE_S = 2.0
+SAMPLES = 500
+
+FIRST_RESPONSE_SECONDS = registry.histogram(
+    "bot_interaction_first_response_seconds", "Zeit bis zur ersten Antwort pro Interaktions-Typ", ("kind",),
+)
+INTERACTIONS_FAILED = registry.counter(
+    "bot_interactions_failed_total", "Interaktionen, deren erste Antwort fehlschlug", ("kind",),
+)
+
+
+class InteractionMetrics:
+    def __init__(self, samples=SAMPLES):
+        self.samples = samples
+        self._data = {}     # kind -> {"count", "slow", "failed", "max", "recent": deque}
+
+    def _entry(self, kind):
+        entry = self._data.get(kind)
+        if entry is None:
+            entry = self._data[kind] = {
+                "count": 0, "slow": 0, "failed": 0, "max": 0.0,
+                "recent": deque(maxlen=self.samples),
+            }
+        return entry
+
+    def record(self, kind, seconds, failed=False):
+        FIRST_RESPONSE_SECONDS.observe(seconds, kind)
+        entry = self._entry(kind)
+        entry["count"] += 1
+        entry["max"] = max(entry["max"], seconds)
+        entry["recent"].append(seconds)
+        if seconds >= SLOW_RESPONSE_S:
+            entry["slow"] += 1
+            print(f"[InteractionMetrics] {kind}: erste Antwort nach {seconds * 1000:.0f} ms")
+        if failed:
+            entry["failed"] += 1
+            INTERACTIONS_FAILED.inc(kind)
+
+    async def _first(self, kind, started, response):
+        try:
+            await response
+        except Exception:
+            self.record(kind, time.perf_counter() - started, failed=True)
+            raise
+        self.record(kind, time.perf_counter() - started)
+
+    async def ack(self, interaction, kind, started, **defer_kwargs):
+        """
+        interaction.response.defer(...) und Zeit seit started (time.perf_counter()) verbuchen.
+        """
+        await self._first(kind, started, interaction.response.defer(**defer_kwargs))
+
+    async def respond(self, interaction, kind, started, *args, **kwargs):
+        """
+        Wie ack, aber direkt mit interaction.response.send_message(...).
+        """
+        await self._first(kind, started, interaction.response.send_message(*args, **kwargs))
+
+    def stats(self) -> dict:
+        result = {}
+        for kind, entry in sorted(self._data.items()):
+            recent = sorted(entry["recent"])
+            def pct(p):
+                if not recent:
+                    return 0.0
+                return round(recent[min(len(recent) - 1, int(p * len(recent)))] * 1000, 1)
+            result[kind] = {
+                "count": entry["count"],
+                "slow": entry["slow"],
+                "failed": entry["failed"],
+                "p50_ms": pct(0.50),
+                "p99_ms": pct(0.99),
+                "max_ms": round(entry["max"] * 1000, 1),
+            }
+        return result
@@ -0,0 +1,299 @@
+# Datei: bot/update_scheduler.py
+#
+# Rate-Limit-bewusster Scheduler für Embed-Updates.
+#  - RateLimitTracker liest Discords Rate-Limit-Header (X-RateLimit-*) aus jeder
+#    REST-Antwort (aiohttp TraceConfig) und führt pro Route/Bucket ein Budget.
+#  - EmbedUpdateScheduler fasst mehrere Updates desselben Events zusammen,
+#    arbeitet verschiedene Events parallel ab (begrenzt) und zieht Events vor,
+#    deren Briefing kurz bevorsteht. Mit partition_fn (z.B. Guild des Events)
+#    bekommt jede Partition eine eigene Warteschlange; sie werden reihum bedient,
+#    damit eine Guild mit vielen Updates die anderen nicht ausbremst.
+
+import asyncio
+import heapq
+import re
+import time
+from collections import deque
+
+import aiohttp
+
+from webapp.metrics import bot_task_errors, bot_task_seconds, registry
+
+# Snowflakes in REST-Pfaden: channel/guild/webhook-IDs sind "major parameters"
+# (eigener Bucket pro Kanal), alle anderen IDs werden zu Platzhaltern.
+_MAJOR_RE = re.compile(r"^/(channels|guilds|webhooks)/(\d+)")
+_ID_RE = re.compile(r"/\d{15,25}")
+_ANY_ID_RE = re.compile(r"/\d+(?=/|$)")
+
+REST_REQUESTS = registry.counter(
+    "bot_discord_requests_total", "REST-Aufrufe an Discord pro Route und Status", ("route", "status"),
+)
+REST_RATELIMITED = registry.counter(
+    "bot_discord_ratelimited_total", "429-Antworten von Discord pro Route", ("route",),
+)
+
+
+def route_key(method: str, path: str) -> str:
+    """
+    Normalisiert einen REST-Pfad zu einem Bucket-Schlüssel,
+    z.B. PATCH /channels/123/messages/456 -> "PATCH /channels/123/messages/{id}".
+    """
+    if "/api/v" in path:
+        path = path.split("/api/v", 1)[1]
+        path = path[path.index("/"):] if "/" in path else path
+    major = _MAJOR_RE.match(path)
+    if major:
+        head = major.group(0)
+        rest = _ID_RE.sub("/{id}", path[len(head):])
+        return f"{method.upper()} {head}{rest}"
+    return f"{method.upper()} {_ID_RE.sub('/{id}', path)}"
+
+def route_label(key: str) -> str:
+    """
+    Bucket-Schlüssel ohne Kanal-/Guild-ID (begrenzte Label-Anzahl für Metriken).
+    """
+    return _ANY_ID_RE.sub("/{id}", key)
+
+
+class BucketState:
+    __slots__ = ("limit", "remaining", "reset_at", "bucket")
+
+    def __init__(self):
+        self.limit = None
+        self.remaining = None
+        self.reset_at = 0.0
+        self.bucket = None
+
+
+class RateLimitTracker:
+    """
+    Verfolgt Discords Rate-Limit-Buckets pro Route anhand der Antwort-Header.
+    acquire(route) wartet, falls das bekannte Budget der Route aufgebraucht ist.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.stats = {"requests": 0, "ratelimited": 0}
+        self.trace_config = aiohttp.TraceConfig()
+        self.trace_config.on_request_end.append(self._on_request_end)
+
+    def _state(self, key) -> BucketState:
+        state = self.routes.get(key)
+        if state is None:
+            state = self.routes[key] = BucketState()
+        return state
+
+    async def _on_request_end(self, session, ctx, params):
+        response = params.response
+        key = route_key(params.method, params.url.path)
+        self.update(key, response.status, response.headers)
+
+    def update(self, key, status, headers):
+        self.stats["requests"] += 1
+        route = route_label(key)
+        REST_REQUESTS.inc(route, status)
+        state = self._state(key)
+        now = time.monotonic()
+        try:
+            if "X-RateLimit-Limit" in headers:
+                state.limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Remaining" in headers:
+                state.remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Reset-After" in headers:
+                state.reset_at = now + float(headers["X-RateLimit-Reset-After"])
+            state.bucket = headers.get("X-RateLimit-Bucket", state.bucket)
+        except ValueError:
+            pass
+        if status == 429:
+            self.stats["ratelimited"] += 1
+            REST_RATELIMITED.inc(route)
+            state.remaining = 0
+            retry_after = headers.get("Retry-After")
+            if retry_after:
+                try:
+                    state.reset_at = max(state.reset_at, now + float(retry_after))
+                except ValueError:
+                    pass
+
+    async def acquire(self, key):
+        """
+        Reserviert einen Request im Budget der Route (wartet ggf. bis zum Reset).
+        Unbekannte Routen werden sofort durchgelassen.
+        """
+        state = self._state(key)
+        while True:
+            now = time.monotonic()
+            if state.remaining is None:
+                return
+            if now >= state.reset_at and state.limit is not None:
+                # Fenster ist abgelaufen -> Budget wieder voll (bis der nächste Header kommt)
+                state.remaining = state.limit
+            if state.remaining > 0:
+                state.remaining -= 1
+                return
+            await asyncio.sleep(max(0.05, state.reset_at - now))
+
+
+class EmbedUpdateScheduler:
+    """
+    Warteschlange für Embed-Updates pro Event.
+     - schedule(event_id) mehrfach hintereinander => ein Update (coalescing)
+     - kommt während eines laufenden Updates ein neuer Auftrag, läuft danach genau
+       ein weiteres Update
+     - bis zu max_concurrency Events werden parallel aktualisiert, davon höchstens
+       max_per_partition aus derselben Partition (partition_fn, z.B. Guild)
+     - innerhalb einer Partition kleinere Priorität zuerst (priority_fn, z.B.
+       Sekunden bis zum Briefing), Partitionen reihum
+    """
+
+    def __init__(self, handler, priority_fn=None, max_concurrency=3, coalesce_delay=1.0,
+                 partition_fn=None, max_per_partition=2):
+        self.handler = handler
+        self.priority_fn = priority_fn
+        self.partition_fn = partition_fn
+        self.max_concurrency = max_concurrency
+        self.max_per_partition = max_per_partition
+        self.coalesce_delay = coalesce_delay
+        self._pending = {}       # event_id -> (priority, enqueued_at, partition)
+        self._heaps = {}         # partition -> [(priority, enqueued_at, event_id), ...]
+        self._order = deque()    # Partitionen mit Aufträgen, reihum
+        self._in_flight = {}     # event_id -> partition
+        self._running = {}       # partition -> laufende Updates
+        self._dirty = set()
+        self._workers = set()
+        self._wake = None
+        self._task = None
+
+    def _priority(self, event_id):
+        if self.priority_fn is None:
+            return 0
+        try:
+            return self.priority_fn(event_id)
+        except Exception:
+            return float("inf")
+
+    def _partition(self, event_id):
+        if self.partition_fn is None:
+            return None
+        try:
+            return self.partition_fn(event_id)
+        except Exception:
+            return None
+
+    def schedule(self, event_id):
+        if event_id in self._in_flight:
+            self._dirty.add(event_id)
+            return
+        if event_id in self._pending:
+            return
+        prio = self._priority(event_id)
+        key = self._partition(event_id)
+        enqueued_at = time.monotonic()
+        self._pending[event_id] = (prio, enqueued_at, key)
+        if key not in self._heaps:
+            self._heaps[key] = []
+            self._order.append(key)
+        heapq.heappush(self._heaps[key], (prio, enqueued_at, event_id))
+        if self._wake is not None:
+            self._wake.set()
+
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def queue_depths(self) -> dict:
+        """
+        Wartende Updates pro Partition.
+        """
+        depths = {}
+        for _, _, key in self._pending.values():
+            depths[key] = depths.get(key, 0) + 1
+        return depths
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def oldest_age(self) -> float:
+        if not self._pending:
+            return 0.0
+        return time.monotonic() - min(t for _, t, _ in self._pending.values())
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.is_running():
+            self._wake = asyncio.Event()
+            if self._pending:
+                self._wake.set()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            # Kurz sammeln, damit ein Klick-Burst nur ein Update auslöst
+            if self.coalesce_delay and self._pending:
+                oldest = min(t for _, t, _ in self._pending.values())
+                wait = oldest + self.coalesce_delay - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            self._dispatch()
+
+    def _next_event(self, key):
+        heap = self._heaps.get(key)
+        while heap:
+            _, _, event_id = heapq.heappop(heap)
+            entry = self._pending.get(event_id)
+            if entry is not None and entry[2] == key:
+                return event_id
+        return None
+
+    def _dispatch(self):
+        skipped = 0
+        while self._order and len(self._in_flight) < self.max_concurrency and skipped < len(self._order):
+            key = self._order.popleft()
+            if self._running.get(key, 0) >= self.max_per_partition:
+                # Partition ausgelastet -> nächste Partition
+                self._order.append(key)
+                skipped += 1
+                continue
+            event_id = self._next_event(key)
+            if self._heaps.get(key):
+                self._order.append(key)
+            else:
+                self._heaps.pop(key, None)
+            if event_id is None:
+                continue
+            skipped = 0
+            del self._pending[event_id]
+            self._in_flight[event_id] = key
+            self._running[key] = self._running.get(key, 0) + 1
+            worker = asyncio.create_task(self._run_one(event_id))
+            # Referenz halten, sonst kann der Task vom GC eingesammelt werden
+            self._workers.add(worker)
+            worker.add_done_callback(self._workers.discard)
+
+    async def _run_one(self, event_id):
+        started = time.perf_counter()
+        try:
+            await self.handler(event_id)
+        except Exception as e:
+            bot_task_errors.inc("embed_update")
+            print(f"[EmbedUpdateScheduler] Fehler bei Event {event_id}: {e}")
+        finally:
+            bot_task_seconds.observe(time.perf_counter() - started, "embed_update")
+            key = self._in_flight.pop(event_id, None)
+            self._running[key] = self._running.get(key, 1) - 1
+            if self._running[key] <= 0:
+                del self._running[key]
+            if event_id in self._dirty:
+                self._dirty.discard(event_id)
+                self.schedule(event_id)
+            elif self._pending:
+                # Platz frei geworden -> restliche Warteschlange weiter abarbeiten
+                self._wake.set()
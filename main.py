@@ -1,28 +1,66 @@
 # main.py
 import os
+import sys
 import threading
 from dotenv import load_dotenv
 
-from webapp import create_app
-from bot.bot import run_discord_bot
-
 load_dotenv()
 
+# Betriebsarten:
+#   all  (Standard) - Bot + Flask-Entwicklungsserver in einem Prozess (kleine Installationen)
+#   bot             - nur der Discord-Bot (Web läuft separat, z.B. gunicorn wsgi:app)
+#   web             - nur das Webinterface unter waitress (falls installiert)
+MODES = ("all", "bot", "web")
+
 def run_flask_app():
     """Erstellt und startet die Flask-App."""
-    from webapp.db import init_db
-    init_db()  # DB anlegen (wenn nicht vorhanden)
-    
-    app = create_app()
+    from webapp import create_app
+    app = create_app(init_database=False)  # init_db() lief schon in __main__
     host = os.getenv("FLASK_HOST", "127.0.0.1")
     port = int(os.getenv("FLASK_PORT", 5000))
     # WICHTIG: debug=False, weil sonst der Flask-Reloader 2 Threads macht
     app.run(host=host, port=port, debug=False)
 
+def run_web_server():
+    """
+    Startet das Webinterface eigenständig unter waitress.
+    Für mehrere Worker-Prozesse stattdessen z.B.:
+        gunicorn -w 4 --preload -b 127.0.0.1:5000 wsgi:app
+    """
+    try:
+        from waitress import serve
+    except ImportError:
+        print("[main] waitress ist nicht installiert (pip install waitress) "
+              "- alternativ: gunicorn -w 4 --preload wsgi:app")
+        sys.exit(1)
+
+    from webapp import create_app
+    app = create_app(init_database=False)  # init_db() lief schon in __main__
+    host = os.getenv("FLASK_HOST", "127.0.0.1")
+    port = int(os.getenv("FLASK_PORT", 5000))
+    threads = int(os.getenv("WEB_THREADS", 8))
+    print(f"[main] Webinterface unter waitress auf {host}:{port} ({threads} Threads)")
+    serve(app, host=host, port=port, threads=threads)
+
 if __name__ == "__main__":
-    # 1) Flask im Hintergrund starten
-    flask_thread = threading.Thread(target=run_flask_app, daemon=True)
-    flask_thread.start()
+    mode = (sys.argv[1] if len(sys.argv) > 1 else os.getenv("APP_MODE", "all")).lower()
+    if mode not in MODES:
+        print(f"[main] Unbekannter Modus '{mode}'. Erlaubt: {', '.join(MODES)}")
+        sys.exit(2)
+
+    # 0) DB anlegen + Migrationen, einmal vor Bot und Flask
+    from webapp.db import init_db
+    init_db()
+
+    if mode == "web":
+        run_web_server()
+    else:
+        from bot.bot import run_discord_bot
+
+        if mode == "all":
+            # 1) Flask im Hintergrund starten
+            flask_thread = threading.Thread(target=run_flask_app, daemon=True)
+            flask_thread.start()
 
-    # 2) Den Bot starten (blockiert, bis Programm beendet wird)
-    run_discord_bot()
+        # 2) Den Bot starten (blockiert, bis Programm beendet wird)
+        run_discord_bot()
@@ -2,15 +2,24 @@ from flask import Flask
 from .db import init_db
 from .routes import bp as routes_bp
 from webapp.auth import bp as auth_bp
+from .api import bp as api_bp
+from . import metrics
 
-def create_app():
+def create_app(init_database=True):
+    """
+    init_database=False, wenn der Aufrufer init_db() schon ausgeführt hat
+    (main.py macht das einmal vor Bot und Webinterface).
+    """
     app = Flask(__name__)
     app.secret_key = "irgendein-string"  # Für Session/CSRF
     
-    init_db()  # Stelle sicher, dass DB existiert
+    if init_database:
+        init_db()  # Stelle sicher, dass DB existiert
     
     # Routen / Blueprint registrieren
     app.register_blueprint(routes_bp)
     app.register_blueprint(auth_bp)        # unser neues auth.py
+    app.register_blueprint(api_bp)         # JSON-API unter /api/v1
+    metrics.init_app(app)                  # GET /metrics (Prometheus)
     
     return app
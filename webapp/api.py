@@ -0,0 +1,192 @@
+# Datei: webapp/api.py
+#
+# JSON-API (v1) für Overlays, Statistik-Skripte usw.
+#   GET /api/v1/events                    Event-Liste (Keyset-Cursor wie die Übersicht)
+#   GET /api/v1/events/<id>               Event-Daten (ohne Passwort) + Anmeldezahlen
+#   GET /api/v1/events/<id>/roster        Squads, Wartelisten und Zahlen je Seite
+#
+# Einzel-Events tragen ein starkes ETag aus events.change_version. Die Version
+# wird pro Prozess API_VERSION_TTL Sekunden gecacht; ein Poller mit passendem
+# If-None-Match bekommt in dieser Zeit ein 304 ganz ohne DB-Zugriff.
+#
+# Zugriff: eingeloggte Session (Webinterface) oder "Authorization: Bearer <API_TOKEN>".
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import Blueprint, Response, jsonify, request, session
+
+from .notify import add_listener
+from .roster_projection import get_event_version, get_roster_projection
+from .routes_utils import (
+    EVENT_FILTERS, EVENT_PAGE_SIZE, get_event_dict, list_events, signup_counts,
+)
+
+API_TOKEN = os.getenv("API_TOKEN", "")
+API_VERSION_TTL = float(os.getenv("API_VERSION_TTL", 2))
+API_MAX_PAGE_SIZE = 100
+
+# Diese Felder verlassen die API nie
+PRIVATE_EVENT_FIELDS = (
+    "password",
+    "info_embed_hash", "allies_embed_hash", "axis_embed_hash",
+    # Posting-Zustand des Bots: wird ohne change_version geschrieben und
+    # wäre damit nicht vom ETag (event_etag) abgedeckt
+    "posted_in_discord", "channel_id",
+    "info_message_id", "allies_message_id", "axis_message_id",
+    "pw_sent", "spawned_next_event",
+)
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+def api_auth_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if session.get("logged_in"):
+            return f(*args, **kwargs)
+        auth = request.headers.get("Authorization", "")
+        if API_TOKEN and auth.startswith("Bearer ") and hmac.compare_digest(auth[7:], API_TOKEN):
+            return f(*args, **kwargs)
+        return jsonify({"error": "unauthorized"}), 401
+    return decorated_function
+
+
+#########################################
+# Versions-Cache (für 304 ohne DB)
+#########################################
+
+_versions = {}      # event_id -> (version oder None, geholt_um)
+_versions_lock = threading.Lock()
+
+def cached_event_version(event_id):
+    """
+    change_version des Events (None = existiert nicht), höchstens
+    API_VERSION_TTL Sekunden alt.
+    """
+    now = time.monotonic()
+    with _versions_lock:
+        hit = _versions.get(event_id)
+        if hit and now - hit[1] < API_VERSION_TTL:
+            return hit[0]
+    version = get_event_version(event_id)
+    with _versions_lock:
+        _versions[event_id] = (version, now)
+    return version
+
+def forget_event_version(event_id, kind=None):
+    """
+    Listener für webapp.notify: Änderungen aus diesem Prozess sofort sichtbar machen.
+    """
+    with _versions_lock:
+        _versions.pop(event_id, None)
+
+add_listener(forget_event_version)
+
+
+def not_modified(etag):
+    if not request.if_none_match.contains(etag):
+        return None
+    resp = Response(status=304)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+def json_with_etag(payload, etag):
+    resp = jsonify(payload)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+def event_etag(event_id, version, kind):
+    return f"{kind}-{event_id}-v{version or 0}"
+
+def remember_event_version(event_id, version):
+    with _versions_lock:
+        _versions[event_id] = (version, time.monotonic())
+
+
+#########################################
+# Routen
+#########################################
+
+def public_event(evt: dict) -> dict:
+    return {k: v for k, v in evt.items() if k not in PRIVATE_EVENT_FIELDS}
+
+@bp.route("/events")
+@api_auth_required
+def events_list():
+    """
+    ?filter=all|upcoming|past|recurring, ?q=Name, ?cursor=..., ?limit=1..100
+    """
+    filter_ = request.args.get("filter", "all")
+    if filter_ not in EVENT_FILTERS:
+        return jsonify({"error": f"unknown filter, expected one of {list(EVENT_FILTERS)}"}), 400
+    try:
+        limit = int(request.args.get("limit", EVENT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = max(1, min(limit, API_MAX_PAGE_SIZE))
+    q = request.args.get("q", "").strip() or None
+
+    events, next_cursor = list_events(filter_, q, request.args.get("cursor"), limit)
+    counts = signup_counts([e["id"] for e in events])
+    payload = {
+        "events": [dict(e, counts=counts[e["id"]]) for e in events],
+        "next_cursor": next_cursor,
+    }
+    # Listen haben keinen einzelnen Versionszähler -> ETag aus dem Inhalt
+    # (spart Bandbreite, nicht die Query)
+    body = json.dumps(payload, sort_keys=True, default=str)
+    etag = "l-" + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+    return not_modified(etag) or json_with_etag(payload, etag)
+
+@bp.route("/events/<int:event_id>")
+@api_auth_required
+def event_detail(event_id):
+    version = cached_event_version(event_id)
+    if version is None:
+        return jsonify({"error": "event not found"}), 404
+    cached = not_modified(event_etag(event_id, version, "e"))
+    if cached:
+        return cached
+
+    evt = get_event_dict(event_id)
+    if not evt:
+        return jsonify({"error": "event not found"}), 404
+    # ETag aus dem tatsächlich gelesenen Stand (Cache kann bis zu TTL zurückliegen)
+    remember_event_version(event_id, evt.get("change_version") or 0)
+    data = public_event(evt)
+    data["counts"] = signup_counts([event_id])[event_id]
+    return json_with_etag(data, event_etag(event_id, evt.get("change_version"), "e"))
+
+@bp.route("/events/<int:event_id>/roster")
+@api_auth_required
+def event_roster(event_id):
+    version = cached_event_version(event_id)
+    if version is None:
+        return jsonify({"error": "event not found"}), 404
+    cached = not_modified(event_etag(event_id, version, "r"))
+    if cached:
+        return cached
+
+    projection = get_roster_projection(event_id)
+    if projection is None:
+        return jsonify({"error": "event not found"}), 404
+    remember_event_version(event_id, projection["version"])
+    payload = {
+        "event_id": event_id,
+        "version": projection["version"],
+        "squads": {s: projection[s] for s in ("allies", "axis")},
+        "waiting": projection["waiting"],
+        "counts": {
+            "active": projection["totals"],
+            "waiting": projection["waiting_totals"],
+        },
+    }
+    return json_with_etag(payload, event_etag(event_id, projection["version"], "r"))
@@ -3,10 +3,12 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 from functools import wraps
 from datetime import datetime
-import bcrypt
 import secrets
 
 from .db import get_connection
+from .passwords import (
+    PasswordPoolBusy, check_password, hash_password, login_throttle,
+)
 
 bp = Blueprint("auth", __name__)
 
@@ -47,10 +49,17 @@ def login():
     """
     Zeigt das Login-Formular und prüft die Logindaten. 
     Bei Erfolg: Session (username, logged_in, role).
+    Zu viele Fehlversuche (pro IP / Benutzername) => 429 ohne Passwortprüfung.
     """
     if request.method == "POST":
         username = request.form.get("username")
         password = request.form.get("password")
+        client_ip = request.remote_addr
+
+        wait = login_throttle.retry_after(client_ip, username)
+        if wait:
+            flash(f"Zu viele Fehlversuche. Bitte in {wait // 60 + 1} Minuten erneut versuchen.", "danger")
+            return render_template("login.html"), 429
 
         conn = get_connection()
         c = conn.cursor()
@@ -64,13 +73,20 @@ def login():
 
         if row:
             user_id, db_username, db_password_hash, db_role = row
-            if bcrypt.checkpw(password.encode("utf-8"), db_password_hash):
+            try:
+                valid = check_password(password, db_password_hash)
+            except PasswordPoolBusy:
+                flash("Server gerade ausgelastet, bitte gleich nochmal versuchen.", "warning")
+                return render_template("login.html"), 503
+            if valid:
+                login_throttle.record_success(client_ip, username)
                 session["logged_in"] = True
                 session["username"] = db_username
                 session["role"] = db_role
                 flash("Login erfolgreich!", "success")
                 return redirect(url_for("routes.index"))
-        
+
+        login_throttle.record_failure(client_ip, username)
         flash("Falscher Benutzername oder Passwort!", "danger")
         return redirect(url_for("auth.login"))
 
@@ -229,7 +245,12 @@ def register_via_invite(token):
             conn.close()
             return redirect(request.url)
 
-        hashed_pw = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
+        try:
+            hashed_pw = hash_password(new_password)
+        except PasswordPoolBusy:
+            conn.close()
+            flash("Server gerade ausgelastet, bitte gleich nochmal versuchen.", "warning")
+            return redirect(request.url)
         c.execute("""
             INSERT INTO users (username, password_hash, role)
             VALUES (?,?,?)
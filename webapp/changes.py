@@ -0,0 +1,76 @@
+# Datei: webapp/changes.py
+#
+# Append-only Änderungs-Feed (Tabelle changes) zwischen Webinterface und Bot.
+# Jede Änderung an einem Event oder seinen Anmeldungen schreibt in derselben
+# Transaktion eine Zeile (event_id, kind, source). Leser merken sich die
+# zuletzt verarbeitete id und holen nur neuere Zeilen (Range-Scan über den
+# Primärschlüssel, im Leerlauf 0 Treffer):
+#  - der Bot (bot/change_feed.py), Cursor in bot_state.changes_cursor
+#  - der Live-Roster der Detailseite (webapp/live.py), Cursor im Speicher
+#
+# kind:   'created', 'updated', 'deleted' (Event), 'signup' (Anmeldungen)
+# source: 'web' oder 'bot' - der Bot überspringt seine eigenen Änderungen.
+
+import os
+from datetime import datetime, timedelta
+
+from .db import get_connection
+
+CHANGES_RETENTION_DAYS = float(os.getenv("CHANGES_RETENTION_DAYS", 7))
+CHANGES_BATCH = 500
+
+def record_change(c, event_id, kind, source):
+    """
+    Schreibt einen Feed-Eintrag im Cursor/der Transaktion des Aufrufers.
+    """
+    c.execute("""
+        INSERT INTO changes (event_id, kind, source, created_at)
+        VALUES (?,?,?,?)
+    """, (event_id, kind, source, datetime.now()))
+
+def latest_change_id() -> int:
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("SELECT MAX(id) FROM changes")
+    row = c.fetchone()
+    conn.close()
+    return row[0] or 0
+
+def changes_since(after_id, limit=CHANGES_BATCH):
+    """
+    [(id, event_id, kind, source), ...] mit id > after_id, älteste zuerst.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("""
+        SELECT id, event_id, kind, source
+        FROM changes
+        WHERE id > ?
+        ORDER BY id ASC
+        LIMIT ?
+    """, (after_id, limit))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def collapse_changes(rows):
+    """
+    Fasst einen Batch pro Event zusammen: {event_id: set(kinds)}.
+    Mehrere Anmeldungen in einem Batch ergeben so nur ein Update pro Event.
+    """
+    result = {}
+    for _, event_id, kind, _ in rows:
+        result.setdefault(event_id, set()).add(kind)
+    return result
+
+def prune_changes(days=CHANGES_RETENTION_DAYS):
+    """
+    Löscht Feed-Einträge, die älter als days Tage sind. Gibt die Anzahl zurück.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("DELETE FROM changes WHERE created_at < ?", (datetime.now() - timedelta(days=days),))
+    deleted = c.rowcount
+    conn.commit()
+    conn.close()
+    return deleted
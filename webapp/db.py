@@ -1,20 +1,236 @@
 # Datei: webapp/db.py
 
 import os
+import queue
 import sqlite3
-import bcrypt
+import threading
+import time
 import secrets
 from datetime import datetime
 from dotenv import load_dotenv
 
+from .migrations import run_migrations
+from .passwords import hash_password_blocking
+
 load_dotenv()
 DB_PATH = os.getenv("DB_PATH", "events.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+
+# Pragmas für jede Pool-Verbindung (WAL => Leser blockieren Schreiber nicht mehr)
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",        # ~20 MB Page-Cache pro Verbindung
+    "PRAGMA mmap_size=268435456",      # 256 MB memory-mapped I/O
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}",
+)
+
+
+class PooledConnection:
+    """
+    Dünner Wrapper um eine sqlite3-Verbindung aus dem Pool.
+    Verhält sich wie sqlite3.Connection, aber close() gibt die Verbindung
+    an den Pool zurück, statt sie wirklich zu schließen.
+    Als Context-Manager: commit bei Erfolg, rollback bei Exception, danach close().
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        if self.__dict__.get("_raw") is None:
+            raise sqlite3.ProgrammingError("Verbindung wurde bereits an den Pool zurückgegeben.")
+        return getattr(self._raw, name)
+
+    def close(self):
+        raw = self.__dict__.get("_raw")
+        if raw is not None:
+            self._raw = None
+            self._pool.release(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._raw is not None:
+                if exc_type is None:
+                    self._raw.commit()
+                else:
+                    self._raw.rollback()
+        finally:
+            self.close()
+        return False
+
+    def __del__(self):
+        # Falls jemand close() vergisst, landet die Verbindung trotzdem wieder im Pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Thread-sicherer Pool offener SQLite-Verbindungen (WAL-Modus).
+    Wird vom Flask-Thread und vom asyncio-Loop des Bots gemeinsam genutzt.
+    Zählt Treffer (wiederverwendete Verbindung), Fehlschläge (neu geöffnet)
+    und Wartezeiten, falls alle Verbindungen vergeben sind.
+    """
+
+    def __init__(self, path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.path = path
+        self.pid = os.getpid()
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "in_use": 0,
+        }
+
+    def _open(self):
+        raw = sqlite3.connect(
+            self.path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+        )
+        for pragma in PRAGMAS:
+            raw.execute(pragma)
+        return raw
+
+    def acquire(self):
+        try:
+            raw = self._idle.get_nowait()
+            with self._lock:
+                self.stats["hits"] += 1
+                self.stats["in_use"] += 1
+            return raw
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._created < self.size
+            if can_open:
+                self._created += 1
+        if can_open:
+            try:
+                raw = self._open()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self.stats["misses"] += 1
+                self.stats["in_use"] += 1
+            return raw
+
+        # Pool erschöpft -> warten, bis jemand eine Verbindung zurückgibt
+        started = time.perf_counter()
+        try:
+            raw = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Keine freie DB-Verbindung nach {self.timeout}s (Pool-Größe {self.size})."
+            )
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.stats["hits"] += 1
+            self.stats["waits"] += 1
+            self.stats["wait_time_total"] += waited
+            self.stats["wait_time_max"] = max(self.stats["wait_time_max"], waited)
+            self.stats["in_use"] += 1
+        return raw
+
+    def release(self, raw):
+        with self._lock:
+            self.stats["in_use"] -= 1
+        if self._closed:
+            raw.close()
+            return
+        try:
+            # Offene (nicht committete) Transaktionen nicht an den nächsten Nutzer vererben
+            if raw.in_transaction:
+                raw.rollback()
+        except sqlite3.Error:
+            raw.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(raw)
+
+    def connection(self):
+        return PooledConnection(self, self.acquire())
+
+    def close_all(self):
+        self._closed = True
+        while True:
+            try:
+                raw = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            raw.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """
+    Liefert den prozessweiten Pool für DB_PATH (wird beim ersten Aufruf angelegt).
+    Nach einem fork() (z.B. gunicorn-Worker) bekommt jeder Prozess einen eigenen Pool;
+    geerbte SQLite-Verbindungen dürfen nicht weiterverwendet werden.
+    """
+    global _pool
+    pid = os.getpid()
+    if _pool is None or _pool.path != DB_PATH or _pool.pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool.path != DB_PATH or _pool.pid != pid:
+                if _pool is not None and _pool.pid == pid:
+                    _pool.close_all()
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+def get_pool_stats():
+    """
+    Kopie der Pool-Zähler (hits, misses, waits, wait_time_total, wait_time_max, in_use).
+    """
+    pool = get_pool()
+    with pool._lock:
+        stats = dict(pool.stats)
+    stats["size"] = pool.size
+    stats["open"] = pool._created
+    return stats
+
+def close_pool():
+    """
+    Schließt alle offenen Verbindungen (z.B. beim Herunterfahren).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
 
 def get_connection():
     """
-    Stellt eine Verbindung zur SQLite-Datenbank her.
+    Holt eine Verbindung aus dem gemeinsamen Pool.
+    conn.close() gibt sie an den Pool zurück (bestehender Code bleibt unverändert).
     """
-    return sqlite3.connect(DB_PATH)
+    return get_pool().connection()
 
 def init_db():
     """
@@ -22,9 +238,13 @@ def init_db():
     inkl. der Spalten 'recurrence_pattern', 'spawned_next_event',
     'posted_in_discord' in 'events'.
     Außerdem einmaligen Superadmin-User (manager).
+    Danach laufen die noch offenen Migrationen aus migrations.py.
     """
     conn = get_connection()
     c = conn.cursor()
+    # Schreib-Lock für die ganze Initialisierung: startende Web-Worker und der Bot
+    # legen bot_state/system_settings/superadmin sonst ggf. doppelt an.
+    c.execute("BEGIN IMMEDIATE")
 
     # Tabelle: Events
     c.execute("""
@@ -142,7 +362,7 @@ def init_db():
         if not su:
             # superadmin noch nicht angelegt -> anlegen
             random_pw = secrets.token_urlsafe(10)
-            hashed_pw = bcrypt.hashpw(random_pw.encode("utf-8"), bcrypt.gensalt())
+            hashed_pw = hash_password_blocking(random_pw)
             c.execute("""
                 INSERT INTO users (username, password_hash, role)
                 VALUES (?,?,?)
@@ -156,19 +376,9 @@ def init_db():
             print("="*50)
 
     conn.commit()
+
+    # Versionierte Schema-Änderungen (Spalten, Indizes, ...)
+    run_migrations(conn)
     conn.close()
 
     print("[init_db] Datenbank initialisiert.")
-
-#
-# Wenn du bereits eine bestehende DB hast und nur die Spalte posted_in_discord
-# ergänzen willst, kannst du in einer SQLite-Konsole (o.ä.) Folgendes ausführen:
-#
-# ALTER TABLE events ADD COLUMN posted_in_discord INTEGER DEFAULT 0;
-#
-# Falls du 'recurrence_pattern' und 'spawned_next_event' ebenfalls nachträglich
-# brauchst:
-#
-# ALTER TABLE events ADD COLUMN recurrence_pattern TEXT DEFAULT 'none';
-# ALTER TABLE events ADD COLUMN spawned_next_event INTEGER DEFAULT 0;
-#
@@ -0,0 +1,246 @@
+# Datei: webapp/live.py
+#
+# Live-Roster für die Detailseite per Server-Sent Events (SSE).
+#  - Ein einziger Publisher-Thread pro Prozess liest den Änderungs-Feed
+#    (webapp/changes.py) ab seinem Cursor - eine Index-Query für alle Events,
+#    im Leerlauf ohne Treffer - bzw. wird von webapp.notify sofort geweckt.
+#    Anmeldungen aus dem Bot-Prozess kommen so ebenfalls an.
+#  - Ändert sich ein Event, wird die (gecachte) Roster-Projektion einmal
+#    geladen, mit dem zuletzt gesendeten Stand verglichen und nur die
+#    geänderten Abschnitte (Seite/Rolle) als Delta verschickt.
+#  - Das Delta wird einmal serialisiert und in die Queues aller Browser des
+#    Events gelegt; weitere Zuschauer kosten keine zusätzlichen Queries.
+
+import json
+import os
+import queue
+import threading
+
+from .changes import CHANGES_BATCH, changes_since, collapse_changes, latest_change_id
+from .metrics import registry, set_counter, set_gauge
+from .notify import add_listener
+from .roster_projection import ROLES, SIDES, get_roster_projection
+
+LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", 1.0))
+LIVE_HEARTBEAT = float(os.getenv("LIVE_HEARTBEAT", 15))
+LIVE_MAX_CLIENTS = int(os.getenv("LIVE_MAX_CLIENTS", 200))
+LIVE_CLIENT_QUEUE = 50
+
+
+def sse_message(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def roster_sections(projection):
+    """
+    {"allies.inf": {"squads": [...], "waiting": [...]}, ...} für Vergleich und Versand.
+    """
+    return {
+        f"{s}.{r}": {
+            "squads": projection[s][r],
+            "waiting": projection["waiting"][s][r],
+        }
+        for s in SIDES for r in ROLES
+    }
+
+def roster_snapshot(projection):
+    return {
+        "version": projection["version"],
+        "sections": roster_sections(projection),
+        "totals": projection["totals"],
+        "waiting_totals": projection["waiting_totals"],
+    }
+
+
+class Subscriber:
+    __slots__ = ("event_id", "queue", "stale")
+
+    def __init__(self, event_id):
+        self.event_id = event_id
+        self.queue = queue.Queue(maxsize=LIVE_CLIENT_QUEUE)
+        # Queue übergelaufen -> nächste Nachricht ist ein kompletter Snapshot
+        self.stale = False
+
+
+class RosterPublisher:
+    def __init__(self, poll_interval=LIVE_POLL_INTERVAL, max_clients=LIVE_MAX_CLIENTS):
+        self.poll_interval = poll_interval
+        self.max_clients = max_clients
+        self._subs = {}          # event_id -> set(Subscriber)
+        self._sent = {}          # event_id -> zuletzt verschickter Snapshot
+        self._cursor = None      # zuletzt gelesene changes.id
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = {"clients": 0, "deltas": 0, "snapshots": 0, "dropped": 0}
+
+    #########################################
+    # An-/Abmelden (Request-Threads)
+    #########################################
+
+    def subscribe(self, event_id):
+        """
+        Gibt (Subscriber, initiale SSE-Nachricht) zurück, bzw. None, wenn das
+        Event nicht existiert. Wirft OverflowError bei LIVE_MAX_CLIENTS.
+        """
+        # Cursor vor dem Snapshot festlegen -> keine Änderung geht dazwischen verloren
+        if self._cursor is None:
+            cursor = latest_change_id()
+            with self._lock:
+                if self._cursor is None:
+                    self._cursor = cursor
+        projection = get_roster_projection(event_id)
+        if projection is None:
+            return None
+        snapshot = roster_snapshot(projection)
+        sub = Subscriber(event_id)
+        with self._lock:
+            if self.stats["clients"] >= self.max_clients:
+                raise OverflowError("zu viele Live-Verbindungen")
+            self._subs.setdefault(event_id, set()).add(sub)
+            self.stats["clients"] += 1
+            # Ist der Stand schon bekannt, verschickt der Publisher eine neuere
+            # Version als Delta an alle (Abschnitte ersetzen ist idempotent)
+            self._sent.setdefault(event_id, snapshot)
+        self._ensure_thread()
+        return sub, sse_message("snapshot", snapshot, snapshot["version"])
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subs.get(sub.event_id)
+            if subs and sub in subs:
+                subs.discard(sub)
+                self.stats["clients"] -= 1
+                if not subs:
+                    del self._subs[sub.event_id]
+                    self._sent.pop(sub.event_id, None)
+
+    def wake(self, event_id=None, kind=None):
+        """
+        Listener für webapp.notify: sofort prüfen statt erst beim nächsten Poll.
+        """
+        self._wake.set()
+
+    #########################################
+    # Publisher-Thread
+    #########################################
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="roster-publisher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self.publish_changes()
+            except Exception as e:
+                print(f"[RosterPublisher] Fehler: {e}")
+
+    def publish_changes(self):
+        while True:
+            with self._lock:
+                cursor = self._cursor
+            if cursor is None:
+                return
+            rows = changes_since(cursor)
+            if not rows:
+                return
+            with self._lock:
+                self._cursor = rows[-1][0]
+                watched = set(self._sent)
+            for event_id, kinds in collapse_changes(rows).items():
+                if event_id not in watched:
+                    continue
+                if "deleted" in kinds:
+                    self._broadcast(event_id, sse_message("deleted", {"event_id": event_id}), None)
+                    with self._lock:
+                        self._sent.pop(event_id, None)
+                else:
+                    self._publish_event(event_id)
+            if len(rows) < CHANGES_BATCH:
+                return
+
+    def _publish_event(self, event_id):
+        projection = get_roster_projection(event_id)
+        if projection is None:
+            return
+        snapshot = roster_snapshot(projection)
+        with self._lock:
+            previous = self._sent.get(event_id)
+            self._sent[event_id] = snapshot
+        changed = {
+            key: section
+            for key, section in snapshot["sections"].items()
+            if previous is None or previous["sections"].get(key) != section
+        }
+        if previous is not None and not changed and previous["version"] == snapshot["version"]:
+            return
+        delta = {
+            "version": snapshot["version"],
+            "sections": changed,
+            "totals": snapshot["totals"],
+            "waiting_totals": snapshot["waiting_totals"],
+        }
+        self.stats["deltas"] += 1
+        self._broadcast(event_id, sse_message("delta", delta, snapshot["version"]), snapshot)
+
+    def _broadcast(self, event_id, message, snapshot):
+        with self._lock:
+            subs = list(self._subs.get(event_id, ()))
+        full = None
+        for sub in subs:
+            msg = message
+            if sub.stale and snapshot is not None:
+                if full is None:
+                    full = sse_message("snapshot", snapshot, snapshot["version"])
+                    self.stats["snapshots"] += 1
+                msg = full
+            try:
+                sub.queue.put_nowait(msg)
+                sub.stale = False
+            except queue.Full:
+                # Langsamer Client: Deltas verwerfen, später Snapshot schicken
+                sub.stale = True
+                self.stats["dropped"] += 1
+
+    #########################################
+    # Stream pro Browser (Request-Thread)
+    #########################################
+
+    def stream(self, sub, initial):
+        try:
+            yield "retry: 3000\n" + initial
+            while True:
+                try:
+                    msg = sub.queue.get(timeout=LIVE_HEARTBEAT)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield msg
+                if msg.startswith("event: deleted"):
+                    return
+        finally:
+            self.unsubscribe(sub)
+
+
+publisher = RosterPublisher()
+add_listener(publisher.wake)
+
+
+def _collect_live():
+    stats = dict(publisher.stats)
+    set_gauge("live_clients", "Offene Live-Roster-Verbindungen", stats["clients"])
+    set_counter("live_deltas_total", "Verschickte Live-Roster-Deltas", stats["deltas"])
+    set_counter("live_snapshots_total", "Snapshots an zu langsame Clients", stats["snapshots"])
+    set_counter("live_dropped_total", "Verworfene Nachrichten (Client-Queue voll)", stats["dropped"])
+
+registry.add_collector(_collect_live)
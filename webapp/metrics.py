@@ -0,0 +1,287 @@
+# Datei: webapp/metrics.py
+#
+# Metriken im Prometheus-Textformat (ohne zusätzliche Abhängigkeit).
+#  - Counter/Gauge/Histogram mit Labels werden direkt an den heißen Stellen
+#    fortgeschrieben (Interaktionen, benannte DB-Queries, REST-Aufrufe, DMs,
+#    Task-Läufe, Web-Requests).
+#  - Zustände, die ohnehin schon als stats() vorliegen (Verbindungs-Pool,
+#    Update-Warteschlange, Loop-Watchdog, Live-Roster, Änderungs-Feed), liest ein
+#    Collector erst beim Abruf aus - im Normalbetrieb kostet das nichts.
+#  - render() liefert den Text für GET /metrics (Flask) bzw. den Metrik-Server
+#    des Bots (BOT_METRICS_PORT, bot/bot.py). Im Modus "all" teilen sich Bot
+#    und Webinterface die Registry, /metrics zeigt dann beides.
+
+import hmac
+import ipaddress
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+# Zugriff auf /metrics mit "Authorization: Bearer <METRICS_TOKEN>";
+# ohne Token nur für direkte Anfragen von localhost
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Sekunden; deckt schnelle Queries (ms) bis zum 3-Sekunden-Fenster von Discord ab
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: Labels {self.labelnames} erwartet, bekommen {labels}")
+        return tuple(str(v) for v in labels)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, *labels):
+        """
+        Stand eines vorhandenen Gesamtzählers übernehmen (für Collectors).
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def replace(self, values):
+        """
+        Alle Werte ersetzen ({labels-Tupel: wert}); verschwundene Labels fallen weg.
+        """
+        values = {self._key(labels): value for labels, value in values.items()}
+        with self._lock:
+            self._values = values
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, seconds, *labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += seconds
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self):
+        result = []
+        with self._lock:
+            items = sorted((key, (list(e[0]), e[1], e[2])) for key, e in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                result.append((f"{self.name}_bucket", key + (("le", _number(float(bound))),), cumulative))
+            result.append((f"{self.name}_sum", key, round(total, 6)))
+            result.append((f"{self.name}_count", key, count))
+        return result
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metrik {name} ist bereits anders registriert.")
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def add_collector(self, collect):
+        """
+        collect() wird bei jedem Abruf aufgerufen und setzt Gauges/Counter
+        aus vorhandenen stats() (z.B. Warteschlangenlänge).
+        """
+        with self._lock:
+            if collect not in self._collectors:
+                self._collectors.append(collect)
+
+    def render(self) -> str:
+        with self._lock:
+            collectors = list(self._collectors)
+        for collect in collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"[metrics] Collector {getattr(collect, '__name__', collect)} fehlgeschlagen: {e}")
+
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in samples:
+                names = metric.labelnames
+                extra = ()
+                if len(key) > len(names):
+                    key, extra = key[:len(names)], key[len(names):]
+                lines.append(f"{name}{_labels(names, key, extra)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+#########################################
+# Webinterface / gemeinsame Metriken
+#########################################
+
+web_request_seconds = registry.histogram(
+    "web_request_seconds", "Dauer der Web-Requests pro Endpoint", ("endpoint", "method", "status"),
+)
+
+# Hintergrund-Aufgaben des Bots (Embed-Updates, Deadlines, Änderungs-Feed)
+bot_task_seconds = registry.histogram(
+    "bot_task_seconds", "Laufzeit der Hintergrund-Aufgaben des Bots", ("task",),
+)
+bot_task_errors = registry.counter(
+    "bot_task_errors_total", "Fehlgeschlagene Hintergrund-Aufgaben des Bots", ("task",),
+)
+
+def set_gauge(name, help_text, value, labelnames=(), labels=()):
+    registry.gauge(name, help_text, labelnames).set(value, *labels)
+
+def set_counter(name, help_text, value, labelnames=(), labels=()):
+    registry.counter(name, help_text, labelnames).set_total(value, *labels)
+
+def _collect_pool():
+    from .db import get_pool_stats
+    stats = get_pool_stats()
+    set_counter("db_pool_hits_total", "Verbindungs-Pool: Verbindung sofort frei", stats.get("hits", 0))
+    set_counter("db_pool_misses_total", "Verbindungs-Pool: neue Verbindung geöffnet", stats.get("misses", 0))
+    set_counter("db_pool_waits_total", "Verbindungs-Pool: auf Verbindung gewartet", stats.get("waits", 0))
+    set_counter("db_pool_wait_seconds_total", "Verbindungs-Pool: Wartezeit gesamt", stats.get("wait_time_total", 0.0))
+    set_gauge("db_pool_in_use", "Verbindungs-Pool: ausgeliehene Verbindungen", stats.get("in_use", 0))
+    set_gauge("db_pool_open", "Verbindungs-Pool: offene Verbindungen", stats.get("open", 0))
+
+registry.add_collector(_collect_pool)
+
+
+#########################################
+# Flask: Request-Dauer + GET /metrics
+#########################################
+
+def _is_local(remote_addr):
+    try:
+        return ipaddress.ip_address(remote_addr or "").is_loopback
+    except ValueError:
+        return False
+
+def authorized(headers, remote_addr):
+    """
+    Mit METRICS_TOKEN nur "Authorization: Bearer <METRICS_TOKEN>".
+    Ohne Token nur direkte Anfragen von localhost - über einen Reverse-Proxy
+    (X-Forwarded-For/Forwarded gesetzt) kommt dann niemand durch.
+    """
+    if not METRICS_TOKEN:
+        proxied = headers.get("X-Forwarded-For") or headers.get("Forwarded")
+        return _is_local(remote_addr) and not proxied
+    auth_header = headers.get("Authorization", "")
+    return auth_header.startswith("Bearer ") and hmac.compare_digest(auth_header[7:], METRICS_TOKEN)
+
+def init_app(app):
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop("metrics_started", None)
+        # Live-Streams (SSE) laufen minutenlang -> nur die Antwortzeit bis zum Start zählt
+        if started is not None:
+            web_request_seconds.observe(
+                time.perf_counter() - started,
+                request.endpoint or "unbekannt", request.method, response.status_code,
+            )
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        if not authorized(request.headers, request.remote_addr):
+            return Response("unauthorized\n", status=401, mimetype="text/plain")
+        return Response(registry.render(), content_type=CONTENT_TYPE)
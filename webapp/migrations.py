@@ -0,0 +1,256 @@
+# Datei: webapp/migrations.py
+#
+# Versionierte Schema-Migrationen.
+# Jede Migration bekommt eine fortlaufende Versionsnummer und wird genau einmal
+# ausgeführt; die zuletzt angewendete Version steht in der Tabelle schema_version.
+# Migrationen müssen idempotent sein (z.B. Spalten nur anlegen, wenn sie fehlen),
+# damit auch ältere, von Hand angepasste Datenbanken sauber durchlaufen.
+
+from datetime import datetime
+
+MIGRATIONS = []
+
+def migration(version, name):
+    """
+    Dekorator: registriert eine Migration (version, name, func).
+    """
+    def decorator(func):
+        MIGRATIONS.append((version, name, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+def column_exists(c, table, column):
+    c.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in c.fetchall())
+
+def add_column_if_missing(c, table, column, definition):
+    if not column_exists(c, table, column):
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+#########################################
+# Migrationen
+#########################################
+
+@migration(1, "events: Discord-Nachrichten-IDs, posted_in_discord, pw_sent, Recurrence-Spalten")
+def _m001_event_columns(c):
+    # Ersetzt bot.ensure_event_columns_exist und die alten ALTER-TABLE-Hinweise in db.py
+    add_column_if_missing(c, "events", "info_message_id", "TEXT")
+    add_column_if_missing(c, "events", "allies_message_id", "TEXT")
+    add_column_if_missing(c, "events", "axis_message_id", "TEXT")
+    add_column_if_missing(c, "events", "posted_in_discord", "INTEGER DEFAULT 0")
+    add_column_if_missing(c, "events", "pw_sent", "INTEGER DEFAULT 0")
+    add_column_if_missing(c, "events", "recurrence_pattern", "TEXT DEFAULT 'none'")
+    add_column_if_missing(c, "events", "spawned_next_event", "INTEGER DEFAULT 0")
+
+@migration(2, "signups/events: Indizes für die Signup-Hot-Paths")
+def _m002_signup_indexes(c):
+    # count_signups, activate_waiting_signup, Nachrücker in cancel_signup
+    # (ORDER BY id nutzt die implizit angehängte rowid)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_signups_event_side_role_status
+        ON signups (event_id, seite, rolle, status)
+    """)
+    # get_signups_active, Anmeldungen auf der Detailseite
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_signups_event_status
+        ON signups (event_id, status)
+    """)
+    # cancel_signup (neueste aktive Anmeldung eines Users)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_signups_user_status
+        ON signups (user_id, status)
+    """)
+    # user_already_signedup
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_signups_event_user_status
+        ON signups (event_id, user_id, status)
+    """)
+    # Bot-Tasks: ungepostete bzw. gepostete Events
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_posted_briefing
+        ON events (posted_in_discord, date_briefing)
+    """)
+
+@migration(3, "signups: max. eine laufende Anmeldung pro User und Event")
+def _m003_unique_live_signup(c):
+    # Alt-Daten: doppelte laufende Anmeldungen -> nur die älteste behalten
+    c.execute("""
+        UPDATE signups
+        SET status = 'cancelled'
+        WHERE status IN ('active','waiting')
+          AND id NOT IN (
+              SELECT MIN(id)
+              FROM signups
+              WHERE status IN ('active','waiting')
+              GROUP BY event_id, user_id
+          )
+    """)
+    c.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_signups_one_live_per_user
+        ON signups (event_id, user_id)
+        WHERE status IN ('active','waiting')
+    """)
+
+@migration(4, "events: Hashes der zuletzt gerenderten Embeds (info/allies/axis)")
+def _m004_embed_hashes(c):
+    add_column_if_missing(c, "events", "info_embed_hash", "TEXT")
+    add_column_if_missing(c, "events", "allies_embed_hash", "TEXT")
+    add_column_if_missing(c, "events", "axis_embed_hash", "TEXT")
+
+@migration(5, "dm_deliveries: Zustellstatus pro Empfänger (Passwort-DMs)")
+def _m005_dm_deliveries(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS dm_deliveries (
+            event_id INTEGER NOT NULL,
+            user_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            last_error TEXT,
+            updated_at DATETIME,
+            PRIMARY KEY (event_id, user_id, kind)
+        )
+    """)
+
+@migration(6, "events: change_version (Zähler für Roster-/Event-Änderungen)")
+def _m006_change_version(c):
+    add_column_if_missing(c, "events", "change_version", "INTEGER DEFAULT 0")
+
+@migration(7, "events: Indizes für die paginierte Event-Übersicht")
+def _m007_event_list_indexes(c):
+    # Keyset-Pagination nach (Eventstart, id); IFNULL hält Events ohne Start
+    # in derselben Sortierung (Index-Ausdruck == ORDER BY-Ausdruck in list_events)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_start_id
+        ON events (IFNULL(date_eventstart, ''), id)
+    """)
+    # Filter "wiederkehrend"
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_recurring_start_id
+        ON events (IFNULL(date_eventstart, ''), id)
+        WHERE recurrence_pattern != 'none'
+    """)
+
+@migration(8, "changes: Änderungs-Feed für Bot/Web, bot_state.changes_cursor")
+def _m008_changes_feed(c):
+    # Append-only; id ist der Cursor der Leser (Bot, Live-Roster)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            source TEXT NOT NULL,
+            created_at DATETIME
+        )
+    """)
+    # Aufräumen alter Einträge (prune_changes)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_changes_created ON changes (created_at)")
+    add_column_if_missing(c, "bot_state", "changes_cursor", "INTEGER")
+
+@migration(9, "events: Serien für wiederkehrende Events (series_id, occurrence_date)")
+def _m009_event_series(c):
+    add_column_if_missing(c, "events", "series_id", "INTEGER")
+    add_column_if_missing(c, "events", "occurrence_index", "INTEGER")
+    add_column_if_missing(c, "events", "occurrence_date", "TEXT")
+    # Bestehende wiederkehrende Events werden Vorlage ihrer eigenen Serie
+    c.execute("""
+        UPDATE events
+        SET series_id = id,
+            occurrence_index = 0,
+            occurrence_date = date(date_eventstart)
+        WHERE recurrence_pattern IS NOT NULL
+          AND recurrence_pattern != 'none'
+          AND series_id IS NULL
+    """)
+    # Idempotentes Anlegen: jeder Termin einer Serie höchstens einmal
+    c.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_events_series_date
+        ON events (series_id, occurrence_date)
+        WHERE series_id IS NOT NULL
+    """)
+    # Letzter Termin einer Serie (materialise_series)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_series_index
+        ON events (series_id, occurrence_index)
+        WHERE series_id IS NOT NULL
+    """)
+
+@migration(10, "guild_settings: Event-Kanal pro Guild, events.guild_id/channel_id")
+def _m010_guild_settings(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id TEXT PRIMARY KEY,
+            guild_name TEXT,
+            event_channel_id TEXT,
+            updated_at DATETIME
+        )
+    """)
+    # Guild des Events (NULL = Standard-Guild, solange nur eine eingerichtet ist)
+    add_column_if_missing(c, "events", "guild_id", "TEXT")
+    # Kanal, in dem das Event tatsächlich gepostet wurde (für spätere Edits)
+    add_column_if_missing(c, "events", "channel_id", "TEXT")
+
+@migration(11, "events: Serienregel nur an der Vorlage")
+def _m011_series_rule_on_template(c):
+    # Folgetermine trugen eine Kopie der Regel; maßgeblich ist jetzt nur die Vorlage
+    c.execute("""
+        UPDATE events
+        SET recurrence_pattern = 'none'
+        WHERE series_id IS NOT NULL
+          AND id != series_id
+    """)
+
+#########################################
+# Runner
+#########################################
+
+def get_schema_version(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER NOT NULL,
+            name TEXT,
+            applied_at DATETIME
+        )
+    """)
+    c.execute("SELECT MAX(version) FROM schema_version")
+    row = c.fetchone()
+    return row[0] or 0
+
+def run_migrations(conn):
+    """
+    Führt alle noch nicht angewendeten Migrationen in Versionsreihenfolge aus.
+    Jede Migration läuft in einer eigenen Transaktion zusammen mit ihrem
+    schema_version-Eintrag. Gibt die aktuelle Schema-Version zurück.
+    """
+    c = conn.cursor()
+    current = get_schema_version(c)
+    conn.commit()
+
+    for version, name, func in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            # DDL läuft sonst im Autocommit -> explizite Transaktion pro Migration.
+            # IMMEDIATE + erneute Versionsprüfung: mehrere Prozesse (z.B. gunicorn-Worker)
+            # dürfen gleichzeitig starten, jede Migration läuft trotzdem nur einmal.
+            c.execute("BEGIN IMMEDIATE")
+            c.execute("SELECT MAX(version) FROM schema_version")
+            if (c.fetchone()[0] or 0) >= version:
+                conn.commit()
+                current = version
+                continue
+            func(c)
+            c.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?,?,?)",
+                (version, name, datetime.now())
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            print(f"[run_migrations] Migration {version} ({name}) fehlgeschlagen.")
+            raise
+        current = version
+        print(f"[run_migrations] Migration {version} angewendet: {name}")
+
+    return current
@@ -0,0 +1,87 @@
+# Datei: webapp/notify.py
+#
+# Benachrichtigung "Event wurde angelegt/geändert/gelöscht".
+# Routen rufen notify_event_changed() nach dem Commit auf.
+#  - Im selben Prozess (python main.py): registrierte Listener werden direkt aufgerufen.
+#  - Getrennte Prozesse (Web unter gunicorn/waitress, Bot separat): ist
+#    BOT_NOTIFY_ADDR gesetzt (z.B. 127.0.0.1:8765), geht zusätzlich ein
+#    UDP-Datagramm an den Bot, der dort mit start_notify_listener() lauscht.
+#    Die Nachricht ist nur ein Weck-Signal; was sich geändert hat, steht im
+#    Änderungs-Feed (webapp/changes.py), den der Bot ohnehin jede Sekunde liest.
+
+import asyncio
+import json
+import os
+import socket
+
+BOT_NOTIFY_ADDR = os.getenv("BOT_NOTIFY_ADDR", "")
+
+_listeners = []
+
+def parse_addr(addr):
+    host, _, port = addr.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+def add_listener(callback):
+    """
+    callback(event_id, kind) mit kind in 'created', 'updated', 'deleted'.
+    Wird im Thread des Aufrufers ausgeführt (z.B. Flask-Request-Thread).
+    """
+    if callback not in _listeners:
+        _listeners.append(callback)
+
+def remove_listener(callback):
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+def _send_datagram(event_id, kind):
+    payload = json.dumps({"event_id": event_id, "kind": kind}).encode("utf-8")
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.sendto(payload, parse_addr(BOT_NOTIFY_ADDR))
+    finally:
+        sock.close()
+
+def notify_event_changed(event_id, kind="updated"):
+    for callback in list(_listeners):
+        try:
+            callback(event_id, kind)
+        except Exception as e:
+            print(f"[notify_event_changed] Listener-Fehler für Event {event_id}: {e}")
+    if BOT_NOTIFY_ADDR:
+        try:
+            _send_datagram(event_id, kind)
+        except OSError as e:
+            # Bot offline o.ä. - er holt Änderungen beim nächsten Start aus der DB
+            print(f"[notify_event_changed] Bot nicht erreichbar ({BOT_NOTIFY_ADDR}): {e}")
+
+
+class _NotifyProtocol(asyncio.DatagramProtocol):
+    def __init__(self, callback):
+        self.callback = callback
+
+    def datagram_received(self, data, addr):
+        try:
+            msg = json.loads(data.decode("utf-8"))
+            self.callback(int(msg["event_id"]), msg.get("kind", "updated"))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"[notify] Ungültige Benachrichtigung von {addr}: {e}")
+        except Exception as e:
+            print(f"[notify] Listener-Fehler: {e}")
+
+async def start_notify_listener(callback, addr=None):
+    """
+    Lauscht (im Bot-Prozess) auf UDP-Benachrichtigungen der Web-Prozesse.
+    callback(event_id, kind) läuft direkt im asyncio-Loop.
+    Gibt den Transport zurück bzw. None, wenn BOT_NOTIFY_ADDR nicht gesetzt ist.
+    """
+    addr = addr or BOT_NOTIFY_ADDR
+    if not addr:
+        return None
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _NotifyProtocol(callback),
+        local_addr=parse_addr(addr),
+    )
+    print(f"[notify] Lausche auf Änderungen unter {addr} (UDP).")
+    return transport
@@ -0,0 +1,199 @@
+# Datei: webapp/passwords.py
+#
+# Passwort-Hashing (bcrypt) außerhalb des Request-Threads.
+#  - bcrypt kostet je nach Kostenfaktor ~250 ms CPU pro Aufruf. Im Ein-Prozess-
+#    Betrieb (python main.py) bremst das über den GIL auch den Event-Loop des Bots.
+#    hashpw/checkpw laufen deshalb in einem kleinen Prozess-Pool (PASSWORD_WORKERS).
+#  - Der Pool ist begrenzt: mehr als PASSWORD_MAX_PENDING gleichzeitige Aufträge
+#    werden mit PasswordPoolBusy abgelehnt, statt sich endlos zu stauen.
+#  - LoginThrottle zählt Fehlversuche pro IP und pro Benutzername; gesperrte
+#    Logins kommen gar nicht erst bis zum Hashing.
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", 2))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", 16))
+PASSWORD_TIMEOUT = float(os.getenv("PASSWORD_TIMEOUT", 10))
+
+LOGIN_WINDOW = int(os.getenv("LOGIN_WINDOW", 900))              # Sekunden
+LOGIN_MAX_PER_IP = int(os.getenv("LOGIN_MAX_PER_IP", 20))       # Fehlversuche pro IP im Fenster
+LOGIN_MAX_PER_USER = int(os.getenv("LOGIN_MAX_PER_USER", 5))    # Fehlversuche pro Benutzername im Fenster
+
+
+class PasswordPoolBusy(Exception):
+    """Zu viele gleichzeitige Hash-Aufträge (oder Zeitüberschreitung)."""
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(PASSWORD_MAX_PENDING)
+
+
+def _get_executor():
+    """
+    Prozess-Pool, lazy und pro Prozess (nach fork, z.B. gunicorn --preload,
+    bekommt jeder Worker seinen eigenen Pool). 'spawn', damit die Kindprozesse
+    keine Threads/DB-Verbindungen des Elternprozesses erben.
+    """
+    global _executor, _executor_pid
+    pid = os.getpid()
+    with _executor_lock:
+        if _executor is None or _executor_pid != pid:
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _executor_pid = pid
+        return _executor
+
+
+def _pool_broken(e):
+    # Worker abgestürzt -> beim nächsten Aufruf neuen Pool anlegen
+    print(f"[passwords] Prozess-Pool defekt, wird neu gestartet: {e}")
+    shutdown_pool()
+    return PasswordPoolBusy("Passwort-Pool neu gestartet")
+
+
+def _submit(fn, *args):
+    if not _pending.acquire(timeout=PASSWORD_TIMEOUT):
+        raise PasswordPoolBusy("Passwort-Pool ausgelastet")
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BrokenProcessPool as e:
+        _pending.release()
+        raise _pool_broken(e)
+    except BaseException:
+        _pending.release()
+        raise
+    # Slot erst freigeben, wenn der Auftrag wirklich fertig (oder abgebrochen) ist -
+    # nach einem Timeout läuft er im Pool weiter und zählt noch zu PASSWORD_MAX_PENDING
+    future.add_done_callback(lambda _: _pending.release())
+    try:
+        return future.result(timeout=PASSWORD_TIMEOUT)
+    except FutureTimeoutError:
+        raise PasswordPoolBusy("Zeitüberschreitung beim Passwort-Hashing")
+    except BrokenProcessPool as e:
+        raise _pool_broken(e)
+
+
+def _to_bytes(value):
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return bytes(value)
+
+
+def hash_password(password: str) -> bytes:
+    """
+    bcrypt-Hash mit BCRYPT_ROUNDS, berechnet im Prozess-Pool.
+    """
+    return _submit(bcrypt.hashpw, _to_bytes(password), bcrypt.gensalt(BCRYPT_ROUNDS))
+
+
+def hash_password_blocking(password: str) -> bytes:
+    """
+    Wie hash_password, aber direkt im aufrufenden Thread
+    (z.B. init_db beim Start, bevor Bot und Web laufen).
+    """
+    return bcrypt.hashpw(_to_bytes(password), bcrypt.gensalt(BCRYPT_ROUNDS))
+
+
+def check_password(password: str, password_hash) -> bool:
+    """
+    Prüft password gegen einen gespeicherten bcrypt-Hash (bytes oder str).
+    """
+    if not password or not password_hash:
+        return False
+    try:
+        return _submit(bcrypt.checkpw, _to_bytes(password), _to_bytes(password_hash))
+    except ValueError:
+        # Kein gültiger bcrypt-Hash in der DB
+        return False
+
+
+def shutdown_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+class LoginThrottle:
+    """
+    Zählt fehlgeschlagene Logins pro Schlüssel (IP bzw. Benutzername) in einem
+    gleitenden Zeitfenster. Nur im Speicher und pro Prozess - bei mehreren
+    Web-Workern gilt das Limit also je Worker.
+    """
+
+    MAX_KEYS = 10000
+
+    def __init__(self, window=LOGIN_WINDOW, max_per_ip=LOGIN_MAX_PER_IP,
+                 max_per_user=LOGIN_MAX_PER_USER):
+        self.window = window
+        self.limits = {"ip": max_per_ip, "user": max_per_user}
+        self._failures = {}     # (art, schlüssel) -> deque[zeitpunkte]
+        self._lock = threading.Lock()
+
+    def _keys(self, ip, username):
+        keys = []
+        if ip:
+            keys.append(("ip", ip))
+        if username:
+            keys.append(("user", username.lower()))
+        return keys
+
+    def _prune(self, key, now):
+        hits = self._failures.get(key)
+        if hits is None:
+            return None
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        if not hits:
+            del self._failures[key]
+            return None
+        return hits
+
+    def retry_after(self, ip, username) -> int:
+        """
+        0, wenn ein Versuch erlaubt ist, sonst Sekunden bis zur Freigabe.
+        """
+        now = time.monotonic()
+        wait = 0
+        with self._lock:
+            for key in self._keys(ip, username):
+                hits = self._prune(key, now)
+                if hits and len(hits) >= self.limits[key[0]]:
+                    wait = max(wait, int(hits[0] + self.window - now) + 1)
+        return wait
+
+    def record_failure(self, ip, username):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) >= self.MAX_KEYS:
+                for key in list(self._failures):
+                    self._prune(key, now)
+            for key in self._keys(ip, username):
+                hits = self._failures.setdefault(key, deque())
+                hits.append(now)
+                # mehr als das Limit muss nicht gemerkt werden
+                while len(hits) > self.limits[key[0]]:
+                    hits.popleft()
+
+    def record_success(self, ip, username):
+        with self._lock:
+            if username:
+                self._failures.pop(("user", username.lower()), None)
+
+
+login_throttle = LoginThrottle()
@@ -0,0 +1,339 @@
+# Datei: webapp/recurrence.py
+#
+# Wiederkehrende Events als Serie.
+#  - Das erste Event einer Serie ist ihre Vorlage: series_id = eigene id,
+#    occurrence_index = 0. Folgetermine tragen dieselbe series_id, einen
+#    fortlaufenden occurrence_index und das Soll-Datum occurrence_date.
+#  - materialise_series() legt in einer Transaktion alle fehlenden Termine an,
+#    bis RECURRENCE_HORIZON zukünftige Termine existieren (nach einer
+#    Offline-Zeit inkl. der verpassten, siehe RECURRENCE_BACKFILL).
+#    Kopiert werden Name, Beschreibung, Server/Passwort und die Squad-Limits
+#    des letzten Termins; Briefing/Spielstart behalten ihren Abstand zum Start.
+#  - Die Regel steht nur an der Vorlage (Folgetermine haben recurrence_pattern
+#    'none'): Vorlage auf 'none' beendet die Serie, eine geänderte Regel gilt
+#    ab dem letzten angelegten Termin.
+#  - Der Unique-Index (series_id, occurrence_date) macht das idempotent:
+#    mehrfaches Auslösen (mehrere Prozesse, Neustarts) erzeugt keine Dubletten.
+#
+# recurrence_pattern: 'weekly', 'biweekly', 'monthly', 'quarterly' oder eine
+# RRULE im Stil von RFC 5545 mit FREQ, INTERVAL, COUNT und UNTIL, z.B.
+#   RRULE:FREQ=WEEKLY;INTERVAL=3;COUNT=10
+#   FREQ=MONTHLY;UNTIL=20301231T235959
+
+import calendar
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from .changes import record_change
+from .db import get_connection
+
+# So viele zukünftige Termine pro Serie werden vorab angelegt
+RECURRENCE_HORIZON = int(os.getenv("RECURRENCE_HORIZON", 4))
+# Verpasste Termine (z.B. nach Downtime) als vergangene Events nachtragen (0 = überspringen)
+RECURRENCE_BACKFILL = os.getenv("RECURRENCE_BACKFILL", "1") == "1"
+# Höchstens so viele verpasste Termine pro Lauf nachtragen (z.B. FREQ=DAILY nach langer Downtime)
+MAX_BACKFILL = 100
+
+Rule = namedtuple("Rule", "freq interval count until")
+
+PATTERNS = {
+    "weekly": Rule("WEEKLY", 1, None, None),
+    "biweekly": Rule("WEEKLY", 2, None, None),
+    "monthly": Rule("MONTHLY", 1, None, None),
+    "quarterly": Rule("MONTHLY", 3, None, None),
+}
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+
+# Diese Spalten übernimmt ein neuer Termin vom letzten Termin der Serie
+COPY_COLUMNS = (
+    "name", "description", "server_info", "password",
+    "inf_squads_allies", "tank_squads_allies", "sniper_squads_allies",
+    "inf_squads_axis", "tank_squads_axis", "sniper_squads_axis",
+    "max_commanders_allies", "max_commanders_axis",
+    "guild_id",
+)
+
+
+def _parse_until(value):
+    for fmt in ("%Y%m%dT%H%M%SZ", "%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            until = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt == "%Y%m%d":
+            # Nur Datum -> ganzer Tag zählt noch
+            until = until.replace(hour=23, minute=59, second=59)
+        return until
+    raise ValueError(f"UNTIL nicht lesbar: {value}")
+
+def parse_rule(pattern):
+    """
+    Rule für ein recurrence_pattern, None bei 'none'/leer.
+    Wirft ValueError bei ungültigen RRULEs.
+    """
+    pattern = (pattern or "").strip()
+    if not pattern or pattern == "none":
+        return None
+    if pattern in PATTERNS:
+        return PATTERNS[pattern]
+
+    text = pattern[6:] if pattern.upper().startswith("RRULE:") else pattern
+    parts = {}
+    for part in text.split(";"):
+        if not part.strip():
+            continue
+        key, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"Ungültiger RRULE-Teil: {part}")
+        parts[key.strip().upper()] = value.strip()
+
+    unknown = set(parts) - {"FREQ", "INTERVAL", "COUNT", "UNTIL"}
+    if unknown:
+        raise ValueError(f"Nicht unterstützt: {', '.join(sorted(unknown))}")
+    freq = parts.get("FREQ", "").upper()
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ muss einer von {', '.join(FREQUENCIES)} sein")
+    interval = int(parts.get("INTERVAL", 1))
+    count = int(parts["COUNT"]) if "COUNT" in parts else None
+    if interval < 1 or (count is not None and count < 1):
+        raise ValueError("INTERVAL und COUNT müssen >= 1 sein")
+    until = _parse_until(parts["UNTIL"]) if "UNTIL" in parts else None
+    return Rule(freq, interval, count, until)
+
+def add_months(dt, months):
+    """
+    dt + months Monate; zu große Tage werden auf das Monatsende gekürzt (31.01. -> 28.02.).
+    """
+    month_index = dt.month - 1 + months
+    year = dt.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(dt.day, calendar.monthrange(year, month)[1])
+    return dt.replace(year=year, month=month, day=day)
+
+def occurrence_start(anchor, rule, index):
+    """
+    Start des index-ten Termins (0 = Vorlage). Immer vom Anker aus gerechnet,
+    damit sich gekürzte Monatstage nicht fortpflanzen.
+    """
+    step = rule.interval * index
+    if rule.freq == "DAILY":
+        return anchor + timedelta(days=step)
+    if rule.freq == "WEEKLY":
+        return anchor + timedelta(weeks=step)
+    if rule.freq == "MONTHLY":
+        return add_months(anchor, step)
+    return add_months(anchor, 12 * step)
+
+def rule_allows(rule, index, start):
+    if rule.count is not None and index >= rule.count:
+        return False
+    if rule.until is not None and start > rule.until:
+        return False
+    return True
+
+def _parse(dt_str):
+    if not dt_str:
+        return None
+    try:
+        return datetime.fromisoformat(str(dt_str))
+    except ValueError:
+        return None
+
+def _shift(value, old_start, new_start):
+    """
+    Briefing/Spielstart mit gleichem Abstand zum neuen Eventstart.
+    """
+    dt = _parse(value)
+    if dt is None or old_start is None:
+        return value
+    return (new_start + (dt - old_start)).isoformat(timespec="minutes")
+
+
+#########################################
+# Serien anlegen / fortschreiben
+#########################################
+
+def start_series(c, event_id, date_eventstart):
+    """
+    Macht ein Event zur Vorlage einer neuen Serie (im Cursor des Aufrufers).
+    """
+    start = _parse(date_eventstart)
+    c.execute("""
+        UPDATE events
+        SET series_id=?, occurrence_index=0, occurrence_date=?
+        WHERE id=? AND series_id IS NULL
+    """, (event_id, start.date().isoformat() if start else None, event_id))
+
+def _fetch_event(c, sql, params):
+    c.execute(sql, params)
+    row = c.fetchone()
+    if not row:
+        return None
+    cols = [desc[0] for desc in c.description]
+    return dict(zip(cols, row))
+
+def materialise_series(series_id, now=None, horizon=None, backfill=None, source="bot"):
+    """
+    Legt alle fehlenden Termine der Serie in einer Transaktion an, bis
+    horizon Termine in der Zukunft liegen (bzw. COUNT/UNTIL erreicht ist).
+    Die Regel kommt von der Vorlage (id=series_id); ohne Vorlage oder mit
+    'none' ist die Serie beendet.
+    Gibt die ids der neuen Events zurück.
+    """
+    now = now or datetime.now()
+    horizon = RECURRENCE_HORIZON if horizon is None else horizon
+    backfill = RECURRENCE_BACKFILL if backfill is None else backfill
+
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        # Letzter Termin (Index idx_events_series_index) = Kopiervorlage
+        last = _fetch_event(c, """
+            SELECT *
+            FROM events
+            WHERE series_id=?
+            ORDER BY occurrence_index DESC
+            LIMIT 1
+        """, (series_id,))
+        template = _fetch_event(c, """
+            SELECT recurrence_pattern, date_eventstart
+            FROM events
+            WHERE id=?
+        """, (series_id,))
+        if last is None or template is None:
+            conn.rollback()
+            return []
+        try:
+            rule = parse_rule(template.get("recurrence_pattern"))
+        except ValueError as e:
+            print(f"[materialise_series] Serie {series_id}: ungültige Wiederholung ({e})")
+            conn.rollback()
+            return []
+        last_start = _parse(last.get("date_eventstart"))
+        if rule is None or last_start is None:
+            conn.rollback()
+            return []
+
+        # Anker ist der Start der Vorlage. Passt der letzte Termin nicht zu dem,
+        # was die Regel ab der Vorlage ergibt (Regel oder Vorlagen-Start geändert),
+        # geht es ab dem letzten Termin mit der neuen Regel weiter.
+        last_index = last["occurrence_index"] or 0
+        anchor, base = _parse(template.get("date_eventstart")), 0
+        if anchor is None or (
+            last_index
+            and occurrence_start(anchor, rule, last_index).date().isoformat() != last.get("occurrence_date")
+        ):
+            anchor, base = last_start, last_index
+
+        c.execute("""
+            SELECT COUNT(*)
+            FROM events
+            WHERE series_id=?
+              AND date_eventstart > ?
+        """, (series_id, now.isoformat()))
+        future = c.fetchone()[0]
+
+        created = []
+        backfilled = 0
+        index = last_index + 1
+        while future < horizon:
+            start = occurrence_start(anchor, rule, index - base)
+            if not rule_allows(rule, index, start):
+                break
+            past = start <= now
+            if past and (not backfill or backfilled >= MAX_BACKFILL):
+                index += 1
+                continue
+            new_id = _insert_occurrence(c, last, last_start, series_id, index, start, now)
+            if new_id is not None:
+                created.append(new_id)
+                record_change(c, new_id, "created", source)
+            if past:
+                backfilled += 1
+            else:
+                future += 1
+            index += 1
+
+        conn.commit()
+        if created:
+            print(f"[materialise_series] Serie {series_id}: {len(created)} Termine angelegt.")
+        return created
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _insert_occurrence(c, last, last_start, series_id, index, start, now):
+    past = start <= now
+    values = {col: last.get(col) for col in COPY_COLUMNS}
+    values.update({
+        "date_eventstart": start.isoformat(timespec="minutes"),
+        "date_briefing": _shift(last.get("date_briefing"), last_start, start),
+        "date_gamestart": _shift(last.get("date_gamestart"), last_start, start),
+        "created_at": now,
+        "series_id": series_id,
+        "occurrence_index": index,
+        "occurrence_date": start.date().isoformat(),
+        # Verpasste Termine lösen keine Deadlines mehr aus
+        "spawned_next_event": 1 if past else 0,
+        "pw_sent": 1 if past else 0,
+        "posted_in_discord": 0,
+    })
+    cols = list(values)
+    c.execute(f"""
+        INSERT OR IGNORE INTO events ({", ".join(cols)})
+        VALUES ({", ".join("?" * len(cols))})
+    """, [values[col] for col in cols])
+    return c.lastrowid if c.rowcount else None
+
+def materialise_for_event(event_id, now=None):
+    """
+    Für den recur-Deadline-Handler: Serie des Events fortschreiben und das
+    Event selbst als erledigt markieren (spawned_next_event=1).
+    Gibt die ids der neuen Events zurück.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute("SELECT series_id, recurrence_pattern, date_eventstart FROM events WHERE id=?", (event_id,))
+        row = c.fetchone()
+        if not row:
+            return []
+        series_id, pattern, start = row
+        if series_id is None:
+            try:
+                rule = parse_rule(pattern)
+            except ValueError as e:
+                # Ungültige Wiederholung: keine Serie, Event trotzdem als erledigt markieren
+                print(f"[materialise_for_event] Event {event_id}: ungültige Wiederholung ({e})")
+                rule = None
+            if rule is not None:
+                # Altbestand ohne Serie -> Event wird zur Vorlage
+                start_series(c, event_id, start)
+                series_id = event_id
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    created = []
+    if series_id is not None:
+        created = materialise_series(series_id, now=now)
+
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute("UPDATE events SET spawned_next_event=1 WHERE id=?", (event_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return created
@@ -0,0 +1,290 @@
+# Datei: webapp/roster_engine.py
+#
+# In-Memory-Roster pro Event: Zähler je (seite, rolle) und FIFO-Wartelisten.
+# Der Bot liest Slots/Wartelisten nur noch hieraus (0 SQL-Queries beim Öffnen
+# des Rollen-Menüs); Schreibzugriffe gehen direkt an SQLite durch und werden
+# danach im Speicher nachgezogen.
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .db import get_connection
+from .routes_utils import (
+    get_slots_for_role,
+    create_signup,
+    cancel_signup,
+    reserve_slot,
+)
+
+SIDES = ("allies", "axis")
+ROLES = ("inf", "tank", "sniper", "commander")
+
+# Nach so vielen Sekunden wird ein Roster beim nächsten Zugriff neu geladen
+# (fängt Änderungen ab, die nicht über die Engine liefen, z.B. Edits im Webinterface).
+ROSTER_MAX_AGE = float(os.getenv("ROSTER_MAX_AGE", 300))
+
+
+class EventRoster:
+    """
+    Zustand eines Events: Event-Daten, aktive Anmeldungen je (seite, rolle)
+    in Anmeldereihenfolge und Wartelisten (ältester Eintrag zuerst).
+    """
+
+    def __init__(self, event: dict, rows):
+        self.event = event
+        self.loaded_at = time.monotonic()
+        self.slots = {
+            (s, r): get_slots_for_role(event, s, r) or 0
+            for s in SIDES for r in ROLES
+        }
+        self.active = {(s, r): OrderedDict() for s in SIDES for r in ROLES}
+        self.waiting = {(s, r): deque() for s in SIDES for r in ROLES}
+        # user_id -> (signup_id, seite, rolle, status)
+        self.by_user = {}
+
+        for signup_id, user_id, user_name, seite, rolle, status in rows:
+            self.add(signup_id, user_id, user_name, seite, rolle, status)
+
+    def count(self, seite, rolle) -> int:
+        return len(self.active.get((seite, rolle), ()))
+
+    def max_slots(self, seite, rolle) -> int:
+        return self.slots.get((seite, rolle), 0)
+
+    def is_full(self, seite, rolle) -> bool:
+        return self.count(seite, rolle) >= self.max_slots(seite, rolle)
+
+    def live_signup(self, user_id):
+        return self.by_user.get(str(user_id))
+
+    def role_options(self, seite):
+        """
+        [(rolle, aktiv, max_slots), ...] für alle Rollen mit mind. einem Slot.
+        """
+        return [
+            (r, self.count(seite, r), self.max_slots(seite, r))
+            for r in ROLES
+            if self.max_slots(seite, r) > 0
+        ]
+
+    def add(self, signup_id, user_id, user_name, seite, rolle, status):
+        key = (seite, rolle)
+        if key not in self.active:
+            return
+        user_id = str(user_id)
+        if self.by_user.get(user_id, (None,))[0] == signup_id:
+            # schon enthalten (z.B. Roster wurde nach dem Commit frisch geladen)
+            return
+        if status == "active":
+            self.active[key][signup_id] = (user_id, user_name)
+        elif status == "waiting":
+            self.waiting[key].append((signup_id, user_id, user_name))
+        else:
+            return
+        self.by_user[user_id] = (signup_id, seite, rolle, status)
+
+    def remove(self, signup_id, seite, rolle):
+        key = (seite, rolle)
+        entry = self.active.get(key, {}).pop(signup_id, None)
+        if entry:
+            self.by_user.pop(entry[0], None)
+            return
+        queue = self.waiting.get(key)
+        if queue:
+            for item in list(queue):
+                if item[0] == signup_id:
+                    queue.remove(item)
+                    self.by_user.pop(item[1], None)
+                    return
+
+    def promote(self, wait_id, seite, rolle):
+        """
+        Zieht den Wartelisten-Eintrag wait_id in die aktiven Slots nach.
+        """
+        queue = self.waiting.get((seite, rolle))
+        if not queue:
+            return
+        for item in list(queue):
+            if item[0] == wait_id:
+                queue.remove(item)
+                _, user_id, user_name = item
+                self.active[(seite, rolle)][wait_id] = (user_id, user_name)
+                self.by_user[user_id] = (wait_id, seite, rolle, "active")
+                return
+
+    def active_signups(self):
+        """
+        Aktive Anmeldungen als (user_name, seite, rolle), sortiert nach Anmeldung (id).
+        Gleiches Format wie get_signups_active().
+        """
+        rows = []
+        for (seite, rolle), entries in self.active.items():
+            for signup_id, (_, user_name) in entries.items():
+                rows.append((signup_id, user_name, seite, rolle))
+        rows.sort()
+        return [(user_name, seite, rolle) for _, user_name, seite, rolle in rows]
+
+
+class RosterEngine:
+    """
+    Hält pro Event ein EventRoster im Speicher (Laden bei Bedarf, 2 Queries).
+    SQL läuft immer ohne Engine-Lock; der Lock schützt nur das Austauschen
+    bzw. Nachziehen der Roster im Speicher.
+    """
+
+    def __init__(self, max_age=ROSTER_MAX_AGE):
+        self.max_age = max_age
+        self._rosters = {}
+        # Schreibzähler pro Event (+ _epoch für invalidate() ohne Event):
+        # ein Roster, während dessen Laden geschrieben wurde, wird nicht übernommen
+        self._writes = {}
+        self._epoch = 0
+        self._lock = threading.RLock()
+
+    def _written(self, event_id):
+        # nur unter self._lock aufrufen
+        self._writes[event_id] = self._writes.get(event_id, 0) + 1
+
+    def _load(self, event_id):
+        conn = get_connection()
+        c = conn.cursor()
+        c.execute("SELECT * FROM events WHERE id=?", (event_id,))
+        row = c.fetchone()
+        if not row:
+            conn.close()
+            return None
+        cols = [desc[0] for desc in c.description]
+        event = dict(zip(cols, row))
+        c.execute("""
+            SELECT id, user_id, user_name, seite, rolle, status
+            FROM signups
+            WHERE event_id=?
+              AND status IN ('active','waiting')
+            ORDER BY id ASC
+        """, (event_id,))
+        rows = c.fetchall()
+        conn.close()
+        return EventRoster(event, rows)
+
+    def get(self, event_id):
+        """
+        Liefert das EventRoster (oder None, falls das Event nicht existiert).
+        """
+        with self._lock:
+            roster = self._rosters.get(event_id)
+            if roster is not None and time.monotonic() - roster.loaded_at <= self.max_age:
+                return roster
+            stamp = (self._epoch, self._writes.get(event_id, 0))
+
+        roster = self._load(event_id)
+
+        with self._lock:
+            if (self._epoch, self._writes.get(event_id, 0)) != stamp:
+                # Während des Ladens geschrieben -> Ergebnis evtl. schon veraltet;
+                # ein inzwischen frisch geladenes Roster hat Vorrang
+                current = self._rosters.get(event_id)
+                if current is not None and time.monotonic() - current.loaded_at <= self.max_age:
+                    return current
+                return roster
+            if roster is None:
+                self._rosters.pop(event_id, None)
+                return None
+            self._rosters[event_id] = roster
+            return roster
+
+    def invalidate(self, event_id=None):
+        with self._lock:
+            if event_id is None:
+                self._rosters.clear()
+                self._epoch += 1
+            else:
+                self._rosters.pop(event_id, None)
+                self._written(event_id)
+
+    def event(self, event_id) -> dict:
+        roster = self.get(event_id)
+        return roster.event if roster else {}
+
+    def cached_event(self, event_id) -> dict:
+        """
+        Event-Daten nur aus dem Speicher (ohne Nachladen), {} falls nicht geladen.
+        """
+        with self._lock:
+            roster = self._rosters.get(event_id)
+            return roster.event if roster else {}
+
+    def cached_roster(self, event_id):
+        """
+        EventRoster nur aus dem Speicher, None falls nicht geladen oder älter
+        als max_age (dann müsste get() nachladen => SQL).
+        """
+        with self._lock:
+            roster = self._rosters.get(event_id)
+            if roster is None or time.monotonic() - roster.loaded_at > self.max_age:
+                return None
+            return roster
+
+    def role_options(self, event_id, seite):
+        """
+        [(rolle, aktiv, max_slots), ...] für alle Rollen mit mind. einem Slot.
+        """
+        roster = self.get(event_id)
+        return roster.role_options(seite) if roster else []
+
+    def user_already_signedup(self, event_id, user_id) -> bool:
+        roster = self.get(event_id)
+        return bool(roster and roster.live_signup(user_id))
+
+    def active_signups(self, event_id):
+        roster = self.get(event_id)
+        return roster.active_signups() if roster else []
+
+    def create_signup(self, event_id, user_id, user_name, seite, rolle, status="active"):
+        """
+        Schreibt die Anmeldung in die DB und übernimmt sie ins Roster.
+        """
+        signup_id = create_signup(event_id, user_id, user_name, seite, rolle, status)
+        with self._lock:
+            self._written(event_id)
+            roster = self._rosters.get(event_id)
+            if roster:
+                roster.add(signup_id, user_id, user_name, seite, rolle, status)
+        return signup_id
+
+    def reserve(self, event_id, user_id, user_name, seite, rolle):
+        """
+        Atomare Reservierung über routes_utils.reserve_slot (active vs. waiting
+        entscheidet die DB-Transaktion), danach Roster nachziehen.
+        Gibt (signup_id, status) zurück, siehe reserve_slot.
+        """
+        # DB-Transaktion ohne Engine-Lock: die Entscheidung trifft SQLite
+        signup_id, status = reserve_slot(event_id, str(user_id), user_name, seite, rolle)
+        with self._lock:
+            self._written(event_id)
+            roster = self._rosters.get(event_id)
+            if signup_id is not None:
+                if roster:
+                    roster.add(signup_id, user_id, user_name, seite, rolle, status)
+            elif status == "duplicate" and roster and not roster.live_signup(user_id):
+                # Speicherstand war veraltet -> beim nächsten Zugriff neu laden
+                self._rosters.pop(event_id, None)
+            return (signup_id, status)
+
+    def cancel_signup(self, user_id):
+        """
+        Wie routes_utils.cancel_signup, zieht Abmeldung + Nachrücker im Roster nach.
+        """
+        res = cancel_signup(user_id)
+        if not res:
+            return None
+        signup_id, event_id, seite, rolle, wait_row = res
+        with self._lock:
+            self._written(event_id)
+            roster = self._rosters.get(event_id)
+            if roster:
+                roster.remove(signup_id, seite, rolle)
+                if wait_row:
+                    roster.promote(wait_row[0], seite, rolle)
+        return res
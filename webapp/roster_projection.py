@@ -0,0 +1,114 @@
+# Datei: webapp/roster_projection.py
+#
+# Gemeinsame Roster-Projektion für Bot-Embeds (Allies/Axis), die
+# Detailseite im Webinterface und die JSON-API: aktive Anmeldungen eines
+# Events, in einem Durchlauf nach Seite -> Rolle -> Squad gruppiert, dazu
+# die Wartelisten je Seite/Rolle.
+# Gecacht pro Event mit events.change_version; solange sich die Version nicht
+# ändert, kostet ein Zugriff nur den Versions-Lookup per Primärschlüssel.
+
+import threading
+from collections import OrderedDict
+
+from .db import get_connection
+
+SIDES = ("allies", "axis")
+ROLES = ("inf", "tank", "sniper", "commander")
+SQUAD_SIZES = {"inf": 6, "tank": 3, "sniper": 2, "commander": 1}
+
+PROJECTION_CACHE_SIZE = 256
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+def build_roster_projection(event_id, version, rows):
+    """
+    rows: (user_name, seite, rolle, status) in Anmeldereihenfolge,
+    status 'active' oder 'waiting'.
+    Ergebnis:
+      {"event_id", "version",
+       "allies": {"inf": [[name, ...], ...], "tank": [...], ...},
+       "axis": {...},
+       "waiting": {"allies": {"inf": [name, ...], ...}, "axis": {...}},
+       "totals": {"allies": n, "axis": n},
+       "waiting_totals": {"allies": n, "axis": n}}
+    """
+    projection = {
+        "event_id": event_id,
+        "version": version,
+        "totals": {s: 0 for s in SIDES},
+        "waiting": {s: {r: [] for r in ROLES} for s in SIDES},
+        "waiting_totals": {s: 0 for s in SIDES},
+    }
+    for s in SIDES:
+        projection[s] = {r: [] for r in ROLES}
+
+    for user_name, seite, rolle, status in rows:
+        if seite not in SIDES or rolle not in ROLES:
+            continue
+        if status == "waiting":
+            projection["waiting"][seite][rolle].append(user_name)
+            projection["waiting_totals"][seite] += 1
+            continue
+        squads = projection[seite][rolle]
+        if not squads or len(squads[-1]) >= SQUAD_SIZES[rolle]:
+            squads.append([])
+        squads[-1].append(user_name)
+        projection["totals"][seite] += 1
+    return projection
+
+def get_event_version(event_id):
+    """
+    Aktuelle change_version des Events oder None, falls es nicht existiert.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("SELECT change_version FROM events WHERE id=?", (event_id,))
+    row = c.fetchone()
+    conn.close()
+    if not row:
+        return None
+    return row[0] or 0
+
+def get_roster_projection(event_id):
+    """
+    Liefert die (gecachte) Projektion oder None, falls das Event nicht existiert.
+    Das Ergebnis nicht verändern - es wird zwischen Aufrufern geteilt.
+    """
+    version = get_event_version(event_id)
+    if version is None:
+        invalidate_projection(event_id)
+        return None
+
+    with _lock:
+        cached = _cache.get(event_id)
+        if cached is not None and cached["version"] == version:
+            _cache.move_to_end(event_id)
+            return cached
+
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("""
+        SELECT user_name, seite, rolle, status
+        FROM signups
+        WHERE event_id=?
+          AND status IN ('active','waiting')
+        ORDER BY id ASC
+    """, (event_id,))
+    rows = c.fetchall()
+    conn.close()
+
+    projection = build_roster_projection(event_id, version, rows)
+    with _lock:
+        _cache[event_id] = projection
+        _cache.move_to_end(event_id)
+        while len(_cache) > PROJECTION_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return projection
+
+def invalidate_projection(event_id=None):
+    with _lock:
+        if event_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(event_id, None)
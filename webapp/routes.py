@@ -1,13 +1,19 @@
 # Datei: webapp/routes.py
 
 import asyncio
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, Response, render_template, request, redirect, url_for, flash
 from datetime import datetime
 import secrets
 
 from .db import get_connection
+from .notify import notify_event_changed
+from .changes import record_change
+from .passwords import PasswordPoolBusy, hash_password
 from webapp.auth import login_required
-from .routes_utils import get_event_dict  # neu definierte Funktion
+from .routes_utils import get_event_dict, list_events, list_guilds, signup_counts, EVENT_FILTERS
+from .roster_projection import get_roster_projection
+from .live import publisher
+from .recurrence import PATTERNS, parse_rule, start_series
 # (oder init_data_for_event etc. falls du anderes brauchst)
 
 bp = Blueprint("routes", __name__)
@@ -21,18 +27,45 @@ def german_datetime_format(dt_str):
     except ValueError:
         return str(dt_str)
 
+def recurrence_from_form():
+    """
+    recurrence_pattern aus dem Formular: feste Muster oder eigene RRULE
+    ("custom" + Feld recurrence_rule). Wirft ValueError bei ungültiger RRULE.
+    """
+    pattern= request.form.get("recurrence_pattern","none")
+    if pattern=="custom":
+        pattern= request.form.get("recurrence_rule","").strip() or "none"
+    parse_rule(pattern)
+    return pattern
+
 @bp.route("/")
 @login_required
 def index():
     """
-    Zeigt alle Events in absteigender Reihenfolge
+    Event-Übersicht, seitenweise (Keyset-Pagination über ?cursor=...).
+    Filter: ?filter=all|upcoming|past|recurring, Namenssuche: ?q=...
     """
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("SELECT id, name, date_eventstart FROM events ORDER BY id DESC")
-    events = c.fetchall()
-    conn.close()
-    return render_template("index.html", events=events)
+    filter_ = request.args.get("filter", "all")
+    if filter_ not in EVENT_FILTERS:
+        filter_ = "all"
+    q = request.args.get("q", "").strip()
+    cursor = request.args.get("cursor")
+
+    events, next_cursor = list_events(filter_, q or None, cursor)
+    counts = signup_counts([e["id"] for e in events])
+    for e in events:
+        e["counts"] = counts[e["id"]]
+        e["start_fmt"] = german_datetime_format(e["date_eventstart"])
+
+    return render_template(
+        "index.html",
+        events=events,
+        filters=EVENT_FILTERS,
+        current_filter=filter_,
+        q=q,
+        cursor=cursor,
+        next_cursor=next_cursor,
+    )
 
 @bp.route("/create_event", methods=["GET","POST"])
 @login_required
@@ -49,6 +82,7 @@ def create_event():
         date_gamestart = request.form.get("date_gamestart")
         server_info = request.form.get("server_info")
         password = request.form.get("password")
+        guild_id = request.form.get("guild_id") or None
 
         inf_a = int(request.form.get("inf_squads_allies"))
         tank_a= int(request.form.get("tank_squads_allies"))
@@ -59,7 +93,11 @@ def create_event():
         cmd_a = int(request.form.get("max_commanders_allies"))
         cmd_x = int(request.form.get("max_commanders_axis"))
 
-        rec_pat= request.form.get("recurrence_pattern","none")
+        try:
+            rec_pat= recurrence_from_form()
+        except ValueError as e:
+            flash(f"Ungültige Wiederholung: {e}", "danger")
+            return render_template("create_event.html", guilds=list_guilds())
 
         conn= get_connection()
         c= conn.cursor()
@@ -73,10 +111,11 @@ def create_event():
                 created_at,
                 recurrence_pattern,
                 spawned_next_event,
-                posted_in_discord
+                posted_in_discord,
+                guild_id
             )
             VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,
-                    ?,?,?)
+                    ?,?,?,?)
         """,(
             name, description,
             date_briefing, date_eventstart, date_gamestart,
@@ -87,14 +126,20 @@ def create_event():
             datetime.now(),
             rec_pat,
             0,
-            0  # posted_in_discord=0 => Bot postet es
+            0,  # posted_in_discord=0 => Bot postet es
+            guild_id
         ))
+        new_event_id= c.lastrowid
+        if rec_pat!="none":
+            start_series(c, new_event_id, date_eventstart)
+        record_change(c, new_event_id, "created", "web")
         conn.commit()
         conn.close()
+        notify_event_changed(new_event_id, "created")
 
         return redirect(url_for("routes.index"))
     else:
-        return render_template("create_event.html")
+        return render_template("create_event.html", guilds=list_guilds())
 
 @bp.route("/edit_event/<int:event_id>", methods=["GET","POST"])
 @login_required
@@ -122,6 +167,7 @@ def edit_event(event_id):
         new_gmst = request.form.get("date_gamestart")
         new_serv = request.form.get("server_info")
         new_pw   = request.form.get("password")
+        new_guild= request.form.get("guild_id") or event_data.get("guild_id")
 
         new_inf_a = int(request.form.get("inf_squads_allies"))
         new_tnk_a = int(request.form.get("tank_squads_allies"))
@@ -132,7 +178,11 @@ def edit_event(event_id):
         new_cmd_a = int(request.form.get("max_commanders_allies"))
         new_cmd_x = int(request.form.get("max_commanders_axis"))
 
-        new_recur= request.form.get("recurrence_pattern","none")
+        try:
+            new_recur= recurrence_from_form()
+        except ValueError as e:
+            flash(f"Ungültige Wiederholung: {e}", "danger")
+            return render_template("edit_event.html", event=event_data, patterns=PATTERNS, guilds=list_guilds())
 
         conn2= get_connection()
         c2= conn2.cursor()
@@ -154,7 +204,9 @@ def edit_event(event_id):
                 sniper_squads_axis=?,
                 max_commanders_allies=?,
                 max_commanders_axis=?,
-                recurrence_pattern=?
+                recurrence_pattern=?,
+                guild_id=?,
+                change_version=COALESCE(change_version, 0) + 1
             WHERE id=?
         """,(
             new_name,new_desc,
@@ -164,14 +216,19 @@ def edit_event(event_id):
             new_inf_x,new_tnk_x,new_snp_x,
             new_cmd_a,new_cmd_x,
             new_recur,
+            new_guild,
             event_id
         ))
+        if new_recur!="none":
+            start_series(c2, event_id, new_evst)
+        record_change(c2, event_id, "updated", "web")
         conn2.commit()
         conn2.close()
+        notify_event_changed(event_id, "updated")
 
         return redirect(url_for("routes.event_detail", event_id=event_id))
     else:
-        return render_template("edit_event.html", event=event_data)
+        return render_template("edit_event.html", event=event_data, patterns=PATTERNS, guilds=list_guilds())
 
 @bp.route("/delete_event/<int:event_id>", methods=["GET","POST"])
 @login_required
@@ -184,21 +241,14 @@ def delete_event(event_id):
         c= conn.cursor()
         c.execute("DELETE FROM signups WHERE event_id=?", (event_id,))
         c.execute("DELETE FROM events WHERE id=?", (event_id,))
+        record_change(c, event_id, "deleted", "web")
         conn.commit()
         conn.close()
+        notify_event_changed(event_id, "deleted")
         return redirect(url_for("routes.index"))
     else:
         return render_template("confirm_delete.html", event_id=event_id)
 
-#
-# Hilfs-Funktion, um eine Liste players in 6er,3er,2er etc. zu chunk-en:
-#
-def chunk_players_into_squads(player_names, chunk_size):
-    return [
-        player_names[i:i+chunk_size]
-        for i in range(0, len(player_names), chunk_size)
-    ]
-
 @bp.route("/event/<int:event_id>")
 @login_required
 def event_detail(event_id):
@@ -214,77 +264,42 @@ def event_detail(event_id):
     event_row["date_eventstart"] = german_datetime_format(event_row["date_eventstart"])
     event_row["date_gamestart"]  = german_datetime_format(event_row["date_gamestart"])
 
-    # Anmeldungen
-    conn= get_connection()
-    c= conn.cursor()
-    c.execute("""
-        SELECT user_name, seite, rolle, status
-        FROM signups
-        WHERE event_id=?
-          AND status='active'
-        ORDER BY id ASC
-    """,(event_id,))
-    signups= c.fetchall()
-    conn.close()
-
-    # Temporär Allies / Axis
-    allies_temp = {
-        "inf": [],
-        "tank": [],
-        "sniper": [],
-        "commander": []
-    }
-    axis_temp = {
-        "inf": [],
-        "tank": [],
-        "sniper": [],
-        "commander": []
-    }
-
-    for user_name, seite, rolle, st in signups:
-        if seite=="allies" and rolle in allies_temp:
-            allies_temp[rolle].append(user_name)
-        elif seite=="axis" and rolle in axis_temp:
-            axis_temp[rolle].append(user_name)
-
-    # Squadgrößen
-    squad_sizes= {
-        "inf": 6,
-        "tank": 3,
-        "sniper": 2,
-        "commander": 1
-    }
-
-    # Allies final:
-    allies_data= {
-        "inf": [],
-        "tank": [],
-        "sniper": [],
-        "commander": []
-    }
-    for rolle, player_list in allies_temp.items():
-        # wir chunk-en die gesammelten Namen in 6er,3er,2er,1er Listen
-        s_size= squad_sizes.get(rolle, 6)
-        allies_data[rolle] = chunk_players_into_squads(player_list, s_size)
-
-    # Axis final:
-    axis_data= {
-        "inf": [],
-        "tank": [],
-        "sniper": [],
-        "commander": []
-    }
-    for rolle, player_list in axis_temp.items():
-        s_size= squad_sizes.get(rolle, 6)
-        axis_data[rolle] = chunk_players_into_squads(player_list, s_size)
+    # Anmeldungen: gemeinsame (gecachte) Roster-Projektion, wie im Bot
+    roster= get_roster_projection(event_id)
+    if not roster:
+        return "Event nicht gefunden",404
+    allies_data= roster["allies"]
+    axis_data= roster["axis"]
 
     return render_template(
         "event_detail.html",
         event=event_row,
         allies_data=allies_data,
-        axis_data=axis_data
+        axis_data=axis_data,
+        waiting=roster["waiting"],
+        roster_version=roster["version"]
     )
 
+@bp.route("/event/<int:event_id>/live")
+@login_required
+def event_live(event_id):
+    """
+    SSE-Stream der Detailseite: erst ein Snapshot, danach Deltas je Seite/Rolle
+    (siehe live.RosterPublisher).
+    """
+    try:
+        res= publisher.subscribe(event_id)
+    except OverflowError:
+        return "Zu viele Live-Verbindungen", 503
+    if res is None:
+        return "Event nicht gefunden", 404
+    sub, initial= res
+
+    resp= Response(publisher.stream(sub, initial), mimetype="text/event-stream")
+    resp.headers["Cache-Control"]= "no-cache"
+    resp.headers["X-Accel-Buffering"]= "no"   # nginx: nicht puffern
+    return resp
+
 @bp.route("/register/<token>", methods=["GET","POST"])
 def register_via_invite(token):
     """
@@ -316,8 +331,12 @@ def register_via_invite(token):
             conn.close()
             return redirect(request.url)
 
-        import bcrypt
-        hashed_pw= bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+        try:
+            hashed_pw= hash_password(password)
+        except PasswordPoolBusy:
+            conn.close()
+            flash("Server gerade ausgelastet, bitte gleich nochmal versuchen.", "warning")
+            return redirect(request.url)
         c.execute("""
             INSERT INTO users (username, password_hash)
             VALUES (?,?)
@@ -1,5 +1,17 @@
+import sqlite3
 from datetime import datetime
 from .db import get_connection
+from .changes import record_change
+
+def bump_event_version(c, event_id, kind="signup", source="bot"):
+    """
+    Erhöht events.change_version und schreibt den Eintrag im Änderungs-Feed
+    (beides im Cursor/der Transaktion des Aufrufers).
+    Caches wie die Roster-Projektion erkennen daran Änderungen am Event.
+    Anmeldungen kommen aus Discord, daher source='bot' als Standard.
+    """
+    c.execute("UPDATE events SET change_version = COALESCE(change_version, 0) + 1 WHERE id=?", (event_id,))
+    record_change(c, event_id, kind, source)
 
 def get_event_dict(event_id: int):
     """
@@ -18,6 +30,133 @@ def get_event_dict(event_id: int):
     conn.close()
     return result
 
+#########################################
+# Event-Übersicht (Keyset-Pagination)
+#########################################
+
+EVENT_FILTERS = ("all", "upcoming", "past", "recurring")
+EVENT_PAGE_SIZE = 25
+
+# Sortierschlüssel, identisch zum Ausdruck in idx_events_start_id
+_START_KEY = "IFNULL(date_eventstart, '')"
+
+def encode_event_cursor(start, event_id):
+    return f"{start or ''}~{event_id}"
+
+def decode_event_cursor(cursor):
+    """
+    "2025-01-05T20:00~123" -> ("2025-01-05T20:00", 123) bzw. None bei Unsinn.
+    """
+    if not cursor or "~" not in cursor:
+        return None
+    start, _, event_id = cursor.rpartition("~")
+    try:
+        return (start, int(event_id))
+    except ValueError:
+        return None
+
+def list_events(filter_="all", q=None, cursor=None, limit=EVENT_PAGE_SIZE, now=None):
+    """
+    Eine Seite der Event-Übersicht.
+     - filter_: all/past/recurring (neueste zuerst), upcoming (nächstes zuerst)
+     - q: Teilstring im Namen (LIKE)
+     - cursor: Position nach dem letzten Event der vorherigen Seite (encode_event_cursor)
+    Gibt (events, next_cursor) zurück; events sind Dicts mit id, name,
+    date_eventstart, recurrence_pattern, next_cursor ist None auf der letzten Seite.
+    """
+    if filter_ not in EVENT_FILTERS:
+        filter_ = "all"
+    now = (now or datetime.now()).isoformat(timespec="minutes")
+    ascending = filter_ == "upcoming"
+
+    where = []
+    params = []
+    if filter_ == "upcoming":
+        where.append(f"{_START_KEY} >= ?")
+        params.append(now)
+    elif filter_ == "past":
+        where.append(f"{_START_KEY} < ?")
+        params.append(now)
+    elif filter_ == "recurring":
+        where.append("recurrence_pattern != 'none'")
+    if q:
+        escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where.append("name LIKE ? ESCAPE '\\'")
+        params.append(f"%{escaped}%")
+    position = decode_event_cursor(cursor)
+    if position:
+        # Ausgeschrieben statt Row-Value-Vergleich: nur so nutzt SQLite
+        # (auch absteigend) eine Range-Suche im Index statt eines Scans
+        op = ">" if ascending else "<"
+        where.append(f"{_START_KEY} {op}= ? AND ({_START_KEY} {op} ? OR id {op} ?)")
+        params.extend((position[0], position[0], position[1]))
+
+    order = "ASC" if ascending else "DESC"
+    sql = f"""
+        SELECT id, name, date_eventstart, recurrence_pattern
+        FROM events
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY {_START_KEY} {order}, id {order}
+        LIMIT ?
+    """
+    params.append(limit + 1)
+
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(sql, params)
+    cols = [desc[0] for desc in c.description]
+    rows = [dict(zip(cols, r)) for r in c.fetchall()]
+    conn.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_event_cursor(last["date_eventstart"], last["id"])
+    return rows, next_cursor
+
+def signup_counts(event_ids):
+    """
+    Anmeldezahlen für mehrere Events in einer Query:
+    {event_id: {"allies": n, "axis": n, "waiting": n}} (nur aktive pro Seite).
+    """
+    counts = {eid: {"allies": 0, "axis": 0, "waiting": 0} for eid in event_ids}
+    if not counts:
+        return counts
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute(f"""
+        SELECT event_id, seite, status, COUNT(*)
+        FROM signups
+        WHERE event_id IN ({",".join("?" * len(counts))})
+          AND status IN ('active','waiting')
+        GROUP BY event_id, seite, status
+    """, list(counts))
+    for event_id, seite, status, n in c.fetchall():
+        entry = counts[event_id]
+        if status == "waiting":
+            entry["waiting"] += n
+        elif seite in entry:
+            entry[seite] += n
+    conn.close()
+    return counts
+
+def list_guilds():
+    """
+    [(guild_id, guild_name), ...] aller Guilds mit Event-Kanal (per /set_event_channel).
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    c.execute("""
+        SELECT guild_id, COALESCE(guild_name, guild_id)
+        FROM guild_settings
+        WHERE event_channel_id IS NOT NULL
+        ORDER BY guild_name COLLATE NOCASE
+    """)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
 def init_data_for_event(event_id=None):
     """
     Dummy-Funktion, damit kein Importfehler entsteht.
@@ -76,7 +215,7 @@ def count_signups(event_id, seite, rolle):
 
 def create_signup(event_id, user_id, user_name, seite, rolle, status="active"):
     """
-    Legt einen Eintrag in signups an.
+    Legt einen Eintrag in signups an und gibt dessen id zurück.
     """
     conn = get_connection()
     c = conn.cursor()
@@ -84,64 +223,111 @@ def create_signup(event_id, user_id, user_name, seite, rolle, status="active"):
         INSERT INTO signups (event_id, user_id, user_name, seite, rolle, status, created_at)
         VALUES (?,?,?,?,?,?,?)
     """, (event_id, user_id, user_name, seite, rolle, status, datetime.now()))
+    signup_id = c.lastrowid
+    bump_event_version(c, event_id)
     conn.commit()
     conn.close()
+    return signup_id
 
-def activate_waiting_signup(event_id, seite, rolle):
+def reserve_slot(event_id, user_id, user_name, seite, rolle):
     """
-    Aktiviert den ältesten 'waiting'-Eintrag für (seite, rolle).
-    Gibt (wait_id, user_id) zurück, falls ein Eintrag gefunden wurde, sonst None.
+    Reserviert atomar einen Platz für (seite, rolle).
+    Ob der User 'active' oder auf die Warteliste ('waiting') kommt, wird
+    innerhalb einer BEGIN-IMMEDIATE-Transaktion entschieden, d.h. zwei
+    gleichzeitige Klicks können die Slots nicht mehr überbuchen.
+    Pro User und Event gibt es höchstens eine laufende Anmeldung.
+
+    Gibt (signup_id, status) zurück. status ist 'active' oder 'waiting',
+    bzw. bei signup_id=None:
+      'duplicate' -> User ist für das Event bereits angemeldet
+      'no_event'  -> Event existiert nicht
+      'no_slots'  -> Rolle hat für diese Seite keine Slots
     """
     conn = get_connection()
     c = conn.cursor()
-    c.execute("""
-        SELECT id, user_id
-        FROM signups
-        WHERE event_id = ?
-          AND seite = ?
-          AND rolle = ?
-          AND status = 'waiting'
-        ORDER BY id ASC
-        LIMIT 1
-    """, (event_id, seite, rolle))
-    row = c.fetchone()
-    if row:
-        wait_id, wait_user_id = row
-        c.execute("UPDATE signups SET status = 'active' WHERE id = ?", (wait_id,))
+    try:
+        # Schreib-Lock sofort holen -> Zählen und Einfügen sind eine Einheit
+        c.execute("BEGIN IMMEDIATE")
+
+        c.execute("SELECT * FROM events WHERE id=?", (event_id,))
+        row = c.fetchone()
+        if not row:
+            conn.rollback()
+            return (None, "no_event")
+        cols = [desc[0] for desc in c.description]
+        event_dict = dict(zip(cols, row))
+
+        c.execute("""
+            SELECT 1
+            FROM signups
+            WHERE event_id = ?
+              AND user_id = ?
+              AND status IN ('active','waiting')
+            LIMIT 1
+        """, (event_id, user_id))
+        if c.fetchone():
+            conn.rollback()
+            return (None, "duplicate")
+
+        max_slots = get_slots_for_role(event_dict, seite, rolle) or 0
+        if max_slots <= 0:
+            conn.rollback()
+            return (None, "no_slots")
+
+        c.execute("""
+            SELECT COUNT(*)
+            FROM signups
+            WHERE event_id = ?
+              AND seite = ?
+              AND rolle = ?
+              AND status = 'active'
+        """, (event_id, seite, rolle))
+        count_active = c.fetchone()[0]
+        status = "active" if count_active < max_slots else "waiting"
+
+        c.execute("""
+            INSERT INTO signups (event_id, user_id, user_name, seite, rolle, status, created_at)
+            VALUES (?,?,?,?,?,?,?)
+        """, (event_id, user_id, user_name, seite, rolle, status, datetime.now()))
+        signup_id = c.lastrowid
+        bump_event_version(c, event_id)
         conn.commit()
+        return (signup_id, status)
+    except sqlite3.IntegrityError:
+        # Unique-Index (event_id, user_id) für laufende Anmeldungen hat zugeschlagen
+        conn.rollback()
+        return (None, "duplicate")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
         conn.close()
-        return (wait_id, wait_user_id)
-    conn.close()
-    return None
 
-def cancel_signup(user_id):
+def _promote_waiting(c, event_id, seite, rolle):
     """
-    Markiert die neueste 'active'-Anmeldung des Users als 'cancelled'
-    und ruft ggf. den ersten Wartelistenplatz auf.
-    
-    Gibt (signup_id, event_id, seite, rolle, wait_row) zurück,
-    oder None, wenn der User nicht 'active' war.
+    Aktiviert den ältesten 'waiting'-Eintrag für (seite, rolle), aber nur, wenn
+    die Rolle noch einen freien Slot hat (im Cursor/der Transaktion des Aufrufers,
+    die per BEGIN IMMEDIATE den Schreib-Lock halten muss).
+    Gibt (wait_id, user_id) zurück oder None.
     """
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("""
-        SELECT id, event_id, seite, rolle
-        FROM signups
-        WHERE user_id = ?
-          AND status = 'active'
-        ORDER BY id DESC
-        LIMIT 1
-    """, (user_id,))
+    c.execute("SELECT * FROM events WHERE id=?", (event_id,))
     row = c.fetchone()
     if not row:
-        conn.close()
         return None
+    cols = [desc[0] for desc in c.description]
+    max_slots = get_slots_for_role(dict(zip(cols, row)), seite, rolle) or 0
 
-    signup_id, event_id, seite, rolle = row
-    c.execute("UPDATE signups SET status = 'cancelled' WHERE id = ?", (signup_id,))
-    conn.commit()
+    c.execute("""
+        SELECT COUNT(*)
+        FROM signups
+        WHERE event_id = ?
+          AND seite = ?
+          AND rolle = ?
+          AND status = 'active'
+    """, (event_id, seite, rolle))
+    if c.fetchone()[0] >= max_slots:
+        return None
 
-    # Nachrücker
     c.execute("""
         SELECT id, user_id
         FROM signups
@@ -154,9 +340,66 @@ def cancel_signup(user_id):
     """, (event_id, seite, rolle))
     wait_row = c.fetchone()
     if wait_row:
-        wait_id, wait_user_id = wait_row
-        c.execute("UPDATE signups SET status = 'active' WHERE id = ?", (wait_id,))
+        c.execute("UPDATE signups SET status = 'active' WHERE id = ?", (wait_row[0],))
+    return wait_row
+
+def activate_waiting_signup(event_id, seite, rolle):
+    """
+    Aktiviert den ältesten 'waiting'-Eintrag für (seite, rolle), sofern noch ein
+    Slot frei ist (atomar wie reserve_slot).
+    Gibt (wait_id, user_id) zurück, falls ein Eintrag aktiviert wurde, sonst None.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        wait_row = _promote_waiting(c, event_id, seite, rolle)
+        if wait_row:
+            bump_event_version(c, event_id)
         conn.commit()
+        return tuple(wait_row) if wait_row else None
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
-    conn.close()
-    return (signup_id, event_id, seite, rolle, wait_row)
+def cancel_signup(user_id):
+    """
+    Markiert die neueste 'active'-Anmeldung des Users als 'cancelled'
+    und lässt ggf. den ersten Wartelistenplatz nachrücken - beides in einer
+    BEGIN-IMMEDIATE-Transaktion, damit ein gleichzeitiges reserve_slot den
+    frei gewordenen Slot nicht zusätzlich belegen kann.
+
+    Gibt (signup_id, event_id, seite, rolle, wait_row) zurück,
+    oder None, wenn der User nicht 'active' war.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        c.execute("""
+            SELECT id, event_id, seite, rolle
+            FROM signups
+            WHERE user_id = ?
+              AND status = 'active'
+            ORDER BY id DESC
+            LIMIT 1
+        """, (user_id,))
+        row = c.fetchone()
+        if not row:
+            conn.rollback()
+            return None
+
+        signup_id, event_id, seite, rolle = row
+        c.execute("UPDATE signups SET status = 'cancelled' WHERE id = ?", (signup_id,))
+        # Nachrücker (nur wenn der Slot danach wirklich frei ist)
+        wait_row = _promote_waiting(c, event_id, seite, rolle)
+        bump_event_version(c, event_id)
+        conn.commit()
+        return (signup_id, event_id, seite, rolle, wait_row)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,90 @@
+// Live-Roster der Detailseite (Server-Sent Events, siehe webapp/live.py).
+// "snapshot" ersetzt alle Abschnitte, "delta" nur die geänderten.
+document.addEventListener('DOMContentLoaded', () => {
+  const root = document.getElementById('live-roster');
+  if (!root || !window.EventSource) {
+    return;
+  }
+  const notice = document.getElementById('live-roster-notice');
+  let version = parseInt(root.dataset.version || '0', 10);
+
+  const source = new EventSource(root.dataset.liveUrl);
+
+  source.addEventListener('snapshot', (e) => applyUpdate(JSON.parse(e.data), true));
+  source.addEventListener('delta', (e) => applyUpdate(JSON.parse(e.data), false));
+  source.addEventListener('deleted', () => {
+    source.close();
+    showNotice('Dieses Event wurde gelöscht.');
+  });
+
+  function applyUpdate(data, full) {
+    // Veraltete Deltas (z.B. nach Reconnect) ignorieren
+    if (!full && data.version < version) {
+      return;
+    }
+    version = data.version;
+    Object.entries(data.sections).forEach(([key, section]) => {
+      const el = root.querySelector(`[data-section="${key}"]`);
+      if (el) {
+        renderSection(el, key.endsWith('.commander'), section);
+      }
+    });
+  }
+
+  function renderSection(el, isCommander, section) {
+    const body = el.querySelector('.roster-body');
+    body.replaceChildren();
+
+    const squads = section.squads || [];
+    if (isCommander) {
+      if (squads.length && squads[0].length) {
+        const p = document.createElement('p');
+        squads[0].forEach((name) => appendLine(p, name));
+        body.appendChild(p);
+      } else {
+        body.appendChild(paragraph(el.dataset.empty));
+      }
+    } else if (squads.length) {
+      squads.forEach((squad, i) => {
+        const div = document.createElement('div');
+        div.className = 'mb-2';
+        const title = document.createElement('b');
+        title.textContent = `${el.dataset.squadLabel} #${i + 1} (max ${el.dataset.squadSize}):`;
+        div.appendChild(title);
+        div.appendChild(document.createElement('br'));
+        squad.forEach((name) => appendLine(div, `- ${name}`));
+        body.appendChild(div);
+      });
+    } else {
+      body.appendChild(paragraph(el.dataset.empty));
+    }
+
+    if (section.waiting && section.waiting.length) {
+      const div = document.createElement('div');
+      div.className = 'text-muted';
+      const title = document.createElement('b');
+      title.textContent = 'Warteliste:';
+      div.appendChild(title);
+      div.appendChild(document.createElement('br'));
+      section.waiting.forEach((name, i) => appendLine(div, `${i + 1}. ${name}`));
+      body.appendChild(div);
+    }
+  }
+
+  // Namen immer als Text einfügen (kein innerHTML mit Discord-Namen)
+  function appendLine(parent, text) {
+    parent.appendChild(document.createTextNode(text));
+    parent.appendChild(document.createElement('br'));
+  }
+
+  function paragraph(text) {
+    const p = document.createElement('p');
+    p.textContent = text;
+    return p;
+  }
+
+  function showNotice(text) {
+    notice.textContent = text;
+    notice.classList.remove('d-none');
+  }
+});
@@ -0,0 +1,12 @@
+# wsgi.py
+# Einstiegspunkt für WSGI-Server, z.B.:
+#   gunicorn -w 4 --preload -b 127.0.0.1:5000 wsgi:app
+#   waitress-serve --listen=127.0.0.1:5000 wsgi:app
+# Der Bot läuft dann separat: python main.py bot
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from webapp import create_app
+
+app = create_app()